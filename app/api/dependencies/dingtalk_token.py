@@ -1,29 +1,124 @@
 # -*- coding: utf-8 -*-
 from fastapi import FastAPI,HTTPException
+import asyncio
+import time
 import httpx
 import logging
 import os
+from typing import Optional
 from core import config
 
 DINGTALK_APP_KEY = config.DINGTALK_APP_KEY
 DINGTALK_APP_SECRET = config.DINGTALK_APP_SECRET
+TOKEN_URL = "https://api.dingtalk.com/v1.0/oauth2/accessToken"
 
 logger = logging.getLogger("app.api")
 
-async def get_dingtalk_access_token() -> str:
-    url = "https://api.dingtalk.com/v1.0/oauth2/accessToken"
-    data = {
-        "appKey": DINGTALK_APP_KEY,
-        "appSecret": DINGTALK_APP_SECRET
-    }
-    
-    async with httpx.AsyncClient() as client:
+class DingTalkTokenManager:
+    """钉钉access_token管理：缓存到过期前，后台提前刷新，并发刷新合并为一次请求"""
+
+    def __init__(
+            self,
+            app_key: str,
+            app_secret: str,
+            expiry_margin: int = config.DINGTALK_TOKEN_EXPIRY_MARGIN,
+            refresh_ahead: int = config.DINGTALK_TOKEN_REFRESH_AHEAD,
+            retry_interval: int = 30):
+        self.app_key = app_key
+        self.app_secret = app_secret
+        # 距离过期不足expiry_margin秒的token不再返回
+        self.expiry_margin = expiry_margin
+        # 距离过期refresh_ahead秒时后台主动刷新
+        self.refresh_ahead = max(refresh_ahead, expiry_margin)
+        self.retry_interval = retry_interval
+        # 共享连接池中的api.dingtalk.com客户端，未绑定时每次单独建连
+        self._client: Optional[httpx.AsyncClient] = None
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresh_loop_task: Optional[asyncio.Task] = None
+
+    def bind_client(self, client: Optional[httpx.AsyncClient]):
+        """绑定lifespan中创建的共享客户端"""
+        self._client = client
+
+    def _is_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at - self.expiry_margin
+
+    async def get_token(self) -> str:
+        """获取access_token，缓存有效时不发起请求"""
+        if self._is_valid():
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """强制刷新token，同一时刻只会有一个请求在途"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch_token())
+        # shield：某个调用方被取消时不影响其他等待者
+        return await asyncio.shield(self._inflight)
+
+    async def _request_token(self):
+        """请求钉钉接口，返回(accessToken, expireIn)"""
+        data = {
+            "appKey": self.app_key,
+            "appSecret": self.app_secret
+        }
+        if self._client is not None:
+            response = await self._client.post(TOKEN_URL, json=data)
+        else:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(TOKEN_URL, json=data)
+        response.raise_for_status()
+        token_data = response.json()
+        return token_data["accessToken"], int(token_data.get("expireIn", 7200))
+
+    async def _fetch_token(self) -> str:
         try:
-            response = await client.post(url, json=data)
-            response.raise_for_status()
-            token_data = response.json()
-            return token_data["accessToken"]
+            token, expire_in = await self._request_token()
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"fail to get access token: {str(e)}")
-        
-#https://api.dingtalk.com/v1.0/oauth2/accessToken
\ No newline at end of file
+
+        self._token = token
+        self._expires_at = time.monotonic() + expire_in
+        logger.info(f"access token refreshed, expire in {expire_in}s")
+        self._ensure_refresh_loop()
+        return token
+
+    def _ensure_refresh_loop(self):
+        if self._refresh_loop_task is None or self._refresh_loop_task.done():
+            self._refresh_loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        """后台任务：在token过期前refresh_ahead秒主动刷新"""
+        while True:
+            delay = self._expires_at - self.refresh_ahead - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"background token refresh fail: {str(e)}")
+            # 刷新成功后也至少间隔retry_interval秒：expireIn不超过refresh_ahead时避免连续刷新
+            await asyncio.sleep(self.retry_interval)
+
+    async def aclose(self):
+        """停止后台刷新任务"""
+        for task in (self._refresh_loop_task, self._inflight):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._refresh_loop_task = None
+        self._inflight = None
+        self._client = None
+
+token_manager = DingTalkTokenManager(DINGTALK_APP_KEY, DINGTALK_APP_SECRET)
+
+async def get_dingtalk_access_token() -> str:
+    return await token_manager.get_token()
+
+#https://api.dingtalk.com/v1.0/oauth2/accessToken
@@ -0,0 +1,9 @@
+from fastapi import Request
+from core.http_client import HttpClients, get_default_http_clients
+
+def get_http_clients(request: Request) -> HttpClients:
+    """从应用状态获取lifespan中创建的共享连接池"""
+    http_clients = getattr(request.app.state, "http_clients", None)
+    if http_clients is None:
+        http_clients = get_default_http_clients()
+    return http_clients
@@ -3,12 +3,14 @@ from typing import Optional
 
 from services.dingtalk.calendar_service import CalendarService
 from api.models.Calendar import CalendarEventsResponse, CalendarRequest
+from api.dependencies.http_clients import get_http_clients
+from core.http_client import HttpClients
 
 router = APIRouter(prefix="/calendar", tags=["calendar"])
 
 # 
-def get_calendar_service():
-    return CalendarService()
+def get_calendar_service(http_clients: HttpClients = Depends(get_http_clients)):
+    return CalendarService(http_clients)
 
 @router.get("/{unionid}/{calendarId}/events", response_model=CalendarEventsResponse)
 async def get_calendar_events(
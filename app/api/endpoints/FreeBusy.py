@@ -1,17 +1,19 @@
 #coding=utf-8
 from fastapi import APIRouter, Depends, HTTPException, Query
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from repository import database
 from services.dingtalk.FreeBusy_service import FreeBusyService
-from api.models.FreeBusy import FreeBusyResponse,FreeBusyRequest
+from api.models.FreeBusy import FreeBusyResponse,FreeBusyRequest,FreeBusyBulkRequest,FreeBusyBulkResponse
+from api.dependencies.http_clients import get_http_clients
+from core.http_client import HttpClients
 
 router = APIRouter(prefix="/schedule", tags=["schedule"])
 
 # 
-def get_schedule_service():
-    return FreeBusyService()
+def get_schedule_service(http_clients: HttpClients = Depends(get_http_clients)):
+    return FreeBusyService(http_clients)
 
 @router.get("/{userId}/now/free_busy",response_model=List[FreeBusyResponse])
 async def get_user_free_busy_status(
@@ -29,6 +31,25 @@ async def get_user_free_busy_status(
             detail=f"quary user free busy status fail: {str(e)}"
         )
 
+@router.post("/now/free_busy/bulk",response_model=FreeBusyBulkResponse)
+async def get_users_free_busy_now_status(
+    request: FreeBusyBulkRequest,
+    schedule_service: FreeBusyService = Depends(get_schedule_service)
+):
+    #ȡûæ״̬userid鷵
+    try:
+        result = await schedule_service.get_users_free_busy_now_status(request.userIds)
+        # ѯʧܵûڽУг
+        return FreeBusyBulkResponse(
+            results=result,
+            failed=[userId for userId in request.userIds if userId not in result]
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"quary users free busy status fail: {str(e)}"
+        )
+
 @router.get("/{userId}/free_busy",response_model=List[FreeBusyResponse])
 async def get_user_free_busy_status(
     userId:str,
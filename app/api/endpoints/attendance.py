@@ -6,6 +6,8 @@ from typing import List
 from repository import database
 from services.dingtalk.attendance_service import AttendanceService, AttendanceManager
 from api.models.attendance import AttendanceResponse,AttendanceRequest
+from api.dependencies.http_clients import get_http_clients
+from core.http_client import HttpClients
 
 router = APIRouter(prefix="/attendance", tags=["attendance"])
 
@@ -13,8 +15,10 @@ router = APIRouter(prefix="/attendance", tags=["attendance"])
 def get_attendance_manager():
     return AttendanceManager()
 
-def get_attendance_service(attendance_manager: AttendanceManager = Depends(get_attendance_manager)):
-    return AttendanceService(attendance_manager)
+def get_attendance_service(
+        attendance_manager: AttendanceManager = Depends(get_attendance_manager),
+        http_clients: HttpClients = Depends(get_http_clients)):
+    return AttendanceService(attendance_manager, http_clients)
 
 @router.get("/{userid}/details", response_model=AttendanceResponse)
 async def get_attendance_details(
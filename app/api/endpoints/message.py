@@ -7,11 +7,13 @@ from services.dingtalk.message_service import SendMessageService
 from api.models.message import AsyncSendRequest,Message,TextContent
 from repository import database
 from core.config import AGENT_ID
+from api.dependencies.http_clients import get_http_clients
+from core.http_client import HttpClients
 router = APIRouter(prefix="/message", tags=["message"])
 
 #
-def get_send_message_service():
-    return SendMessageService()
+def get_send_message_service(http_clients: HttpClients = Depends(get_http_clients)):
+    return SendMessageService(http_clients)
 
 @router.post("/async-send/")
 async def async_send_message(
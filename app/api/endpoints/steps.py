@@ -5,11 +5,13 @@ from datetime import date
 from repository import database
 from services.dingtalk.steps_service import SportService
 from api.models.steps import UserStepResponse, UserStepRequest,StepInfo
+from api.dependencies.http_clients import get_http_clients
+from core.http_client import HttpClients
 
 router = APIRouter(prefix="/sport_info", tags=["sport_info"])
 
-def get_sport_service():
-    return SportService()
+def get_sport_service(http_clients: HttpClients = Depends(get_http_clients)):
+    return SportService(http_clients)
 
 @router.get("/{object_id}/{stat_dates}", response_model=UserStepResponse)
 async def get_user_steps(
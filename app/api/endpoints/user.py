@@ -4,13 +4,15 @@ from typing import List, Optional
 from repository import database
 from services.dingtalk.user_service import UserService
 from api.models.user import UserDetailResponse
+from api.dependencies.http_clients import get_http_clients
+from core.http_client import HttpClients
 
 router = APIRouter(prefix="/user_info", tags=["user_info"])
 
 # 
 
-def get_user_service():
-    return UserService()
+def get_user_service(http_clients: HttpClients = Depends(get_http_clients)):
+    return UserService(http_clients)
 
 @router.get("/{userid}/info", response_model=UserDetailResponse)
 async def get_user_details(
@@ -1,16 +1,24 @@
 # -*- coding: utf-8 -*-
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from services.amap.weather_service import WeatherService
 from api.models.weather import WeatherResponse
+from api.dependencies.http_clients import get_http_clients
+from core.http_client import HttpClients
 from core import config
 
 AMAP_API_KEY =config.AMAP_API_KEY
 
 router = APIRouter(prefix="/weather", tags=["weather"])
 
-# ȡʵ
-def get_weather_service() -> WeatherService:
-    return WeatherService()
+# ȡʵlifespanдʵ붨ʱ棩
+def get_weather_service(
+        request: Request,
+        http_clients: HttpClients = Depends(get_http_clients)) -> WeatherService:
+    weather_service = getattr(request.app.state, "weather_service", None)
+    if weather_service is None:
+        weather_service = WeatherService(http_clients)
+        request.app.state.weather_service = weather_service
+    return weather_service
 
 @router.get("/current", response_model=WeatherResponse)
 async def get_current_weather(
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # ģ
@@ -8,8 +8,15 @@ class FreeBusyRequest(BaseModel):
     startTime: str  # ʼʱ
     endTime: str  # ʱ
 
+class FreeBusyBulkRequest(BaseModel):
+    userIds: List[str]  # ûuseridб
+
 class FreeBusyResponse(BaseModel):
     userId: Optional[str] = None
     date: Optional[str] = None
     start_datetime: Optional[str] = None
     end_datetime: Optional[str] = None
+
+class FreeBusyBulkResponse(BaseModel):
+    results: Dict[str, List[FreeBusyResponse]]  # useridæµʱ
+    failed: List[str] = []  # ѯʧܵuseridУ
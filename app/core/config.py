@@ -14,3 +14,109 @@ DB_PORT = int(os.getenv("DB_PORT", 3306))
 AGENT_ID = os.getenv("AGENT_ID")
 DEFAULT_CITY= "320500"
 USER_IDS=os.getenv("USER_IDS").split(",")
+
+# 钉钉access_token缓存：距离过期不足MARGIN秒即视为失效，提前REFRESH_AHEAD秒后台刷新
+DINGTALK_TOKEN_EXPIRY_MARGIN = int(os.getenv("DINGTALK_TOKEN_EXPIRY_MARGIN", 300))
+DINGTALK_TOKEN_REFRESH_AHEAD = int(os.getenv("DINGTALK_TOKEN_REFRESH_AHEAD", 600))
+
+# 上游HTTP共享连接池（api.dingtalk.com / oapi.dingtalk.com / restapi.amap.com 各一个）
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# 天气缓存：高德天气每3小时更新，缓存过期后STALE_TTL秒内先返回旧数据并后台刷新
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", 3 * 60 * 60))
+WEATHER_STALE_TTL = int(os.getenv("WEATHER_STALE_TTL", 60 * 60))
+
+# 考勤任务：同时处理的用户数（1为串行）与单个用户处理超时（秒）
+ATTENDANCE_SWEEP_CONCURRENCY = int(os.getenv("ATTENDANCE_SWEEP_CONCURRENCY", 10))
+ATTENDANCE_USER_TIMEOUT = float(os.getenv("ATTENDANCE_USER_TIMEOUT", 60))
+# 批量拉取一组（最多50人、可能多页）考勤记录的超时（秒）
+ATTENDANCE_FETCH_TIMEOUT = float(os.getenv("ATTENDANCE_FETCH_TIMEOUT", 180))
+
+# 状态检查流水线各阶段并发上限：拉取用户状态/生成提醒(LLM)/发送消息
+STATUS_FETCH_CONCURRENCY = int(os.getenv("STATUS_FETCH_CONCURRENCY", 20))
+STATUS_LLM_CONCURRENCY = int(os.getenv("STATUS_LLM_CONCURRENCY", 4))
+STATUS_SEND_CONCURRENCY = int(os.getenv("STATUS_SEND_CONCURRENCY", 10))
+# 考勤处理完成后排队状态检查：同一用户两次检查的最小间隔（秒），不足间隔的推迟到间隔满后检查
+STATUS_RECHECK_MIN_INTERVAL = int(os.getenv("STATUS_RECHECK_MIN_INTERVAL", 30 * 60))
+
+# 钉钉 querySchedule 单次最多查询的用户数
+FREEBUSY_BATCH_SIZE = int(os.getenv("FREEBUSY_BATCH_SIZE", 20))
+# 同时进行的 querySchedule 批量请求数
+FREEBUSY_CONCURRENCY = int(os.getenv("FREEBUSY_CONCURRENCY", 4))
+
+# 员工ID映射：数据库中也查不到的 userid/unionid 在该时长（秒）内不再回查
+IDENTITY_MISS_TTL = float(os.getenv("IDENTITY_MISS_TTL", 5 * 60))
+
+# 数据库线程池大小：同步pymysql操作在该线程池中执行，避免阻塞事件循环
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", 5))
+
+# 启动时自动执行数据库迁移（也可通过 python -m repository.migrations upgrade 手动执行）
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() == "true"
+
+# 数据库连接池：最大连接数应大于 DB_EXECUTOR_WORKERS，为接口请求留出余量；
+# 连接全部借出时最多等待 DB_POOL_TIMEOUT 秒；连接持有超过 DB_LEAK_WARN_SECONDS 秒记录获取位置
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", 10))
+DB_POOL_MIN_CACHED = int(os.getenv("DB_POOL_MIN_CACHED", 2))
+DB_POOL_MAX_CACHED = int(os.getenv("DB_POOL_MAX_CACHED", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_LEAK_WARN_SECONDS = float(os.getenv("DB_LEAK_WARN_SECONDS", 30))
+
+# 每日工作模式汇总：间隔不少于 WORK_BREAK_MINUTES 分钟算一次休息，LATE_NIGHT_HOUR 点后仍在忙碌记为深夜工作
+WORK_BREAK_MINUTES = int(os.getenv("WORK_BREAK_MINUTES", 10))
+LATE_NIGHT_HOUR = int(os.getenv("LATE_NIGHT_HOUR", 22))
+
+# 历史数据保留天数：超过期限的记录由归档任务分批移入 *_archive 表
+RETENTION_PERIODS_DAYS = int(os.getenv("RETENTION_PERIODS_DAYS", 90))
+RETENTION_ATTENDANCE_DAYS = int(os.getenv("RETENTION_ATTENDANCE_DAYS", 180))
+RETENTION_HEALTH_MESSAGE_DAYS = int(os.getenv("RETENTION_HEALTH_MESSAGE_DAYS", 180))
+# 归档任务：每批行数、批间暂停（秒）、单次运行最多批数、每天执行的小时
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", 1000))
+ARCHIVE_CHUNK_PAUSE = float(os.getenv("ARCHIVE_CHUNK_PAUSE", 0.2))
+ARCHIVE_MAX_CHUNKS = int(os.getenv("ARCHIVE_MAX_CHUNKS", 500))
+ARCHIVE_HOUR = int(os.getenv("ARCHIVE_HOUR", 3))
+
+# DeepSeek 模型：提醒生成器在应用启动时创建一次并复用
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+# 提醒生成模式：direct 把准备好的数据放入一个提示、一次模型调用；agent 为工具调用代理（多轮调用）
+LLM_GENERATION_MODE = os.getenv("LLM_GENERATION_MODE", "direct")
+# 提醒生成调用模型：全局并发上限、单次调用超时（秒）、失败重试次数与退避基数（秒）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", 20))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", 2))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", 1.0))
+# 单条提醒的生成总时限（秒），超时或模型不可用时改发模板提醒
+# 默认取重试的最坏耗时：每次调用都超时，加上每次退避的最长等待，保证最后一次重试也能完成
+LLM_ALERT_DEADLINE = float(os.getenv(
+    "LLM_ALERT_DEADLINE", LLM_CALL_TIMEOUT * (LLM_RETRIES + 1) + LLM_RETRY_BACKOFF * (2 ** LLM_RETRIES - 1)))
+# 提醒文案缓存：按命中规则、天气、时段、岗位、爱好等输入的指纹缓存，每个指纹保留多条文案轮流使用
+MESSAGE_CACHE_ENABLED = os.getenv("MESSAGE_CACHE_ENABLED", "true").lower() == "true"
+MESSAGE_CACHE_TTL = int(os.getenv("MESSAGE_CACHE_TTL", 3 * 60 * 60))
+MESSAGE_CACHE_MAX_KEYS = int(os.getenv("MESSAGE_CACHE_MAX_KEYS", 512))
+MESSAGE_CACHE_VARIANTS = int(os.getenv("MESSAGE_CACHE_VARIANTS", 3))
+# 批量生成提醒：每次请求的 token 预算（提示+每人输入+每人预留输出）、每人预留输出 token、每批人数上限、单次请求超时（秒）与重试次数
+# 批量失败后还会逐个单独生成，因此批量请求只重试一次
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "true").lower() == "true"
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", 4000))
+LLM_BATCH_OUTPUT_TOKENS = int(os.getenv("LLM_BATCH_OUTPUT_TOKENS", 200))
+LLM_BATCH_MAX_USERS = int(os.getenv("LLM_BATCH_MAX_USERS", 10))
+LLM_BATCH_CALL_TIMEOUT = float(os.getenv("LLM_BATCH_CALL_TIMEOUT", 25))
+LLM_BATCH_RETRIES = int(os.getenv("LLM_BATCH_RETRIES", 1))
+# 一轮状态检查中批量生成阶段的总时限（秒），超时未生成的用户改发模板提醒，已生成的照常发送
+# 默认为批量请求重试的最坏耗时加上单独生成的总时限
+LLM_BATCH_DEADLINE = float(os.getenv(
+    "LLM_BATCH_DEADLINE",
+    LLM_BATCH_CALL_TIMEOUT * (LLM_BATCH_RETRIES + 1) + LLM_RETRY_BACKOFF * (2 ** LLM_BATCH_RETRIES - 1) + LLM_ALERT_DEADLINE))
+# 提示 token 计算：tiktoken 编码名；direct 模式完整数据提示的 token 预算，超出时从最早的日期开始删减工作汇总
+LLM_TOKEN_ENCODING = os.getenv("LLM_TOKEN_ENCODING", "cl100k_base")
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", 1200))
+# 模型后端：deepseek 调用真实接口；fake 为离线替身，回放录制的回复（JSON 字符串数组文件，未配置时用内置文案），可模拟延迟（秒）、抖动（秒）和错误率
+LLM_BACKEND = os.getenv("LLM_BACKEND", "deepseek")
+LLM_FAKE_RESPONSES_FILE = os.getenv("LLM_FAKE_RESPONSES_FILE")
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", 0.8))
+LLM_FAKE_JITTER = float(os.getenv("LLM_FAKE_JITTER", 0.3))
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", 0.0))
@@ -0,0 +1,25 @@
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 事件名：一批用户的考勤处理完成，载荷为其中已签到未签退的用户列表
+ATTENDANCE_PROCESSED = "attendance.processed"
+
+class EventBus:
+    """进程内事件总线：发布时依次同步调用订阅者，订阅者只做排队等轻量操作，耗时工作交给各自的后台任务"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[Any], None]]] = defaultdict(list)
+
+    def subscribe(self, event: str, handler: Callable[[Any], None]):
+        self._handlers[event].append(handler)
+
+    def publish(self, event: str, payload: Any = None):
+        for handler in self._handlers.get(event, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                # 单个订阅者出错不影响其他订阅者和发布方
+                logger.error(f"处理事件 {event} 失败: {e}")
@@ -0,0 +1,65 @@
+import httpx
+import logging
+from typing import Optional
+from core import config
+
+logger = logging.getLogger(__name__)
+
+DINGTALK_API_HOST = "https://api.dingtalk.com"
+DINGTALK_OAPI_HOST = "https://oapi.dingtalk.com"
+AMAP_HOST = "https://restapi.amap.com"
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class HttpClients:
+    """进程级共享的上游HTTP连接池，每个上游主机一个AsyncClient，保持长连接"""
+
+    def __init__(
+            self,
+            timeout: float = config.HTTP_TIMEOUT,
+            max_connections: int = config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections: int = config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry: float = config.HTTP_KEEPALIVE_EXPIRY,
+            http2: bool = config.HTTP2_ENABLED):
+        if http2 and not _http2_available():
+            logger.warning("HTTP/2 已开启但未安装 h2，回退到 HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._timeout = httpx.Timeout(timeout)
+
+        self.dingtalk_api = self._build_client(DINGTALK_API_HOST)
+        self.dingtalk_oapi = self._build_client(DINGTALK_OAPI_HOST)
+        self.amap = self._build_client(AMAP_HOST)
+
+    def _build_client(self, host: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=host,
+            timeout=self._timeout,
+            limits=self._limits,
+            http2=self.http2
+        )
+
+    async def aclose(self):
+        """关闭所有连接池"""
+        for client in (self.dingtalk_api, self.dingtalk_oapi, self.amap):
+            await client.aclose()
+        logger.info("上游HTTP连接池已关闭")
+
+_default_clients: Optional[HttpClients] = None
+
+def get_default_http_clients() -> HttpClients:
+    """未经lifespan注入时（如单独调试某个路由）使用的进程默认连接池"""
+    global _default_clients
+    if _default_clients is None:
+        _default_clients = HttpClients()
+    return _default_clients
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Tuple
+from repository.async_database import async_db
+from repository.archiver import archive_chunk, cutoff_date, prune_parents_chunk, retention_policies
+from core import config
+
+logger = logging.getLogger(__name__)
+
+class ArchiveJob:
+    def __init__(
+            self,
+            chunk_size: int = config.ARCHIVE_CHUNK_SIZE,
+            chunk_pause: float = config.ARCHIVE_CHUNK_PAUSE,
+            max_chunks: int = config.ARCHIVE_MAX_CHUNKS):
+        self.chunk_size = chunk_size
+        # 每批之间暂停，给在线写入让出锁和连接
+        self.chunk_pause = chunk_pause
+        # 单次运行的批数上限，剩余的留到下次运行
+        self.max_chunks = max_chunks
+        self._chunks = 0
+
+    async def _drain(self, func, *args) -> Tuple[int, bool]:
+        """重复执行单批处理直到不足一批或达到批数上限，返回 (处理行数, 是否处理完)"""
+        total = 0
+        while self._chunks < self.max_chunks:
+            count = await async_db.run(func, *args, self.chunk_size)
+            self._chunks += 1
+            total += count
+            if count < self.chunk_size:
+                return total, True
+            await asyncio.sleep(self.chunk_pause)
+        return total, False
+
+    async def run(self) -> Dict[str, Any]:
+        """按保留策略把过期的历史记录分批移入归档表，再把已无子记录的过期父记录（含步数）移入归档表"""
+        started = time.perf_counter()
+        self._chunks = 0
+        policies = retention_policies()
+        moved: Dict[str, int] = {}
+        finished = True
+
+        for table, days in policies.items():
+            moved[table], done = await self._drain(archive_chunk, table, cutoff_date(days))
+            finished = finished and done
+
+        # 所有子表都超出保留期后，父记录才可归档删除
+        pruned, done = await self._drain(prune_parents_chunk, cutoff_date(max(policies.values())))
+        finished = finished and done
+
+        summary = {
+            "archived": moved,
+            "pruned_parents": pruned,
+            "chunks": self._chunks,
+            "finished": finished,
+            "elapsed": round(time.perf_counter() - started, 3),
+        }
+        logger.info(
+            f"归档任务完成：归档 {moved}，归档父记录 {pruned}，共 {self._chunks} 批，耗时 {summary['elapsed']}s"
+            + ("" if finished else "，达到单次批数上限，剩余记录下次处理")
+        )
+        return summary
@@ -1,59 +1,161 @@
+import asyncio
 import logging
+import time
 from datetime import datetime
-from typing import List
-from services.dingtalk.attendance_service import AttendanceService
+from typing import Any, Dict, List
+from services.dingtalk.attendance_service import AttendanceService, ATTENDANCE_LIST_MAX_USERS
 from services.dingtalk.steps_service import SportService
-from api.models.steps import UserStepRequest
-from repository import database
+from api.models.steps import UserStepRequest, UserStepResponse
+from api.models.attendance import AttendanceRecord
+from repository.async_database import async_db
+from core import config
 from fastapi import Depends
 
 logger = logging.getLogger(__name__)
 
 class AttendanceJob:
-    def __init__(self, attendance_service: AttendanceService,sport_service: SportService):
+    def __init__(
+            self,
+            attendance_service: AttendanceService,
+            sport_service: SportService,
+            concurrency: int = config.ATTENDANCE_SWEEP_CONCURRENCY,
+            user_timeout: float = config.ATTENDANCE_USER_TIMEOUT,
+            fetch_timeout: float = config.ATTENDANCE_FETCH_TIMEOUT):
         self.attendance_service = attendance_service
         self.sport_service = sport_service
+        # 同时处理的用户数，1 即为串行
+        self.concurrency = concurrency
+        self.user_timeout = user_timeout
+        # 一组用户的考勤记录分页拉取整体的超时，不按单个用户计算
+        self.fetch_timeout = fetch_timeout
     
-    async def job_process_attendance_for_users(self, userids: List[str]):
-        """处理用户考勤任务"""
+    async def job_process_attendance_for_users(self, userids: List[str]) -> Dict[str, Any]:
+        """处理用户考勤任务：每50人批量拉取一次考勤记录，按信号量限制并发，单个用户超时不影响其他用户"""
+        started = time.perf_counter()
+        concurrency = max(self.concurrency, 1)
+        semaphore = asyncio.Semaphore(concurrency)
+        manager = self.attendance_service.attendance_manager
+        results: Dict[str, Dict[str, Any]] = {}
+
+        # 只为需要签到/签退检查的用户拉取考勤记录
+        in_checkin_period = await manager.is_in_checkin_period()
+        in_checkout_period = await manager.is_in_checkout_period()
+        pending = []
         for userid in userids:
-            try:
-                check_result = await self.attendance_service.attendance_manager.get_attendance_status(userid)
-                check_in_result = check_result.get("checked_in", False)
-                check_out_result = check_result.get("checked_out", False)
-                if not check_in_result and await self.attendance_service.attendance_manager.is_in_checkin_period():
-                    check_in_records = []
-                    result = await self.attendance_service.check_attendance_for_user(userid)
-                    if result.action_taken and result.checked:
-                        for record in result.recordresult:
-                            if record.checkType == "OnDuty":
-                                check_in_records.append(record)
-                        if len(check_in_records):
-                            logger.info(f"接收到用户{userid}签到数据：{check_in_records}")
-                            check_in_result = True
-                            await self.attendance_service.add_attendance_info(result.recordresult,conn=database.get_db_connection())
-                            await self.attendance_service.attendance_manager.mark_checked_in(userid)
-                            logger.info(f"用户 {userid} 已签到")
+            status = await manager.get_attendance_status(userid)
+            if (not status["checked_in"] and in_checkin_period) or \
+                    (status["checked_in"] and not status["checked_out"] and in_checkout_period):
+                pending.append(userid)
+            else:
+                results[userid] = {"status": "ok", "checked_in": status["checked_in"], "checked_out": status["checked_out"], "elapsed": 0.0}
+
+        records_by_user: Dict[str, List[AttendanceRecord]] = {}
+
+        async def fetch_chunk(chunk: List[str]):
+            async with semaphore:
+                try:
+                    grouped = await asyncio.wait_for(
+                        self.attendance_service.check_attendance_for_users(chunk), timeout=self.fetch_timeout)
+                    records_by_user.update(grouped)
+                except asyncio.TimeoutError:
+                    logger.error(f"批量获取考勤记录超时（{self.fetch_timeout}s），用户：{chunk}")
+                    for userid in chunk:
+                        results[userid] = {"status": "timeout", "elapsed": self.fetch_timeout}
+                except Exception as e:
+                    logger.error(f"批量获取考勤记录失败，用户：{chunk}，错误：{e}")
+                    for userid in chunk:
+                        results[userid] = {"status": "failed", "error": str(e), "elapsed": 0.0}
+
+        chunks = [pending[i:i + ATTENDANCE_LIST_MAX_USERS] for i in range(0, len(pending), ATTENDANCE_LIST_MAX_USERS)]
+        await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks])
+        fetch_elapsed = round(time.perf_counter() - started, 3)
+
+        async def run_one(userid: str):
+            async with semaphore:
+                user_started = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(
+                        self._process_attendance_for_user(userid, records_by_user.get(userid, [])),
+                        timeout=self.user_timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"用户 {userid} 考勤处理超时（{self.user_timeout}s）")
+                    result = {"status": "timeout"}
+                except Exception as e:
+                    logger.error(f"用户 {userid} 考勤处理失败: {e}")
+                    result = {"status": "failed", "error": str(e)}
+                result["elapsed"] = round(time.perf_counter() - user_started, 3)
+                results[userid] = result
+
+        await asyncio.gather(*[run_one(userid) for userid in pending if userid in records_by_user])
+
+        summary = {
+            "total": len(userids),
+            "succeeded": sum(1 for r in results.values() if r["status"] == "ok"),
+            "failed": sum(1 for r in results.values() if r["status"] == "failed"),
+            "timed_out": sum(1 for r in results.values() if r["status"] == "timeout"),
+            "concurrency": concurrency,
+            "chunks": len(chunks),
+            "fetch_elapsed": fetch_elapsed,
+            "elapsed": round(time.perf_counter() - started, 3),
+            "results": {userid: results[userid] for userid in userids if userid in results},
+        }
+        logger.info(
+            f"考勤任务完成：共 {summary['total']} 人，成功 {summary['succeeded']}，失败 {summary['failed']}，"
+            f"超时 {summary['timed_out']}，批量查询 {summary['chunks']} 组（耗时 {fetch_elapsed}s），"
+            f"并发 {concurrency}，总耗时 {summary['elapsed']}s"
+        )
+        return summary
+
+    async def _store_attendance_records(self, records: List[AttendanceRecord]):
+        """在工作单元中写入考勤记录，连接用完即归还"""
+        async with async_db.unit_of_work() as conn:
+            await self.attendance_service.add_attendance_info(records, conn=conn)
+
+    async def _store_today_steps(self, userid: str):
+        """签退时拉取当天步数并写入（同时刷新当天工作模式汇总），失败不影响签退"""
+        try:
+            response = await self.sport_service.get_user_steps(
+                UserStepRequest(object_id=userid, stat_dates=datetime.now().strftime("%Y%m%d")))
+            steps = UserStepResponse(**response) if isinstance(response, dict) else response
+            async with async_db.unit_of_work() as conn:
+                await self.sport_service.insert_steps_record(userid, steps, conn=conn)
+        except Exception as e:
+            logger.error(f"用户 {userid} 步数写入失败: {e}")
+
+    async def _process_attendance_for_user(self, userid: str, records: List[AttendanceRecord]) -> Dict[str, Any]:
+        """根据批量拉取到的考勤记录处理单个用户的签到/签退"""
+        check_result = await self.attendance_service.attendance_manager.get_attendance_status(userid)
+        check_in_result = check_result.get("checked_in", False)
+        check_out_result = check_result.get("checked_out", False)
+        stored = False
+        if not check_in_result and await self.attendance_service.attendance_manager.is_in_checkin_period():
+            check_in_records = []
+            for record in records:
+                if record.checkType == "OnDuty":
+                    check_in_records.append(record)
+            if len(check_in_records):
+                logger.info(f"接收到用户{userid}签到数据：{check_in_records}")
+                check_in_result = True
+                await self._store_attendance_records(records)
+                stored = True
+                await self.attendance_service.attendance_manager.mark_checked_in(userid)
+                logger.info(f"用户 {userid} 已签到")
+            
+        if check_in_result and not check_out_result and await self.attendance_service.attendance_manager.is_in_checkout_period():
+            check_out_records = []
+            for record in records:
+                if record.checkType == "OffDuty":
+                    check_out_records.append(record)
+            if len(check_out_records):
+                logger.info(f"接收到用户{userid}签退数据：{check_out_records}")
+                check_out_result = True
+                logger.info(f"用户 {userid} 已签退")
+    
+                # 签退时获取用户步数（同一批记录在签到时已入库则不重复写入）
+                if not stored:
+                    await self._store_attendance_records(records)
+                await self.attendance_service.attendance_manager.mark_checked_out(userid)
+                await self._store_today_steps(userid)
                     
-                if check_in_result and not check_out_result and await self.attendance_service.attendance_manager.is_in_checkout_period():
-                    check_out_records = []
-                    result = await self.attendance_service.check_attendance_for_user(userid)
-                    if result.action_taken and result.checked:
-                        for record in result.recordresult:
-                            if record.checkType == "OffDuty":
-                                check_out_records.append(record)
-                        if len(check_out_records):
-                            logger.info(f"接收到用户{userid}签退数据：{check_out_records}")
-                            check_out_result = True
-                            logger.info(f"用户 {userid} 已签退")
-                
-                            # 签退时获取用户步数
-                            await self.attendance_service.add_attendance_info(result.recordresult,conn=database.get_db_connection())
-                            steps_data = await self.attendance_service.attendance_manager.mark_checked_out(UserStepRequest(userid))
-                            if steps_data:
-                                self.sport_service.insert_steps_record(steps_data)
-                                
-                logger.info(f"用户 {userid} 考勤处理成功，签到状态：{check_in_result}，签退状态：{check_out_result}")
-                
-            except Exception as e:
-                logger.error(f"用户 {userid} 考勤处理失败: {e}")
\ No newline at end of file
+        logger.info(f"用户 {userid} 考勤处理成功，签到状态：{check_in_result}，签退状态：{check_out_result}")
+        return {"status": "ok", "checked_in": check_in_result, "checked_out": check_out_result}
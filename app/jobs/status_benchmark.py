@@ -0,0 +1,246 @@
+"""状态检查提醒生成压测：用离线模型替身和内存中的假服务驱动 StatusJob，为 N 名合成员工跑一轮状态检查
+
+统计每名员工提醒生成耗时的 p50/p95、模型调用次数与 token 用量，不访问网络和数据库
+
+    cd app && python -m jobs.status_benchmark [--users 200] [--latency 0.8] [--jitter 0.3] [--error-rate 0.05] [--single] [--cache]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+# 离线运行时不依赖部署环境变量
+os.environ.setdefault("USER_IDS", "")
+os.environ.setdefault("AGENT_ID", "0")
+
+from jobs import status_job as status_job_module
+from jobs.status_job import StatusJob
+from models.deepseek_model_server import HealthMessageGenerator
+from models.llm_backend import DEFAULT_RESPONSES, ReplayChatModel, load_responses
+from models.message_cache import MessageCache
+
+logger = logging.getLogger(__name__)
+
+NAMES = ["小赵", "小钱", "小孙", "小李", "小周", "小吴", "小郑", "小王", "小冯", "小陈"]
+TITLES = ["算法工程师", "产品经理", "HR", "后端工程师", "测试工程师"]
+HOBBIES = ["散步", "跑步", "瑜伽", "篮球", "羽毛球", "阅读"]
+
+def _fmt(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+class SyntheticWorkforce:
+    """合成员工及其考勤、忙闲、近一周工作汇总、天气和步数；同一序号的员工数据固定"""
+
+    def __init__(self, users: int):
+        self.userids = [f"bench{index:04d}" for index in range(users)]
+        self.now = datetime.now()
+
+    def index(self, userid: str) -> int:
+        return int(userid[len("bench"):])
+
+    def profile(self, userid: str) -> Dict[str, Any]:
+        index = self.index(userid)
+        return {
+            "userid": userid,
+            "name": f"{NAMES[index % len(NAMES)]}{index}",
+            "title": TITLES[index % len(TITLES)],
+            "hobby": HOBBIES[index % len(HOBBIES)],
+            "age": str(24 + index % 20),
+        }
+
+    def busy_now(self, userid: str) -> List[Dict[str, Any]]:
+        # 当前连续忙碌 90/120/150/180 分钟，超过75分钟都会进入提醒流程，约四分之三命中久坐规则
+        minutes = 90 + self.index(userid) % 4 * 30
+        return [{
+            "userid": userid,
+            "date": self.now.strftime("%Y-%m-%d"),
+            "start_datetime": _fmt(self.now - timedelta(minutes=minutes)),
+            "end_datetime": _fmt(self.now + timedelta(minutes=30)),
+        }]
+
+    def history(self, userid: str) -> Dict[str, Dict[str, Any]]:
+        index = self.index(userid)
+        days = {}
+        for offset in range(6, -1, -1):
+            date = (self.now - timedelta(days=offset)).strftime("%Y-%m-%d")
+            late = (index + offset) % 3 == 0
+            days[date] = {
+                "total_busy_minutes": 360 + (index * 7 + offset * 13) % 240,
+                "longest_busy_minutes": 120 + (index * 11 + offset * 17) % 150,
+                "first_busy_at": "08:30" if offset % 2 else "09:10",
+                "last_busy_at": "22:40" if late else "18:30",
+                "late_night": late,
+                "break_count": (index + offset) % 4,
+                "steps": 4000 + (index * 997 + offset * 1531) % 9000,
+            }
+        return days
+
+class _Attendance:
+    def __init__(self):
+        self.attendance_manager = self
+
+    async def get_attendance_status(self, userid: str) -> Dict[str, bool]:
+        return {"checked_in": True, "checked_out": False}
+
+class _FreeBusy:
+    def __init__(self, workforce: SyntheticWorkforce):
+        self.workforce = workforce
+
+    async def get_users_free_busy_now_status(self, userids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        return {userid: self.workforce.busy_now(userid) for userid in userids}
+
+    async def insert_freebusy_record(self, records, conn=None):
+        return None
+
+    async def get_users_daily_summaries(self, userids, start_date, end_date, conn=None):
+        return {userid: self.workforce.history(userid) for userid in userids}
+
+class _Weather:
+    async def get_weather_data(self, city: str, extensions: str = "base") -> Dict[str, Any]:
+        return {"温度(℃)": "31", "天气状况": "多云", "湿度(%)": "82", "风力": "≤3"}
+
+class _Users:
+    def __init__(self, workforce: SyntheticWorkforce):
+        self.workforce = workforce
+
+    async def get_userinfo_from_database(self, userid: str) -> Dict[str, Any]:
+        return self.workforce.profile(userid)
+
+class _Steps:
+    async def get_steps_record(self, userid: str, date: str, conn=None):
+        return None
+
+class _Messages:
+    def __init__(self):
+        self.sent: Dict[str, str] = {}
+
+    async def async_send_message(self, request):
+        return None
+
+    async def insert_health_message(self, userid: str, message: str, sent_at: datetime):
+        self.sent[userid] = message
+
+class _MemoryDatabase:
+    """代替 async_db：状态检查中的记录与历史查询由假服务完成，不需要真实连接"""
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        yield None
+
+class TimedGenerator:
+    """记录每名员工提醒的生成耗时，其余属性转给被包装的生成器；批量生成时同批员工耗时相同"""
+
+    def __init__(self, generator: HealthMessageGenerator):
+        self._generator = generator
+        self.latencies: List[float] = []
+
+    def __getattr__(self, name):
+        return getattr(self._generator, name)
+
+    async def agenerate(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self._generator.agenerate(*args, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    async def agenerate_batch(self, items, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self._generator.agenerate_batch(items, *args, **kwargs)
+        finally:
+            self.latencies.extend([time.perf_counter() - started] * len(items))
+
+def _percentile(values: List[float], q: float) -> float:
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+async def run_status_benchmark(
+        users: int = 50,
+        llm=None,
+        batch: bool = True,
+        cache: bool = False,
+        **generator_kwargs) -> Dict[str, Any]:
+    """为 users 名合成员工跑一轮 StatusJob 状态检查，返回生成耗时分位数、模型调用与 token 统计"""
+    workforce = SyntheticWorkforce(users)
+    messages = _Messages()
+    generator = TimedGenerator(HealthMessageGenerator(
+        llm=llm or ReplayChatModel(),
+        mode="direct",
+        cache=MessageCache() if cache else None,
+        **generator_kwargs
+    ))
+    job = StatusJob(
+        _FreeBusy(workforce), _Weather(), _Attendance(), messages, _Users(workforce), _Steps(),
+        message_generator=generator, batch_generation=batch)
+
+    original_db = status_job_module.async_db
+    status_job_module.async_db = _MemoryDatabase()
+    try:
+        started = time.perf_counter()
+        summary = await job.check_user_status_and_send_alerts(workforce.userids)
+        elapsed = time.perf_counter() - started
+    finally:
+        status_job_module.async_db = original_db
+
+    stats = generator.stats()
+    alerts = max(summary["alerted"], 1)
+    return {
+        "users": users,
+        "alerted": summary["alerted"],
+        "no_rule": summary["no_rule"],
+        "failed": summary["failed"],
+        "sweep_s": round(elapsed, 3),
+        "gen_p50_ms": round(_percentile(generator.latencies, 50) * 1000, 1),
+        "gen_p95_ms": round(_percentile(generator.latencies, 95) * 1000, 1),
+        "gen_max_ms": round(max(generator.latencies, default=0.0) * 1000, 1),
+        "llm_calls": stats["calls"],
+        "llm_failed": stats["failed"],
+        "llm_timeouts": stats["timeouts"],
+        "retries": stats["retries"],
+        "batch_fallbacks": stats["batch_fallbacks"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "tokens_per_alert": round((stats["prompt_tokens"] + stats["completion_tokens"]) / alerts, 1),
+        "cache_hit_rate": stats["cache"]["hit_rate"] if "cache" in stats else "-",
+    }
+
+def format_report(result: Dict[str, Any]) -> str:
+    width = max(len(key) for key in result)
+    return "\n".join(f"{key:<{width}}  {value}" for key, value in result.items())
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m jobs.status_benchmark")
+    parser.add_argument("--users", type=int, default=50, help="合成员工人数")
+    parser.add_argument("--latency", type=float, default=0.8, help="模型替身每次调用的基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.3, help="延迟的均匀抖动幅度（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模型替身每次调用失败的概率")
+    parser.add_argument("--seed", type=int, default=None, help="延迟与失败的随机种子")
+    parser.add_argument("--responses", default=None, help="录制回复文件（JSON 字符串数组）")
+    parser.add_argument("--single", action="store_true", help="关闭批量生成，每名员工单独调用模型")
+    parser.add_argument("--cache", action="store_true", help="启用提醒文案缓存")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    llm = ReplayChatModel(
+        responses=load_responses(args.responses) if args.responses else list(DEFAULT_RESPONSES),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    result = asyncio.run(run_status_benchmark(args.users, llm=llm, batch=not args.single, cache=args.cache))
+    print(format_report(result))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
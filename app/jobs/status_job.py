@@ -1,7 +1,8 @@
+import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import List
-from repository import database
+from typing import Any, Dict, List, Tuple
+from repository.async_database import async_db
 from services.dingtalk.FreeBusy_service import FreeBusyService
 from services.amap.weather_service import WeatherService
 from services.dingtalk.attendance_service import AttendanceService
@@ -9,7 +10,10 @@ from services.dingtalk.message_service import SendMessageService
 from services.dingtalk.user_service import UserService
 from services.dingtalk.steps_service import SportService
 from utils.change_time_format import change_time_format
-from models.deepseek_model_server import create_message
+from utils.stage_timer import StageTimer
+from models.deepseek_model_server import HealthMessageGenerator, default_generator
+from models.fallback_message import fallback_message
+from utils.health_rules import evaluate_rules
 from core import config
 from api.models.FreeBusy import FreeBusyRequest
 from api.models.message import AsyncSendRequest,Message,TextContent
@@ -24,105 +28,325 @@ class StatusJob:
                  attendance_service: AttendanceService,
                  message_service: SendMessageService,
                  user_service: UserService,
-                 steps_service: SportService):
+                 steps_service: SportService,
+                 message_generator: HealthMessageGenerator = None,
+                 fetch_concurrency: int = config.STATUS_FETCH_CONCURRENCY,
+                 llm_concurrency: int = config.STATUS_LLM_CONCURRENCY,
+                 send_concurrency: int = config.STATUS_SEND_CONCURRENCY,
+                 batch_generation: bool = config.LLM_BATCH_ENABLED):
         self.freebusy_service = freebusy_service
         self.weather_service = weather_service
         self.attendance_service = attendance_service
         self.message_service = message_service
         self.user_service = user_service
         self.steps_service = steps_service
+        # 应用启动时创建的提醒生成器，未传入时使用进程内共享实例
+        self.message_generator = message_generator
+        self.fetch_concurrency = fetch_concurrency
+        self.llm_concurrency = llm_concurrency
+        self.send_concurrency = send_concurrency
+        # direct 模式下把多名用户的提醒合并生成
+        self.batch_generation = batch_generation
     
-    async def check_user_status_and_send_alerts(self, userids: List[str]):
-        """检查用户状态并发送提醒"""
+    async def check_user_status_and_send_alerts(self, userids: List[str]) -> Dict[str, Any]:
+        """检查用户状态并发送提醒，返回本轮各结果的人数与各阶段耗时"""
         
         logger.info(f"检查用户状态并发送提醒，用户列表：{userids}")
+        timer = StageTimer()
+        fetch_semaphore = asyncio.Semaphore(max(self.fetch_concurrency, 1))
+        llm_semaphore = asyncio.Semaphore(max(self.llm_concurrency, 1))
+        send_semaphore = asyncio.Semaphore(max(self.send_concurrency, 1))
+
+        # 先筛出已签到未签退的用户，再批量查询其忙闲状态
+        with timer.stage("state"):
+            busy_by_user, lookup_failed = await self._load_busy_periods(userids)
+        for userid, freebusy_result in busy_by_user.items():
+            if not freebusy_result:
+                logger.info(f"检查到用户{userid}暂时没有忙碌状态")
+
+        # 记录与历史查询共用一个连接：一次写入所有用户的忙碌时段，再一次查询待提醒用户最近7天的工作状态
+        try:
+            async with async_db.unit_of_work() as conn:
+                with timer.stage("record"):
+                    alert_userids = await self._record_busy_periods(busy_by_user, conn)
+                with timer.stage("history"):
+                    history = await self._load_work_history(alert_userids, conn)
+        except Exception as e:
+            logger.error(f"记录忙碌时段/查询工作状态失败: {e}")
+            alert_userids = [userid for userid, result in busy_by_user.items() if result and self._need_alert(userid, result)]
+            history = {}
+
+        # 批量模式：先准备全部待提醒用户的上下文，再合并为少量模型请求生成，最后并发发送；
+        # 否则各用户并发走完 上下文->生成->发送 流水线，各阶段并发分别限制
+        if self.batch_generation and self._generator().mode == "direct":
+            by_user = await self._send_health_alerts_batched(
+                alert_userids, timer, fetch_semaphore, send_semaphore, history, busy_by_user)
+            outcomes = [by_user.get(userid, "skipped") for userid in userids]
+        else:
+            async def run_one(userid: str) -> str:
+                if userid not in alert_userids:
+                    return "skipped"
+                try:
+                    sent = await self._send_health_alert(
+                        userid, timer, fetch_semaphore, llm_semaphore, send_semaphore,
+                        work_status=history.get(userid), busy_periods=busy_by_user.get(userid))
+                    return "alerted" if sent else "no_rule"
+                except Exception as e:
+                    logger.error(f"用户 {userid} 状态检查失败: {e}")
+                    return "failed"
+
+            outcomes = await asyncio.gather(*[run_one(userid) for userid in userids])
+        # 忙闲查询失败的用户状态未知，计为失败而不是当作空闲跳过
+        outcomes = ["failed" if userid in lookup_failed else outcome for userid, outcome in zip(userids, outcomes)]
+        summary = {
+            "total": len(userids),
+            "alerted": outcomes.count("alerted"),
+            "skipped": outcomes.count("skipped"),
+            "no_rule": outcomes.count("no_rule"),
+            "failed": outcomes.count("failed"),
+            "elapsed": timer.elapsed(),
+            "stages": timer.summary(),
+        }
+        if self.message_generator is not None:
+            # 模型调用与文案缓存的累计统计（命中率、省去的模型调用次数）
+            summary["generation"] = self.message_generator.stats()
+        logger.info(
+            f"状态检查完成：共 {summary['total']} 人，提醒 {summary['alerted']}，跳过 {summary['skipped']}，未命中规则 {summary['no_rule']}，"
+            f"失败 {summary['failed']}，耗时 {summary['elapsed']}s，各阶段耗时：{summary['stages']}"
+            + (f"，文案缓存：{summary['generation']['cache']}" if "cache" in summary.get("generation", {}) else "")
+        )
+        return summary
+
+    async def _load_busy_periods(self, userids: List[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], set]:
+        """筛选已签到未签退的用户，并批量查询其最近的忙碌时段，返回 (按用户分组的忙碌时段, 忙闲查询失败的用户)"""
+        checked_in_users = []
         for userid in userids:
+            # 检查用户考勤状态          
+            attendance_status = await self.attendance_service.attendance_manager.get_attendance_status(userid)
+            check_in_result = attendance_status["checked_in"]
+            check_out_result = attendance_status["checked_out"]
+            logger.info(f"检查到用户 {userid} 考勤状态，签到状态：{check_in_result},签退状态：{check_out_result}")
+            if check_in_result and not check_out_result:
+                checked_in_users.append(userid)
+
+        if not checked_in_users:
+            return {}, set()
+        logger.info(f"开始批量查询用户忙闲状态：{checked_in_users}")
+        try:
+            busy_by_user = await self.freebusy_service.get_users_free_busy_now_status(checked_in_users)
+        except Exception as e:
+            logger.error(f"批量查询用户忙闲状态失败: {e}")
+            return {}, set(checked_in_users)
+        # 查询失败的用户不在结果中
+        lookup_failed = {userid for userid in checked_in_users if userid not in busy_by_user}
+        if lookup_failed:
+            logger.warning(f"用户忙闲状态查询失败，本轮不检查：{sorted(lookup_failed)}")
+        return busy_by_user, lookup_failed
+
+    async def _record_busy_periods(self, busy_by_user: Dict[str, List[Dict[str, Any]]], conn=None) -> List[str]:
+        """批量保存用户忙碌时段，返回忙碌时长超过阈值、需要发送提醒的用户"""
+        records = [item for freebusy_result in busy_by_user.values() for item in freebusy_result]
+        if records:
             try:
-                # 检查用户考勤状态          
-                attendance_status = await self.attendance_service.attendance_manager.get_attendance_status(userid)
-                check_in_result = attendance_status["checked_in"]
-                check_out_result = attendance_status["checked_out"]
-                logger.info(f"检查到用户 {userid} 考勤状态，签到状态：{check_in_result},签退状态：{check_out_result}")
-                if check_in_result and not check_out_result:
-
-                    logger.info(f"开始查询用户{userid}忙闲状态...")
-                    freebusy_result = await self.freebusy_service.get_user_free_busy_now_status(userid)
-                    if freebusy_result != []:
-                        
-                        logger.info(f"检查到用户 {userid} 忙碌：{freebusy_result}")
-                        await self.freebusy_service.insert_freebusy_record(freebusy_result,conn=database.get_db_connection())
-                        # 检查在线时长
-                        online_duration = 0
-                        for i in range(len(freebusy_result)):
-                            online_duration += change_time_format( freebusy_result[i]["start_datetime"], freebusy_result[i]["end_datetime"])
-                        
-                        if online_duration > 75 * 60:  # 90分钟
-                            logger.info(f"检查到用户 {userid} 忙碌时长超过75分钟")
-                            await self._send_health_alert(userid)
-                    else:
-                        logger.info(f"检查到用户{userid}暂时没有忙碌状态")
-                
+                await self.freebusy_service.insert_freebusy_record(records, conn=conn)
             except Exception as e:
-                logger.error(f"用户 {userid} 状态检查失败: {e}")
-    
-    async def _send_health_alert(self, userid: str):
-        """发送健康提醒"""
+                # 记录失败不影响本轮提醒
+                logger.error(f"保存用户忙碌时段失败: {e}")
+
+        alert_userids = []
+        for userid, freebusy_result in busy_by_user.items():
+            if freebusy_result and self._need_alert(userid, freebusy_result):
+                alert_userids.append(userid)
+        return alert_userids
+
+    def _need_alert(self, userid: str, freebusy_result: List[Dict[str, Any]]) -> bool:
+        """检查在线时长是否超过阈值"""
+        logger.info(f"检查到用户 {userid} 忙碌：{freebusy_result}")
+        online_duration = 0
+        for i in range(len(freebusy_result)):
+            online_duration += change_time_format( freebusy_result[i]["start_datetime"], freebusy_result[i]["end_datetime"])
+        
+        if online_duration > 75 * 60:  # 90分钟
+            logger.info(f"检查到用户 {userid} 忙碌时长超过75分钟")
+            return True
+        return False
+
+    def _history_range(self):
+        """最近7天（含今天）的起止日期"""
+        today = datetime.now()
+        return (today - timedelta(days=6)).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
+
+    async def _load_work_history(self, userids: List[str], conn=None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """一次查询获取多个用户最近7天的每日工作模式汇总，失败时由各用户单独查询"""
+        if not userids:
+            return {}
+        start_date, end_date = self._history_range()
         try:
-            
-            logger.info("开始生成并发送健康提醒...")
+            return await self.freebusy_service.get_users_daily_summaries(userids, start_date, end_date, conn=conn)
+        except Exception as e:
+            logger.error(f"批量查询最近7天工作状态失败: {e}")
+            return {}
 
-            # 获取用户信息
-            user_info = self.user_service.get_userinfo_from_database(userid,conn=database.get_db_connection())
-            user_info_dict = { "employee_info": user_info}
+    async def _gather_context(self, userid: str, history: Dict[str, Dict[str, Any]] = None) -> Dict[str, Any]:
+        """并行获取生成提醒所需的员工信息、天气、近7天工作状态和步数（history为批量预取的每日工作模式汇总）"""
+        async def load_work_status():
+            if history is not None:
+                return history
+            start_date, end_date = self._history_range()
+            summaries = await self.freebusy_service.get_users_daily_summaries([userid], start_date, end_date)
+            return summaries.get(userid, {})
 
-            # 获取天气信息
-            weather_info = await self.weather_service.get_weather_data(config.DEFAULT_CITY)
-            weather_info_dict = { "weather": weather_info}
+        user_info, weather_info, work_status, steps_info = await asyncio.gather(
+            self.user_service.get_userinfo_from_database(userid),
+            self.weather_service.get_weather_data(config.DEFAULT_CITY),
+            load_work_status(),
+            self.steps_service.get_steps_record(userid,date=datetime.now().strftime("%Y-%m-%d"))
+        )
+        logger.info(f"检查到用户 {userid} 最近7天工作状态:{work_status}")
 
-            # 获取最近7天工作状态
-            target_dates = [
-                (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d") 
-                for i in range(7)
-            ]
+        #整合所有数据
+        return {
+            "employee_info": user_info,
+            "weather": weather_info,
+            "work_status": work_status,
+            "steps": steps_info
+        }
 
-            work_status = await self.freebusy_service.get_online_time_periods(userid,target_dates,conn=database.get_db_connection())
-            work_status_dict = {"work_status": work_status}
-            logger.info(f"检查到用户 {userid} 最近7天工作状态:{work_status}")
+    async def _prepare_alert(
+            self,
+            userid: str,
+            timer: StageTimer,
+            fetch_semaphore: asyncio.Semaphore,
+            work_status: Dict[str, Dict[str, Any]] = None,
+            busy_periods: List[Dict[str, Any]] = None):
+        """获取上下文并计算命中的提醒规则，未命中任何规则时返回 None"""
+        async with fetch_semaphore:
+            with timer.stage("context"):
+                all_data = await self._gather_context(userid, work_status)
+        # 本轮查询到的最近忙碌时段，用于计算当前连续忙碌时长
+        all_data["busy_periods"] = busy_periods
 
-            # 获取步数信息
-            steps_info = await self.steps_service.get_steps_record(userid,date=datetime.now().strftime("%Y-%m-%d"),conn=database.get_db_connection())
-            steps_info_dict = { "steps": steps_info}
+        rules = evaluate_rules(all_data)
+        if not rules:
+            logger.info(f"用户 {userid} 当前未命中任何提醒规则，跳过生成")
+            return None
+        logger.info(f"用户 {userid} 命中提醒规则：{[rule['rule'] for rule in rules]}")
+        return all_data, rules
 
-            #整合所有数据
-            all_data = {**user_info_dict, **weather_info_dict, **work_status_dict,**steps_info_dict}
+    async def _deliver_alert(self, userid: str, health_msg: str, timer: StageTimer, send_semaphore: asyncio.Semaphore):
+        """发送提醒并保存提醒记录"""
+        async with send_semaphore:
+            with timer.stage("send"):
+                # 发送消息
+                request = AsyncSendRequest(
+                userid_list=userid,
+                agent_id = int(config.AGENT_ID),
+                msg=Message(
+                    msgtype="text",
+                    text=TextContent(
+                        content= health_msg 
+                    )
+                )
+                )
+                await self.message_service.async_send_message(request)
+                logger.info(f"发送健康提醒，用户：{userid}")
+                # 保存提醒记录
+                await self.message_service.insert_health_message(userid, health_msg, datetime.now())
+                logger.info(f"保存健康提醒记录，用户：{userid}")
 
-            # 生成健康消息（这里可以调用AI模型）
-            health_msg = await self._generate_health_message(all_data)
-            
+    async def _send_health_alert(
+            self,
+            userid: str,
+            timer: StageTimer,
+            fetch_semaphore: asyncio.Semaphore,
+            llm_semaphore: asyncio.Semaphore,
+            send_semaphore: asyncio.Semaphore,
+            work_status: Dict[str, Dict[str, Any]] = None,
+            busy_periods: List[Dict[str, Any]] = None) -> bool:
+        """发送健康提醒，规则引擎未命中任何提醒规则时不调用模型、不发送，返回是否已发送"""
+        logger.info("开始生成并发送健康提醒...")
+
+        prepared = await self._prepare_alert(userid, timer, fetch_semaphore, work_status, busy_periods)
+        if prepared is None:
+            return False
+        all_data, rules = prepared
+
+        # 生成健康消息（这里可以调用AI模型），llm_semaphore 只在每次模型调用期间占用，退避等待时让给其他用户
+        with timer.stage("generate"):
+            health_msg = await self._generate_health_message(all_data, rules, llm_semaphore)
+        
+        logger.info(f"生成健康提醒：{health_msg}")
+        await self._deliver_alert(userid, health_msg, timer, send_semaphore)
+        return True
+
+    async def _send_health_alerts_batched(
+            self,
+            userids: List[str],
+            timer: StageTimer,
+            fetch_semaphore: asyncio.Semaphore,
+            send_semaphore: asyncio.Semaphore,
+            history: Dict[str, Dict[str, Dict[str, Any]]],
+            busy_by_user: Dict[str, List[Dict[str, Any]]]) -> Dict[str, str]:
+        """批量模式：先并发准备所有用户的上下文和命中规则，再合并成少量模型请求生成，最后并发发送；返回各用户的结果"""
+        outcomes: Dict[str, str] = {}
+
+        async def prepare(userid: str):
+            try:
+                return userid, await self._prepare_alert(
+                    userid, timer, fetch_semaphore, history.get(userid), busy_by_user.get(userid))
+            except Exception as e:
+                logger.error(f"用户 {userid} 状态检查失败: {e}")
+                outcomes[userid] = "failed"
+                return userid, None
+
+        prepared = {}
+        for userid, result in await asyncio.gather(*[prepare(userid) for userid in userids]):
+            if result is not None:
+                prepared[userid] = result
+            elif userid not in outcomes:
+                outcomes[userid] = "no_rule"
+
+        messages: Dict[str, str] = {}
+        if prepared:
+            with timer.stage("generate"):
+                try:
+                    # 超过总时限时只有未生成的用户改用模板提醒
+                    messages = await self._generator().agenerate_batch(
+                        [(userid, all_data, rules) for userid, (all_data, rules) in prepared.items()],
+                        deadline=config.LLM_BATCH_DEADLINE
+                    )
+                except Exception as e:
+                    logger.warning(f"批量生成健康提醒失败: {e}，改用模板提醒")
+
+        async def deliver(userid: str):
+            all_data, rules = prepared[userid]
+            health_msg = messages.get(userid) or fallback_message(all_data, rules=rules)
             logger.info(f"生成健康提醒：{health_msg}")
-            
-            # 发送消息
-            request = AsyncSendRequest(
-            userid_list=userid,
-            agent_id = int(config.AGENT_ID),
-            msg=Message(
-                msgtype="text",
-                text=TextContent(
-                    content= health_msg 
-                )
-            )
-            )
-            await self.message_service.async_send_message(request)
-            logger.info(f"发送健康提醒，用户：{userid}")
-            # 保存提醒记录
-            await self.message_service.insert_health_message(userid, health_msg, datetime.now(),conn=database.get_db_connection())
-            logger.info(f"保存健康提醒记录，用户：{userid}")
-
-            
+            try:
+                await self._deliver_alert(userid, health_msg, timer, send_semaphore)
+                outcomes[userid] = "alerted"
+            except Exception as e:
+                logger.error(f"用户 {userid} 状态检查失败: {e}")
+                outcomes[userid] = "failed"
+
+        await asyncio.gather(*[deliver(userid) for userid in prepared])
+        return outcomes
+
+    def _generator(self) -> HealthMessageGenerator:
+        return self.message_generator or default_generator()
+
+    async def _generate_health_message(
+            self,
+            all_data:dict,
+            rules: List[Dict[str, Any]] = None,
+            limiter: asyncio.Semaphore = None):
+        """生成健康提醒消息(集成AI模型)，超过总时限或模型不可用时改用模板提醒，保证提醒按时发出"""
+        generator = self._generator()
+        try:
+            return await asyncio.wait_for(
+                generator.agenerate(all_data, rules=rules, limiter=limiter), timeout=config.LLM_ALERT_DEADLINE)
+        except asyncio.TimeoutError:
+            logger.warning(f"生成健康提醒超过 {config.LLM_ALERT_DEADLINE}s，改用模板提醒")
         except Exception as e:
-            logger.error(f"发送健康提醒失败: {e}")
-    
-    async def _generate_health_message(self, all_data:dict):
-        """生成健康提醒消息(集成AI模型)"""
-        content =create_message(all_data)
-        return content
\ No newline at end of file
+            logger.warning(f"{e}，改用模板提醒")
+        return fallback_message(all_data, rules=rules)
\ No newline at end of file
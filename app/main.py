@@ -12,7 +12,7 @@ app_dir = os.path.dirname(current_dir)
 sys.path.insert(0, app_dir) 
 
 from app.core import config
-from app.repository import database
+from app.core.http_client import HttpClients
 from app.services.scheduler.scheduler_service import SchedulerService
 from app.services.dingtalk.FreeBusy_service import FreeBusyService
 from app.services.amap.weather_service import WeatherService
@@ -22,8 +22,16 @@ from app.services.dingtalk.user_service import UserService
 from app.services.dingtalk.steps_service import SportService
 from app.jobs.attendance_job import AttendanceJob
 from app.jobs.status_job import StatusJob
-from app.repository import database
+from app.jobs.archive_job import ArchiveJob
 from app.api.endpoints import Attendance, Weather, User, Calendar, FreeBusy, Steps
+# 各服务通过 api.dependencies.dingtalk_token / repository.* 访问共享实例，这里需引用同一个模块
+from api.dependencies.dingtalk_token import token_manager
+from repository import database
+from repository.async_database import async_db
+from repository import migrations
+from models.deepseek_model_server import HealthMessageGenerator
+from models.message_cache import MessageCache
+from repository.identity_map import identity_map
 
 # 配置日志
 def setup_logging():
@@ -60,15 +68,27 @@ async def lifespan(app: FastAPI):
     
     # 初始化数据库
     database.init_db()
+    if config.DB_AUTO_MIGRATE:
+        await async_db.run(migrations.apply_migrations)
+    # 加载员工 userid <-> unionid 映射（失败时查询会逐批回查数据库）
+    try:
+        await identity_map.load()
+    except Exception as e:
+        logger.error(f"员工ID映射加载失败: {e}")
+
+    # 初始化上游HTTP共享连接池，token管理器与各服务共用
+    http_clients = HttpClients()
+    token_manager.bind_client(http_clients.dingtalk_api)
+    app.state.http_clients = http_clients
     
     # 初始化用户数据
-    user_service = UserService()
+    user_service = UserService(http_clients)
     logger.info(f"获取并保存以下用户信息: {config.USER_IDS}")
     for userid in config.USER_IDS:
         try:
             user_info = await user_service.get_user_details(userid)
             user_dict = user_info.model_dump() 
-            user_service.add_employee_info(user_dict,conn=database.get_db_connection())
+            await user_service.add_employee_info(user_dict)
             # 保存用户信息到数据库
             logger.info(f"用户 {userid} 数据初始化成功")
         except Exception as e:
@@ -76,20 +96,27 @@ async def lifespan(app: FastAPI):
     
     # 初始化调度器
     attendance_manager = AttendanceManager()
-    attendance_service = AttendanceService(attendance_manager)
+    attendance_service = AttendanceService(attendance_manager, http_clients)
 
-    free_busy_service = FreeBusyService()
-    weather_service = WeatherService()
-    message_service = SendMessageService()
-    user_service= UserService()
-    steps_service = SportService()
+    free_busy_service = FreeBusyService(http_clients)
+    weather_service = WeatherService(http_clients)
+    app.state.weather_service = weather_service
+    message_service = SendMessageService(http_clients)
+    user_service= UserService(http_clients)
+    steps_service = SportService(http_clients)
 
     # 然后创建 attendance_job，传入必需的参数
     attendance_job = AttendanceJob(attendance_service,steps_service)
 
-    status_job = StatusJob(free_busy_service, weather_service, attendance_service, message_service, user_service,steps_service)
+    # 模型客户端、提示和代理只构建一次，各次提醒复用
+    message_generator = HealthMessageGenerator(cache=MessageCache() if config.MESSAGE_CACHE_ENABLED else None)
+    app.state.message_generator = message_generator
 
-    scheduler_service = SchedulerService(attendance_job, status_job)
+    status_job = StatusJob(free_busy_service, weather_service, attendance_service, message_service, user_service,steps_service,message_generator)
+
+    archive_job = ArchiveJob()
+
+    scheduler_service = SchedulerService(attendance_job, status_job, archive_job)
     
     await scheduler_service.start_schedulers()
     app.state.scheduler_service = scheduler_service
@@ -99,7 +126,10 @@ async def lifespan(app: FastAPI):
     # 关闭应用
     logger.info("应用关闭中...")
     await scheduler_service.shutdown_schedulers()
-    await database.close_db()
+    await token_manager.aclose()
+    await http_clients.aclose()
+    async_db.shutdown()
+    database.close_db()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -130,6 +160,11 @@ async def log_requests(request: Request, call_next):
 async def root():
     return {"message": "Health Guardian API is running"}
 
+@app.get("/stats/db")
+async def db_stats():
+    #数据库线程池排队、连接等待与查询耗时统计
+    return async_db.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
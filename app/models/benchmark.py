@@ -0,0 +1,204 @@
+"""提醒生成模式对比：在固定样例上分别用 direct / agent / rules 模式生成，统计耗时、模型调用次数与 token 用量
+
+rules 模式先由规则引擎判断，未命中规则的样例不调用模型，命中时只把命中的规则交给模型
+--context 只对比样例数据原样放入提示与压缩后的 token 数，不调用模型
+
+    cd app && python -m models.benchmark [--runs 3] [--modes direct agent rules]
+    cd app && python -m models.benchmark --context [--budget 1200]
+"""
+import argparse
+import logging
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+from datetime import datetime
+from models.prompt_context import build_context
+from models.tokens import UsageRecorder, count_tokens
+from utils.health_rules import evaluate_rules
+
+logger = logging.getLogger(__name__)
+
+def _summary(total, longest, first, last, late_night, breaks, steps):
+    return {
+        "total_busy_minutes": total,
+        "longest_busy_minutes": longest,
+        "first_busy_at": first,
+        "last_busy_at": last,
+        "late_night": late_night,
+        "break_count": breaks,
+        "steps": steps,
+    }
+
+# 固定样例：(名称, 当前时间, 员工数据)，覆盖高温下午、午休、深夜、步数不足、常规几种情况
+BENCHMARK_CASES = [
+    ("hot_afternoon", "2025-09-22 15:10", {
+        "employee_info": {"userid": "manager4585", "name": "小赵", "title": "算法工程师", "hobby": "散步", "age": "25"},
+        "weather": {"温度(℃)": 33, "天气状况": "晴", "湿度(%)": 55, "风力": 2},
+        "work_status": {
+            "2025-09-20": _summary(410, 230, "08:40", "19:00", False, 2, 9000),
+            "2025-09-21": _summary(455, 200, "08:30", "19:00", False, 2, 7600),
+            "2025-09-22": _summary(300, 190, "08:30", "15:00", False, 1, 4200),
+        },
+        "steps": {"2025-09-20": 9000, "2025-09-21": 7600, "2025-09-22": 4200},
+    }),
+    ("lunch_break", "2025-09-22 12:20", {
+        "employee_info": {"userid": "hr0102", "name": "小李", "title": "HR", "hobby": "瑜伽", "age": "31"},
+        "weather": {"温度(℃)": 24, "天气状况": "多云", "湿度(%)": 85, "风力": 3},
+        "work_status": {
+            "2025-09-21": _summary(380, 150, "09:00", "18:10", False, 3, 10500),
+            "2025-09-22": _summary(170, 170, "09:10", "12:15", False, 0, 3100),
+        },
+        "steps": {"2025-09-21": 10500, "2025-09-22": 3100},
+    }),
+    ("late_night", "2025-09-22 22:40", {
+        "employee_info": {"userid": "dev0231", "name": "小王", "title": "后端工程师", "hobby": "篮球", "age": "28"},
+        "weather": {"温度(℃)": 19, "天气状况": "小雨", "湿度(%)": 70, "风力": 2},
+        "work_status": {
+            "2025-09-19": _summary(560, 260, "09:30", "23:10", True, 1, 5200),
+            "2025-09-20": _summary(590, 300, "09:20", "23:40", True, 0, 4800),
+            "2025-09-21": _summary(510, 280, "10:00", "22:50", True, 1, 6100),
+            "2025-09-22": _summary(600, 320, "09:00", "22:35", True, 0, 3900),
+        },
+        "steps": {"2025-09-20": 4800, "2025-09-21": 6100, "2025-09-22": 3900},
+    }),
+    ("early_after_late", "2025-09-22 07:30", {
+        "employee_info": {"userid": "pm0077", "name": "小陈", "title": "产品经理", "hobby": "跑步", "age": "35"},
+        "weather": {"温度(℃)": 21, "天气状况": "阴", "湿度(%)": 60, "风力": 4},
+        "work_status": {
+            "2025-09-21": _summary(620, 240, "08:00", "23:30", True, 2, 12000),
+            "2025-09-22": _summary(40, 40, "06:50", "07:30", False, 0, 800),
+        },
+        "steps": {"2025-09-20": 11000, "2025-09-21": 12000, "2025-09-22": 800},
+    }),
+    ("regular_day", "2025-09-22 10:30", {
+        "employee_info": {"userid": "qa0410", "name": "小周", "title": "测试工程师", "hobby": "羽毛球", "age": "27"},
+        "weather": {"温度(℃)": 26, "天气状况": "多云", "湿度(%)": 45, "风力": 2},
+        "work_status": {
+            "2025-09-21": _summary(400, 110, "09:00", "18:00", False, 4, 9500),
+            "2025-09-22": _summary(80, 80, "09:10", "10:30", False, 0, 2100),
+        },
+        "steps": {"2025-09-20": 9800, "2025-09-21": 9500, "2025-09-22": 2100},
+    }),
+]
+
+def _periods(date, *spans):
+    return [(f"{date} {start}:00", f"{date} {end}:00") for start, end in spans]
+
+# 原始忙碌时段形式的近一周记录（旧版本直接把时段列表放入提示），只用于对比上下文 token 数
+RAW_HISTORY_CASE = ("raw_periods", "2025-09-22 15:10", {
+    "employee_info": {"userid": "manager4585", "name": "小赵", "title": "算法工程师", "hobby": "散步", "age": "25"},
+    "weather": {"温度(℃)": "33", "天气状况": "晴", "湿度(%)": "55", "风力": "≤3"},
+    "work_status": {
+        "2025-09-16": _periods("2025-09-16", ("09:05", "10:30"), ("10:40", "12:00"), ("13:30", "15:10"), ("15:20", "18:30")),
+        "2025-09-17": _periods("2025-09-17", ("08:50", "11:40"), ("13:20", "16:00"), ("16:05", "19:10"), ("20:30", "22:40")),
+        "2025-09-18": _periods("2025-09-18", ("09:30", "11:00"), ("13:30", "14:20"), ("15:30", "17:00")),
+        "2025-09-19": _periods("2025-09-19", ("08:30", "10:40"), ("13:20", "15:50"), ("17:20", "19:00")),
+        "2025-09-20": _periods("2025-09-20", ("08:40", "11:00"), ("13:00", "14:30"), ("15:30", "17:30"), ("18:00", "19:00")),
+        "2025-09-21": _periods("2025-09-21", ("08:30", "11:45"), ("14:00", "16:30"), ("17:30", "19:00")),
+        "2025-09-22": _periods("2025-09-22", ("08:30", "11:45"), ("14:00", "15:05")),
+    },
+    "steps": {"steps": 4200},
+})
+
+def compare_context_tokens(budget: int = None) -> List[Dict[str, Any]]:
+    """每个样例的员工数据原样序列化放入提示（压缩前）与压缩后上下文的 token 数"""
+    from models.deepseek_model_server import _to_prompt_json
+
+    rows = []
+    for name, current_time, employee_data in [*BENCHMARK_CASES, RAW_HISTORY_CASE]:
+        before = count_tokens(current_time) + sum(
+            count_tokens(_to_prompt_json(employee_data.get(field))) for field in ("employee_info", "weather", "work_status", "steps"))
+        after = sum(count_tokens(value) for value in build_context(employee_data, current_time, budget).values())
+        rows.append({"case": name, "before": before, "after": after, "saving": _saving(before, after)})
+    return rows
+
+def format_context_report(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'case':<18}{'before':>8}{'after':>8}{'saving':>8}"]
+    for row in rows:
+        lines.append(f"{row['case']:<18}{row['before']:>8}{row['after']:>8}{row['saving']:>8}")
+    before, after = sum(row["before"] for row in rows), sum(row["after"] for row in rows)
+    lines.append(f"{'total':<18}{before:>8}{after:>8}{_saving(before, after):>8}")
+    return "\n".join(lines)
+
+BENCHMARK_MODES = ("direct", "agent", "rules")
+
+def run_benchmark(generator, modes: Sequence[str] = ("direct", "agent"), runs: int = 1) -> Dict[str, Dict[str, Any]]:
+    """每种模式在全部样例上各跑 runs 轮，返回各模式的耗时与用量统计"""
+    results: Dict[str, Dict[str, Any]] = {}
+    for mode in modes:
+        latencies: List[float] = []
+        recorder = UsageRecorder()
+        failures = 0
+        skipped = 0
+        for _ in range(runs):
+            for name, current_time, employee_data in BENCHMARK_CASES:
+                started = time.perf_counter()
+                try:
+                    if mode == "rules":
+                        rules = evaluate_rules(employee_data, datetime.strptime(current_time, "%Y-%m-%d %H:%M"))
+                        if not rules:
+                            skipped += 1
+                            latencies.append(time.perf_counter() - started)
+                            continue
+                        generator.generate(employee_data, mode="direct", current_time=current_time, callbacks=[recorder], rules=rules)
+                    else:
+                        generator.generate(employee_data, mode=mode, current_time=current_time, callbacks=[recorder])
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"{mode} 模式生成样例 {name} 失败: {e}")
+                    continue
+                latencies.append(time.perf_counter() - started)
+        samples = max(len(latencies), 1)
+        results[mode] = {
+            "samples": len(latencies),
+            "failures": failures,
+            "skipped": skipped,
+            "latency_avg_s": round(statistics.mean(latencies), 3) if latencies else 0.0,
+            "latency_p50_s": round(statistics.median(latencies), 3) if latencies else 0.0,
+            "latency_max_s": round(max(latencies), 3) if latencies else 0.0,
+            "llm_calls_per_alert": round(recorder.calls / samples, 2),
+            "prompt_tokens_per_alert": round(recorder.prompt_tokens / samples, 1),
+            "completion_tokens_per_alert": round(recorder.completion_tokens / samples, 1),
+        }
+    return results
+
+def _saving(baseline: float, value: float) -> str:
+    return f"{(1 - value / baseline) * 100:.0f}%" if baseline else "-"
+
+def format_report(results: Dict[str, Dict[str, Any]]) -> str:
+    columns = list(next(iter(results.values())).keys())
+    lines = ["mode    " + "  ".join(columns)]
+    for mode, stats in results.items():
+        lines.append(f"{mode:<8}" + "  ".join(f"{stats[column]:>{len(column)}}" for column in columns))
+    for mode, baseline_mode in (("direct", "agent"), ("rules", "direct")):
+        if mode in results and baseline_mode in results:
+            stats, baseline = results[mode], results[baseline_mode]
+            lines.append(
+                f"{mode} 相对 {baseline_mode} 节省：耗时 {_saving(baseline['latency_avg_s'], stats['latency_avg_s'])}，"
+                f"模型调用 {_saving(baseline['llm_calls_per_alert'], stats['llm_calls_per_alert'])}，"
+                f"输入 token {_saving(baseline['prompt_tokens_per_alert'], stats['prompt_tokens_per_alert'])}，"
+                f"输出 token {_saving(baseline['completion_tokens_per_alert'], stats['completion_tokens_per_alert'])}"
+            )
+    return "\n".join(lines)
+
+def main(argv=None) -> int:
+    from models.deepseek_model_server import HealthMessageGenerator
+
+    parser = argparse.ArgumentParser(prog="python -m models.benchmark")
+    parser.add_argument("--runs", type=int, default=1, help="每种模式在全部样例上重复的轮数")
+    parser.add_argument("--modes", nargs="+", choices=BENCHMARK_MODES, default=list(BENCHMARK_MODES))
+    parser.add_argument("--context", action="store_true", help="只对比上下文压缩前后的 token 数，不调用模型")
+    parser.add_argument("--budget", type=int, default=None, help="压缩后上下文的 token 预算")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.context:
+        print(format_context_report(compare_context_tokens(args.budget)))
+        return 0
+    results = run_benchmark(HealthMessageGenerator(), modes=args.modes, runs=args.runs)
+    print(format_report(results))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,131 +1,73 @@
-import os
+import asyncio
+import json
+import logging
+import random
+from contextlib import nullcontext
+from contextvars import ContextVar
 from datetime import datetime
+from typing import Any, Dict, List, Tuple
 
-from dotenv import load_dotenv
 from langchain.agents import AgentType, initialize_agent, Tool
 from langchain.prompts import PromptTemplate
-from langchain_deepseek import ChatDeepSeek
+from core import config
+from models.llm_backend import create_llm
+from models.message_cache import MessageCache, fingerprint
+from models.prompt_context import build_context, compact_profile, compact_weather, compact_work_status
+from models.tokens import UsageRecorder, count_tokens
 
-def create_message(employee_data:dict):
-    # 全局员工数据
-    '''
-    "employee_info":{"userid":"manager4585","name":"小赵","title":"算法工程师","hobby":"散步","age":"25"},
-                        "weather":{
-                        "温度(℃)":25,
-                        "天气状况":"多云",
-                        "湿度(%)":40,
-                        "风力":2,
-                        },
-                        "work_status":{
-                            "2025-9-18": [
-                                ("2025-9-18 09:30:00", "2025-9-18 11:00:00"),
-                                ("2025-9-18 13:30:00", "2025-9-18 14:20:00"),
-                                ("2025-9-18 15:30:00", "2025-9-18 17:00:00")
-                            ],
-                            "2025-9-19": [
-                                ("2025-9-19 08:30:00", "2025-9-19 10:40:00"),
-                                ("2025-9-19 13:20:00", "2025-9-19 15:50:00"),
-                                 ("2025-9-19 17:20:00", "2025-9-19 19:00:00")
-                            ],
-                            "2025-9-20": [
-                                ("2025-9-20 08:40:00", "2025-9-20 11:00:00"),
-                                ("2025-9-20 13:00:00", "2025-9-20 14:30:00"),
-                                ("2025-9-20 15:30:00", "2025-9-20 17:30:00"),
-                                ("2025-9-20 18:00:00", "2025-9-20 19:00:00")
-                            ],
-                            "2025-9-21": [
-                                ("2025-9-21 08:30:00", "2025-9-21 11:45:00"),
-                                ("2025-9-21 14:00:00", "2025-9-21 16:30:00"),
-                                ("2025-9-21 17:30:00", "2025-9-21 19:00:00")
-                            ],
-                        }
-    '''
-
-
-    # 工具函数：获取员工工作状态数据（使用全局数据）
-    def get_work_status(_):
-        return employee_data["work_status"]
-
-
-    # 工具函数：获取天气数据（使用全局数据）
-    def get_weather_data(_):
-        return employee_data["weather"]
-
-
-    # 工具函数：获取员工基本信息（使用全局数据）
-    def get_employee_info(_):
-        return employee_data["employee_info"]
-
-
-    # 获取当前时间
-    def get_current_time(_):
-        return datetime.now().strftime("%Y-%m-%d %H:%M")
-
-
-    # 加载环境变量
-    load_dotenv()
-    deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-
-    # 初始化DeepSeek LLM
-    llm = ChatDeepSeek(model="deepseek-chat", api_key=deepseek_api_key)
-
-    # 定义工具（使用lambda忽略输入参数，直接调用函数）
-    tools = [
-        Tool(
-            name="GetWorkStatus",
-            func=get_work_status,
-            description="获取员工每天的工作时段"
-        ),
-        Tool(
-            name="GetWeatherData",
-            func=get_weather_data,
-            description="获取今天的天气数据，包括温度，天气状况，湿度(%)和风力"
-        ),
-        Tool(
-            name="GetEmployeeInfo",
-            func=get_employee_info,
-            description="获取员工的基本信息，包括姓名、职位和个人爱好等"
-        ),
-        Tool(
-            name="GetCurrentTime",
-            func=get_current_time,
-            description="获取当前的日期和时间，格式为YYYY-MM-DD HH:MM"
-        )
-    ]
+logger = logging.getLogger(__name__)
 
-    # 定义提示模板（匹配结构化聊天代理的预期变量）
-    prompt_template = """
-    你是一名职工健康提示助手，根据提供的员工数据对员工进行健康提醒。
-    健康提醒无需以特定格式输出。
-    数据已预先准备好，包含以下字段(以下为示例，提示时请以实际数据为准)：
-    "employee_info":{{
-        "userid":"manager4585",
-        "name":"小赵",
-        "title":"算法工程师",
-        "hobby":"散步",
-        “age”:"25"
-    }},
-    "weather":{{
-        "温度(℃)": 25,
-        "天气状况": 多云,
-        "湿度(%)": 40,
-        "风力": 3,
-    }},
-    "work_status":{{
-        "2023-10-01": [  # 此处表示忙碌的时间段
-            ("2023-10-01 09:00:00", "2023-10-01 12:00:00"),  # 表示2023-10-01 09:00:00到12:00:00忙碌
-            ("2023-10-01 14:00:00", "2023-10-01 18:00:00")  # 表示2023-10-01 14:00:00到18:00:00忙碌
-        ],
-        "2023-10-02": [
-            ("2023-10-02 08:30:00", "2023-10-02 17:30:00")  # 表示2023-10-02 14:00:00到18:00:00忙碌
-        ]
-    }},
-    "sportsteps":{{
-        "2025-9-19": 11000,
-        "2025-9-20": 8000,
-        "2025-9-21": 9000,
-    }},
-    
+# 当前这次生成的员工数据；工具从这里读取，代理本身在多次生成间复用
+_employee_data: ContextVar[Dict[str, Any]] = ContextVar("employee_data")
+_current_time: ContextVar[str] = ContextVar("current_time", default=None)
+
+# 工具函数：获取员工工作状态数据（每天一行的紧凑汇总）
+def get_work_status(_):
+    data = _employee_data.get()
+    return "\n".join(compact_work_status(data.get("work_status"), data.get("steps"), get_current_time(None)[:10]))
+
+
+# 工具函数：获取天气数据
+def get_weather_data(_):
+    return compact_weather(_employee_data.get().get("weather"))
+
+
+# 工具函数：获取员工基本信息
+def get_employee_info(_):
+    return compact_profile(_employee_data.get().get("employee_info"))
+
+
+# 获取当前时间（生成时指定了时间则使用指定的时间）
+def get_current_time(_):
+    return _current_time.get() or datetime.now().strftime("%Y-%m-%d %H:%M")
+
+
+# 定义工具（忽略输入参数，直接返回本次生成的数据）
+TOOLS = [
+    Tool(
+        name="GetWorkStatus",
+        func=get_work_status,
+        description="获取员工近一周每天的工作模式汇总，每天一行：日期、忙碌总时长、最长连续忙碌、首次-最后忙碌时间、休息次数、步数，标注“深夜”表示22:00后仍在忙碌"
+    ),
+    Tool(
+        name="GetWeatherData",
+        func=get_weather_data,
+        description="获取今天的天气数据，包括温度，天气状况，湿度(%)和风力"
+    ),
+    Tool(
+        name="GetEmployeeInfo",
+        func=get_employee_info,
+        description="获取员工的基本信息，包括姓名、职位和个人爱好等"
+    ),
+    Tool(
+        name="GetCurrentTime",
+        func=get_current_time,
+        description="获取当前的日期和时间，格式为YYYY-MM-DD HH:MM"
+    )
+]
+
+# 各模式共用的提醒规则与输出要求
+REMINDER_RULES = """
      你需要根据提供的员工工作状态数据、天气数据和当前时间，向员工发送以下方面的提醒：
     1. 久坐提醒：如果员工连续两个小时都是在线状态，
        则建议员工起身活动活动走一走，避免久坐，深呼吸，眺望远处或者闭目养神，放松眼睛，短暂休息。
@@ -143,7 +85,23 @@ def create_message(employee_data:dict):
        若存在前一天很晚还工作，次日清晨（当前时间）很早又忙碌的情况，发送提醒。
     9. 规律性休息情况：观察提供的近一周的健康数据，
        要是一周内工作日几乎都没有短暂"不忙碌"的休息时段，且当前时间处于工作时段内，发送提醒。
+"""
 
+REMINDER_REQUIREMENTS = """
+    要求：
+    1. 请确保提醒内容简洁、温馨、积极，基于数据合理推断，避免主观假设。
+    2. 输出应凝练且易于接受，体现关怀而不显机械。
+    3. 结合每个员工的具体信息，生成个性化的提醒：
+     - 比如员工的具体岗位是产品经理，或者HR，或者算法工程师，考虑到员工的身份，根据特定的职业输出特定的提醒。
+     - 结合员工的年龄、兴趣爱好信息，进行个性化提醒。
+"""
+
+# 定义提示模板（匹配结构化聊天代理的预期变量）
+PROMPT_TEMPLATE = """
+    你是一名职工健康提示助手，根据提供的员工数据对员工进行健康提醒。
+    健康提醒无需以特定格式输出。
+    员工信息、天气和近一周每天的工作模式汇总可通过工具获取。
+    """ + REMINDER_RULES + """
     请根据获取到的员工{employee_name}的工作状态数据、天气数据和当前时间{current_time}，分析并判断需要发送哪些提醒。
     请直接给出提醒内容，不需要解释分析过程。
 
@@ -158,42 +116,448 @@ def create_message(employee_data:dict):
     4. 逐一检查各项提醒规则是否满足当前时间条件，结合每个员工的具体信息，生成个性化的提醒；
        注意：对当前需要提醒的条目进行提醒，当前不需要提醒的条目就不提醒。并不是所有的条目都要提醒。
     5. 汇总所有需要发送的提醒，不用以特定格式输出。
+""" + REMINDER_REQUIREMENTS + """
+    {agent_scratchpad}
+"""
 
-    要求：
-    1. 请确保提醒内容简洁、温馨、积极，基于数据合理推断，避免主观假设。
-    2. 输出应凝练且易于接受，体现关怀而不显机械。
-    3. 结合每个员工的具体信息，生成个性化的提醒：
-     - 比如员工的具体岗位是产品经理，或者HR，或者算法工程师，考虑到员工的身份，根据特定的职业输出特定的提醒。
-     - 结合员工的年龄、兴趣爱好信息，进行个性化提醒。
+# 创建提示（使用代理所需的标准变量）
+PROMPT = PromptTemplate(
+    template=PROMPT_TEMPLATE,
+    input_variables=["tools", "agent_scratchpad", "input"]
+)
 
-    {agent_scratchpad}
-    """
+# 直接生成模式：数据已在调用前准备好，整体放入一个提示，一次模型调用得到提醒内容
+DIRECT_PROMPT_TEMPLATE = """
+    你是一名职工健康提示助手，根据下面提供的员工数据对员工进行健康提醒。
+    健康提醒无需以特定格式输出。
 
-    # 创建提示（使用代理所需的标准变量）
-    prompt = PromptTemplate(
-        template=prompt_template,
-        input_variables=["tools", "agent_scratchpad", "input"]
-    )
+    当前时间：{current_time}
+    员工：{profile}
+    今日天气：{weather}
+    近一周每天的工作模式汇总（日期、忙碌总时长、最长连续忙碌、首次-最后忙碌时间、休息次数、步数，标注“深夜”表示22:00后仍在忙碌）：
+{work_status}
+""" + REMINDER_RULES + """
+    请逐一检查各项提醒规则是否满足当前时间条件，只对当前需要提醒的条目进行提醒，并不是所有的条目都要提醒。
+    请直接给出提醒内容，不需要解释分析过程。
+""" + REMINDER_REQUIREMENTS
 
-    # 初始化Agent
-    agent = initialize_agent(
-        tools,
-        llm,
-        agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True,
-        prompt=prompt
-    )
+DIRECT_PROMPT = PromptTemplate.from_template(DIRECT_PROMPT_TEMPLATE)
+
+# 规则模式：规则引擎已算出需要提醒的条目，只把命中的规则、判断依据和员工基本信息交给模型润色
+RULES_PROMPT_TEMPLATE = """
+    你是一名职工健康提示助手。根据规则计算，员工当前需要以下方面的提醒，请据此生成一条健康提醒。
+
+    当前时间：{current_time}
+    员工信息：{profile}
+    需要提醒的条目及判断依据：
+{rules}
+
+    只对以上条目进行提醒，不要添加其他条目。请直接给出提醒内容，不需要解释分析过程。
+""" + REMINDER_REQUIREMENTS
+
+RULES_PROMPT = PromptTemplate.from_template(RULES_PROMPT_TEMPLATE)
+
+# 批量模式：多名员工的命中规则放入一个请求，要求按 userid 返回 JSON 对象
+BATCH_PROMPT_TEMPLATE = """
+    你是一名职工健康提示助手。根据规则计算，下面每一行是一名员工当前需要提醒的条目及判断依据（JSON格式）。
+    请为每名员工分别生成一条健康提醒，只对该员工列出的条目进行提醒，不要添加其他条目，也不要提到其他员工。
+
+    当前时间：{current_time}
+    员工列表：
+{employees}
+
+    请只输出一个JSON对象，键为员工的 userid，值为该员工的提醒内容，不要输出其他内容。
+""" + REMINDER_REQUIREMENTS
+
+BATCH_PROMPT = PromptTemplate.from_template(BATCH_PROMPT_TEMPLATE)
+
+# 个性化提醒用到的员工字段
+PROFILE_FIELDS = ("name", "title", "hobby", "age")
+
+GENERATION_MODES = ("direct", "agent")
+
+def _to_prompt_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+def retry_budget(call_timeout: float, retries: int, retry_backoff: float) -> float:
+    """重试的最坏耗时（秒）：每次调用都超时，加上每次退避的最长等待"""
+    retries = max(retries, 0)
+    return call_timeout * (retries + 1) + retry_backoff * (2 ** retries - 1)
+
+def _employee_name(employee_data: Dict[str, Any]) -> str:
+    return (employee_data.get("employee_info") or {}).get("name") or "员工"
+
+class HealthMessageGenerator:
+    """健康提醒生成器：模型客户端（及其HTTP连接池）、工具、提示和代理只构建一次，在应用生命周期内复用"""
+
+    def __init__(
+            self,
+            api_key: str = None,
+            model: str = None,
+            llm=None,
+            mode: str = None,
+            backend: str = None,
+            max_concurrency: int = config.LLM_MAX_CONCURRENCY,
+            call_timeout: float = config.LLM_CALL_TIMEOUT,
+            retries: int = config.LLM_RETRIES,
+            retry_backoff: float = config.LLM_RETRY_BACKOFF,
+            cache: MessageCache = None,
+            batch_token_budget: int = config.LLM_BATCH_TOKEN_BUDGET,
+            batch_output_tokens: int = config.LLM_BATCH_OUTPUT_TOKENS,
+            batch_max_users: int = config.LLM_BATCH_MAX_USERS,
+            batch_call_timeout: float = config.LLM_BATCH_CALL_TIMEOUT,
+            batch_retries: int = config.LLM_BATCH_RETRIES,
+            context_token_budget: int = config.LLM_CONTEXT_TOKEN_BUDGET):
+        self.mode = mode or config.LLM_GENERATION_MODE
+        if self.mode not in GENERATION_MODES:
+            raise Exception(f"未知的提醒生成模式: {self.mode}，可选 {GENERATION_MODES}")
+        # 未传入模型客户端时按 backend（默认 LLM_BACKEND）创建：deepseek 为真实接口，fake 为离线替身
+        self.llm = llm or create_llm(backend, model=model, api_key=api_key, call_timeout=call_timeout)
+        self.chain = DIRECT_PROMPT | self.llm
+        self.rules_chain = RULES_PROMPT | self.llm
+        self.batch_chain = BATCH_PROMPT | self.llm
+        self._agent = None
+        if self.mode == "agent":
+            self._agent = self._build_agent()
+        # 进程内所有提醒共用的模型并发上限
+        self._limiter = asyncio.Semaphore(max(max_concurrency, 1))
+        self.call_timeout = call_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._stats = {"calls": 0, "succeeded": 0, "failed": 0, "timeouts": 0, "retries": 0, "batch_fallbacks": 0,
+                       "prompt_tokens": 0, "completion_tokens": 0}
+        # 批量生成：每次请求的 token 预算（含每人预留的输出）、每批人数上限、单次请求超时和重试次数
+        self.batch_token_budget = batch_token_budget
+        self.batch_output_tokens = batch_output_tokens
+        self.batch_max_users = max(batch_max_users, 1)
+        self.batch_call_timeout = batch_call_timeout
+        self.batch_retries = batch_retries
+        # direct 模式完整数据提示的 token 预算，模板本身的 token 数只计算一次
+        self.context_token_budget = context_token_budget
+        self._direct_overhead = count_tokens(DIRECT_PROMPT_TEMPLATE)
+        # 按输入指纹缓存规则模式生成的文案，None 为不缓存
+        self.cache = cache
+        budget = retry_budget(call_timeout, retries, retry_backoff)
+        if budget > config.LLM_ALERT_DEADLINE:
+            logger.warning(f"单条提醒重试最坏耗时 {budget:.1f}s 超过总时限 LLM_ALERT_DEADLINE={config.LLM_ALERT_DEADLINE}s，"
+                           f"最后的重试可能来不及完成")
+        logger.info(f"健康提醒生成器初始化完成（{self.mode} 模式）")
+
+    def _build_agent(self):
+        # 初始化Agent
+        return initialize_agent(
+            TOOLS,
+            self.llm,
+            agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
+            verbose=True,
+            prompt=PROMPT
+        )
+
+    @property
+    def agent(self):
+        """工具调用代理，仅 agent 模式或对比测试时构建"""
+        if self._agent is None:
+            self._agent = self._build_agent()
+        return self._agent
+
+    def _resolve_mode(self, mode: str = None) -> str:
+        mode = mode or self.mode
+        if mode not in GENERATION_MODES:
+            raise Exception(f"未知的提醒生成模式: {mode}，可选 {GENERATION_MODES}")
+        return mode
+
+    def generate(
+            self,
+            employee_data: Dict[str, Any],
+            mode: str = None,
+            current_time: str = None,
+            callbacks=None,
+            rules: List[Dict[str, Any]] = None) -> str:
+        """根据单个员工的数据生成即时健康提醒（同步，供命令行和对比测试使用）
+
+        mode 默认使用生成器的模式；current_time（YYYY-MM-DD HH:MM）默认取当前时间，固定后便于对比测试
+        rules 为规则引擎命中的提醒条目，direct 模式下传入时只把命中的规则和判断依据交给模型
+        """
+        mode = self._resolve_mode(mode)
+        current_time = current_time or get_current_time(None)
+        recorder, callbacks = self._with_usage(callbacks)
+        try:
+            if mode == "direct":
+                chain, inputs = self._direct_request(employee_data, current_time, rules)
+                message = chain.invoke(inputs, config={"callbacks": callbacks})
+                content = message.content.strip()
+            else:
+                data_token, time_token = _employee_data.set(employee_data), _current_time.set(current_time)
+                try:
+                    # 运行Agent
+                    reminders = self.agent.invoke(self._agent_input(employee_data, current_time), config={"callbacks": callbacks})
+                finally:
+                    _employee_data.reset(data_token)
+                    _current_time.reset(time_token)
+                content = reminders["output"]
+        finally:
+            self._record_usage(recorder, f"员工{_employee_name(employee_data)}的健康提醒")
+        logger.info(f"[{current_time}] 已生成员工{_employee_name(employee_data)}的健康提醒（{mode} 模式）")
+        return content
+
+    async def agenerate(
+            self,
+            employee_data: Dict[str, Any],
+            mode: str = None,
+            current_time: str = None,
+            callbacks=None,
+            rules: List[Dict[str, Any]] = None,
+            limiter: asyncio.Semaphore = None) -> str:
+        """异步生成提醒：受全局并发上限约束，单次调用超时后按带抖动的指数退避重试，重试用尽后抛出异常
+
+        limiter 为调用方的并发上限（如一轮状态检查的生成阶段），只在每次调用期间占用，退避等待时释放；
+        调用方取消时立即停止等待并取消进行中的模型请求
+        """
+        mode = self._resolve_mode(mode)
+        current_time = current_time or get_current_time(None)
+        employee_name = _employee_name(employee_data)
+        name = (employee_data.get("employee_info") or {}).get("name")
+        cache_key = None
+        if self.cache is not None and rules is not None and mode == "direct":
+            cache_key = fingerprint(employee_data, rules, current_time)
+            cached = self.cache.get(cache_key, name)
+            if cached is not None:
+                logger.info(f"[{current_time}] 员工{employee_name}的健康提醒命中缓存")
+                return cached
+        content = await self._with_retries(
+            lambda: self._ainvoke(employee_data, mode, current_time, callbacks, rules),
+            f"员工{employee_name}的健康提醒",
+            self.call_timeout,
+            limiter=limiter
+        )
+        if cache_key is not None:
+            self.cache.put(cache_key, content, name)
+        logger.info(f"[{current_time}] 已生成员工{employee_name}的健康提醒（{mode} 模式）")
+        return content
+
+    async def _with_retries(self, call, label: str, timeout: float, retries: int = None,
+                            limiter: asyncio.Semaphore = None):
+        """在全局并发上限（及调用方的 limiter）内执行一次模型调用，超时或失败按带抖动的指数退避重试，重试用尽后抛出异常"""
+        attempts = max(self.retries if retries is None else retries, 0) + 1
+        for attempt in range(attempts):
+            try:
+                async with limiter or nullcontext(), self._limiter:
+                    self._stats["calls"] += 1
+                    result = await asyncio.wait_for(call(), timeout=timeout)
+                self._stats["succeeded"] += 1
+                return result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._stats["timeouts"] += 1
+                    error = f"超过 {timeout}s 未返回"
+                else:
+                    error = str(e) or type(e).__name__
+                if attempt + 1 >= attempts:
+                    self._stats["failed"] += 1
+                    raise Exception(f"生成{label}失败（已尝试{attempts}次）: {error}")
+                # 全抖动退避：在 [0, backoff * 2^attempt] 内随机等待，避免大量提醒同时重试
+                delay = random.uniform(0, self.retry_backoff * (2 ** attempt))
+                self._stats["retries"] += 1
+                logger.warning(f"生成{label}失败: {error}，{delay:.2f}s 后重试")
+                await asyncio.sleep(delay)
+
+    async def agenerate_batch(
+            self,
+            items: List[Tuple[str, Dict[str, Any], List[Dict[str, Any]]]],
+            current_time: str = None,
+            deadline: float = None) -> Dict[str, str]:
+        """多个员工合并生成：items 为 (userid, 员工数据, 命中规则)，按 token 预算分批，每批一次模型调用返回按 userid 分组的提醒
+
+        缓存命中的员工不进入批次；批量结果缺失或校验不通过的员工改为并发单独调用；仍失败的员工不在返回结果中，由调用方兜底
+        deadline 秒后取消未完成的请求，已生成的提醒照常返回
+        """
+        current_time = current_time or get_current_time(None)
+        results: Dict[str, str] = {}
+        pending = []
+        for userid, employee_data, rules in items:
+            cache_key = None
+            if self.cache is not None:
+                cache_key = fingerprint(employee_data, rules, current_time)
+                cached = self.cache.get(cache_key, (employee_data.get("employee_info") or {}).get("name"))
+                if cached is not None:
+                    results[userid] = cached
+                    continue
+            pending.append((userid, employee_data, rules, cache_key))
+
+        async def run_batch(batch):
+            outputs: Dict[str, str] = {}
+            if len(batch) > 1:
+                try:
+                    outputs = await self._with_retries(
+                        lambda: self._ainvoke_batch(batch, current_time),
+                        f"{len(batch)}名员工的批量提醒",
+                        self.batch_call_timeout,
+                        retries=self.batch_retries
+                    )
+                except Exception as e:
+                    logger.warning(f"{e}，改为逐个生成")
+
+            async def run_one(userid, employee_data, rules, cache_key):
+                content = outputs.get(userid)
+                if content is None:
+                    if len(batch) > 1:
+                        self._stats["batch_fallbacks"] += 1
+                        logger.info(f"批量结果中缺少用户 {userid} 的有效提醒，改为单独生成")
+                    try:
+                        content = await self._with_retries(
+                            lambda: self._ainvoke(employee_data, "direct", current_time, None, rules),
+                            f"员工{_employee_name(employee_data)}的健康提醒",
+                            self.call_timeout
+                        )
+                    except Exception as e:
+                        logger.warning(str(e))
+                        return
+                if cache_key is not None:
+                    self.cache.put(cache_key, content, (employee_data.get("employee_info") or {}).get("name"))
+                results[userid] = content
+
+            # 单独生成的调用并发进行，由全局并发上限约束
+            await asyncio.gather(*(run_one(*entry) for entry in batch))
+
+        batches = self._pack_batches(pending, current_time)
+        tasks = [asyncio.create_task(run_batch(batch)) for batch in batches]
+        try:
+            if tasks:
+                _, unfinished = await asyncio.wait(tasks, timeout=deadline)
+                if unfinished:
+                    logger.warning(f"批量生成超过 {deadline}s，{len(unfinished)} 批未完成，已生成的提醒照常返回")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"[{current_time}] 批量生成 {len(items)} 名员工的健康提醒：缓存命中 {len(items) - len(pending)}，"
+                    f"{len(batches)} 次请求，成功 {len(results)}")
+        return results
+
+    def _batch_entry(self, userid: str, employee_data: Dict[str, Any], rules: List[Dict[str, Any]]) -> str:
+        employee_info = employee_data.get("employee_info") or {}
+        return _to_prompt_json({
+            "userid": userid,
+            "profile": {field: employee_info.get(field) for field in PROFILE_FIELDS if employee_info.get(field)},
+            "rules": [{"title": rule["title"], "facts": rule["facts"]} for rule in rules],
+        })
+
+    def _pack_batches(self, pending: list, current_time: str) -> List[list]:
+        """按 token 预算装批：提示本身 + 每人的输入与预留输出不超过 batch_token_budget，且每批不超过 batch_max_users 人"""
+        base = count_tokens(BATCH_PROMPT_TEMPLATE) + count_tokens(current_time)
+        batches, batch, used = [], [], base
+        for item in pending:
+            cost = count_tokens(self._batch_entry(item[0], item[1], item[2])) + self.batch_output_tokens
+            if batch and (used + cost > self.batch_token_budget or len(batch) >= self.batch_max_users):
+                batches.append(batch)
+                batch, used = [], base
+            batch.append(item)
+            used += cost
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _ainvoke_batch(self, batch: list, current_time: str) -> Dict[str, str]:
+        recorder, callbacks = self._with_usage()
+        try:
+            message = await self.batch_chain.ainvoke({
+                "current_time": current_time,
+                "employees": "\n".join(self._batch_entry(userid, data, rules) for userid, data, rules, _ in batch),
+            }, config={"callbacks": callbacks})
+        finally:
+            self._record_usage(recorder, f"{len(batch)}名员工的批量提醒")
+        return self._parse_batch_output(message.content, batch)
+
+    def _parse_batch_output(self, text: str, batch: list) -> Dict[str, str]:
+        """解析批量输出的 JSON 对象，只保留批次内员工、内容非空且未提到其他员工姓名的提醒"""
+        # 模型可能在 JSON 外包裹代码块标记，取第一个 { 到最后一个 } 之间的内容
+        try:
+            parsed = json.loads(text[text.index("{"):text.rindex("}") + 1])
+        except ValueError as e:
+            raise Exception(f"批量输出不是有效的JSON: {e}")
+        if not isinstance(parsed, dict):
+            raise Exception("批量输出不是以userid为键的JSON对象")
+
+        names = {userid: (data.get("employee_info") or {}).get("name") for userid, data, _, _ in batch}
+        outputs = {}
+        for userid in names:
+            content = parsed.get(userid)
+            if not isinstance(content, str) or not content.strip():
+                continue
+            others = [name for other, name in names.items() if other != userid and name and name != names[userid]]
+            if any(name in content for name in others):
+                logger.warning(f"批量输出中用户 {userid} 的提醒包含其他员工姓名，已丢弃")
+                continue
+            outputs[userid] = content.strip()
+        return outputs
+
+    async def _ainvoke(self, employee_data: Dict[str, Any], mode: str, current_time: str, callbacks=None, rules=None) -> str:
+        recorder, callbacks = self._with_usage(callbacks)
+        try:
+            return await self._ainvoke_mode(employee_data, mode, current_time, callbacks, rules)
+        finally:
+            self._record_usage(recorder, f"员工{_employee_name(employee_data)}的健康提醒")
+
+    async def _ainvoke_mode(self, employee_data: Dict[str, Any], mode: str, current_time: str, callbacks, rules) -> str:
+        if mode == "direct":
+            chain, inputs = self._direct_request(employee_data, current_time, rules)
+            message = await chain.ainvoke(inputs, config={"callbacks": callbacks})
+            return message.content.strip()
+        # 当前协程内设置的数据会随上下文复制到代理执行工具的线程
+        data_token, time_token = _employee_data.set(employee_data), _current_time.set(current_time)
+        try:
+            reminders = await self.agent.ainvoke(self._agent_input(employee_data, current_time), config={"callbacks": callbacks})
+        finally:
+            _employee_data.reset(data_token)
+            _current_time.reset(time_token)
+        return reminders["output"]
+
+    def _direct_request(self, employee_data: Dict[str, Any], current_time: str, rules: List[Dict[str, Any]] = None):
+        """direct 模式使用的提示链及输入：有命中规则时用规则提示，否则放入全部数据"""
+        if rules is not None:
+            employee_info = employee_data.get("employee_info") or {}
+            return self.rules_chain, {
+                "current_time": current_time,
+                "profile": _to_prompt_json({field: employee_info.get(field) for field in PROFILE_FIELDS if employee_info.get(field)}),
+                "rules": "\n".join(f"    - {rule['title']}：{_to_prompt_json(rule['facts'])}" for rule in rules),
+            }
+        return self.chain, build_context(employee_data, current_time, self.context_token_budget, self._direct_overhead)
+
+    def _with_usage(self, callbacks=None):
+        """为一次生成附加 token 用量记录"""
+        recorder = UsageRecorder()
+        return recorder, [*(callbacks or []), recorder]
+
+    def _record_usage(self, recorder: UsageRecorder, label: str):
+        if not recorder.calls:
+            return
+        self._stats["prompt_tokens"] += recorder.prompt_tokens
+        self._stats["completion_tokens"] += recorder.completion_tokens
+        logger.info(f"生成{label}：模型调用 {recorder.calls} 次，输入 {recorder.prompt_tokens} token，输出 {recorder.completion_tokens} token")
+
+    def _agent_input(self, employee_data: Dict[str, Any], current_time: str) -> str:
+        # 准备输入信息
+        return f"请根据当前时间{current_time}、员工{_employee_name(employee_data)}的工作和天气数据，判断并生成即时健康提醒"
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
 
-    # 准备输入信息
-    employee_name = employee_data["employee_info"]["name"]
-    current_time = get_current_time(None)
-    input_text = f"请根据当前时间{current_time}、员工{employee_name}的工作和天气数据，判断并生成即时健康提醒"
+_default_generator: HealthMessageGenerator = None
 
-    # 运行Agent
-    reminders = agent.invoke(input_text)
+def default_generator() -> HealthMessageGenerator:
+    """进程内共享的生成器，首次调用时创建"""
+    global _default_generator
+    if _default_generator is None:
+        _default_generator = HealthMessageGenerator()
+    return _default_generator
 
-    print(f"[{current_time}] 需要发送的提醒：")
-    return reminders["output"]
+def create_message(employee_data: dict):
+    return default_generator().generate(employee_data)
 
 if __name__ == '__main__':
     employee_data={"employee_info":{"userid":"manager4585","name":"小赵","title":"算法工程师","hobby":"散步","age":"25"},
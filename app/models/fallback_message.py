@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Any, Dict, List
+from utils.health_rules import evaluate_rules
+
+# 模型超时或不可用时使用的固定模板提醒：只依赖已准备好的数据，相同输入总是得到相同内容
+
+DEFAULT_ADVICE = "已经工作了一段时间，起身活动一下、眺望远处放松眼睛吧。"
+
+def _parse_time(current_time: str = None) -> datetime:
+    if current_time:
+        return datetime.strptime(current_time, "%Y-%m-%d %H:%M")
+    return datetime.now()
+
+def fallback_message(employee_data: Dict[str, Any], current_time: str = None, rules: List[Dict[str, Any]] = None) -> str:
+    """按命中规则的模板文案拼出提醒；rules 为已计算的命中规则，未传入时重新计算"""
+    if rules is None:
+        rules = evaluate_rules(employee_data, _parse_time(current_time))
+    advice = "".join(rule["advice"] for rule in rules) or DEFAULT_ADVICE
+
+    name = (employee_data.get("employee_info") or {}).get("name")
+    greeting = f"{name}，你好！" if name else "你好！"
+    return greeting + advice
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field, PrivateAttr
+from core import config
+from models.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 提醒生成使用的模型后端：LLM_BACKEND 选择，新增后端在 LLM_BACKENDS 中注册一个创建函数即可
+
+# 离线替身默认回放的提醒文案（不含姓名，适用于任意员工）
+DEFAULT_RESPONSES = [
+    "已经连续忙碌一段时间了，起身走一走、眺望远处放松一下眼睛吧。",
+    "下午气温较高，记得多喝水，注意防暑。",
+    "现在是午休时间，小憩20分钟，下午精力会更充沛。",
+    "最近几天步数偏少，空闲时记得多走走路。",
+    "这周有好几天工作到深夜，今晚早点休息吧。",
+]
+
+# 批量提示中每名员工一行 JSON，以 userid 开头
+_BATCH_USERID = re.compile(r'^\s*\{"userid": "([^"]+)"', re.MULTILINE)
+# 结构化聊天代理（agent 模式）提示中的可用工具列表，以及此前各轮调用过的工具
+_AGENT_TOOLS = re.compile(r'Valid "action" values: "Final Answer" or (.+)')
+_AGENT_SCRATCHPAD = "This was your previous work"
+_AGENT_ACTION = re.compile(r'"action": "([^"]+)"')
+
+class ReplayChatModel(BaseChatModel):
+    """离线模型替身：按顺序循环回放录制的回复，可配置延迟、抖动和错误率，不访问网络
+
+    批量提示按其中的 userid 返回 JSON 对象；agent 模式的代理提示按工具列表逐轮各调用一次工具，
+    全部调用过后才给出最终回复，与真实模型一样每轮重发累积的中间过程；
+    用量按提示和回复文本计算，与真实接口一样写入 usage_metadata
+    """
+
+    responses: List[str] = Field(default_factory=lambda: list(DEFAULT_RESPONSES))
+    # 每次调用的基础延迟（秒）与均匀抖动幅度（秒）
+    latency: float = 0.0
+    jitter: float = 0.0
+    # 每次调用抛出异常的概率
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _index: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+        if not self.responses:
+            raise Exception("离线模型替身至少需要一条回复")
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _next_response(self) -> str:
+        response = self.responses[self._index % len(self.responses)]
+        self._index += 1
+        return response
+
+    def _plan_call(self) -> float:
+        """本次调用的延迟；按错误率决定是否失败"""
+        delay = max(self.latency + self._rng.uniform(-self.jitter, self.jitter), 0.0)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise Exception("离线模型替身模拟的调用失败")
+        return delay
+
+    def _agent_step(self, prompt: str, tools: str) -> str:
+        """代理的下一步：依次调用尚未调用过的工具，都调用过后给出最终回复"""
+        scratchpad = prompt.split(_AGENT_SCRATCHPAD, 1)[1] if _AGENT_SCRATCHPAD in prompt else ""
+        called = set(_AGENT_ACTION.findall(scratchpad))
+        pending = [tool.strip() for tool in tools.split(",") if tool.strip() and tool.strip() not in called]
+        action = {"action": pending[0], "action_input": ""} if pending else \
+            {"action": "Final Answer", "action_input": self._next_response()}
+        return f"Action:\n```\n{json.dumps(action, ensure_ascii=False)}\n```"
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = get_buffer_string(messages)
+        userids = _BATCH_USERID.findall(prompt)
+        tools = _AGENT_TOOLS.search(prompt)
+        if userids:
+            content = json.dumps({userid: self._next_response() for userid in userids}, ensure_ascii=False)
+        elif tools:
+            content = self._agent_step(prompt, tools.group(1))
+        else:
+            content = self._next_response()
+        input_tokens, output_tokens = count_tokens(prompt), count_tokens(content)
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._plan_call())
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._plan_call())
+        return self._result(messages)
+
+def load_responses(path: str) -> List[str]:
+    """读取录制的回复：JSON 字符串数组"""
+    with open(path, encoding="utf-8") as f:
+        responses = json.load(f)
+    if not isinstance(responses, list) or not all(isinstance(item, str) for item in responses):
+        raise Exception(f"录制回复文件 {path} 应为字符串数组")
+    return responses
+
+def _deepseek(model: str = None, api_key: str = None, call_timeout: float = config.LLM_CALL_TIMEOUT, **kwargs):
+    from langchain_deepseek import ChatDeepSeek
+
+    # 超时与重试由生成器统一控制，客户端自身不再重试
+    return ChatDeepSeek(
+        model=model or config.DEEPSEEK_MODEL,
+        api_key=api_key or config.DEEPSEEK_API_KEY,
+        timeout=call_timeout,
+        max_retries=0
+    )
+
+def _replay(**kwargs):
+    responses = load_responses(config.LLM_FAKE_RESPONSES_FILE) if config.LLM_FAKE_RESPONSES_FILE else list(DEFAULT_RESPONSES)
+    return ReplayChatModel(
+        responses=responses,
+        latency=config.LLM_FAKE_LATENCY,
+        jitter=config.LLM_FAKE_JITTER,
+        error_rate=config.LLM_FAKE_ERROR_RATE,
+    )
+
+LLM_BACKENDS: Dict[str, Callable[..., BaseChatModel]] = {
+    "deepseek": _deepseek,
+    "fake": _replay,
+}
+
+def create_llm(backend: str = None, **kwargs) -> BaseChatModel:
+    """按名称创建模型客户端；kwargs（model、api_key、call_timeout）由各后端按需使用"""
+    backend = backend or config.LLM_BACKEND
+    factory = LLM_BACKENDS.get(backend)
+    if factory is None:
+        raise Exception(f"未知的模型后端: {backend}，可选 {tuple(LLM_BACKENDS)}")
+    logger.info(f"提醒生成使用 {backend} 模型后端")
+    return factory(**kwargs)
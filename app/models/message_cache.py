@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from core import config
+
+logger = logging.getLogger(__name__)
+
+# 生成结果中的员工姓名替换为占位符后再缓存，取出时换回当前员工的姓名
+NAME_PLACEHOLDER = "{{name}}"
+
+# 时段划分（起始分钟, 名称），与提醒规则中的时间条件对应
+TIME_BUCKETS = [
+    (0, "凌晨"), (6 * 60, "清晨"), (9 * 60, "上午"), (11 * 60 + 30, "午间"),
+    (14 * 60, "下午"), (18 * 60, "傍晚"), (22 * 60, "深夜"),
+]
+
+def _time_bucket(current_time: str) -> str:
+    hour, minute = (int(part) for part in current_time[-5:].split(":"))
+    minutes = hour * 60 + minute
+    return [name for start, name in TIME_BUCKETS if minutes >= start][-1]
+
+def _bucket_fact(key: str, value):
+    """判断依据中的数值按粒度取整，数值相近的员工共用一条文案"""
+    if isinstance(value, dict):
+        # 步数等按日期给出的数据只保留数值
+        return sorted(_bucket_fact(key, item) for item in value.values())
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return value
+    if key.endswith("_minutes"):
+        return int(value // 30 * 30)
+    if key == "steps":
+        return int(value // 1000 * 1000)
+    return int(round(value))
+
+def fingerprint(employee_data: Dict[str, Any], rules: List[Dict[str, Any]], current_time: str) -> str:
+    """决定提醒文案的输入的归一化指纹：命中规则及其依据、天气、时段、岗位、爱好、年龄段"""
+    employee_info = employee_data.get("employee_info") or {}
+    weather = employee_data.get("weather") or {}
+    age = str(employee_info.get("age") or "")
+    normalized = {
+        "rules": sorted(
+            (rule["rule"], sorted((key, _bucket_fact(key, value)) for key, value in rule["facts"].items()))
+            for rule in rules
+        ),
+        "weather": weather.get("天气状况"),
+        "time": _time_bucket(current_time),
+        "title": (employee_info.get("title") or "").strip().lower(),
+        "hobby": (employee_info.get("hobby") or "").strip().lower(),
+        "age": f"{age[:-1]}0s" if age.isdigit() and len(age) > 1 else age,
+    }
+    raw = json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class MessageCache:
+    """按指纹缓存生成的提醒文案：每个指纹保留多个候选文案轮流使用，过期后重新生成，超过容量淘汰最久未使用的指纹"""
+
+    def __init__(
+            self,
+            ttl: float = config.MESSAGE_CACHE_TTL,
+            max_keys: int = config.MESSAGE_CACHE_MAX_KEYS,
+            variants: int = config.MESSAGE_CACHE_VARIANTS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        # 每个指纹攒够该数量的文案后才开始命中，保证措辞仍有变化
+        self.variants = max(variants, 1)
+        # 指纹 -> (创建时间, 文案列表, 下一次使用的下标)
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, name: str = None) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is None or len(entry[1]) < self.variants:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        text = entry[1][entry[2] % len(entry[1])]
+        entry[2] += 1
+        self.hits += 1
+        return text.replace(NAME_PLACEHOLDER, name) if name else text
+
+    def put(self, key: str, text: str, name: str = None):
+        if name:
+            text = text.replace(name, NAME_PLACEHOLDER)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [time.monotonic(), [], 0]
+            self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(entry[1]) < self.variants and text not in entry[1]:
+            entry[1].append(text)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "keys": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            # 每次命中省去一次模型调用
+            "llm_calls_saved": self.hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
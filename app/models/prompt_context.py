@@ -0,0 +1,97 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+from models.tokens import count_tokens
+from utils.work_pattern import summarize_day
+
+logger = logging.getLogger(__name__)
+
+# 提示上下文压缩：把员工数据整理成紧凑的文本，只保留提醒规则用到的字段
+
+def _time_of(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%H:%M")
+    return str(value)[-5:] if value else ""
+
+def compact_profile(employee_info: Dict[str, Any]) -> str:
+    """姓名、岗位、年龄、爱好，如“小赵，算法工程师，25岁，爱好散步”"""
+    employee_info = employee_info or {}
+    parts = [employee_info.get("name"), employee_info.get("title")]
+    if employee_info.get("age"):
+        parts.append(f"{employee_info['age']}岁")
+    if employee_info.get("hobby"):
+        parts.append(f"爱好{employee_info['hobby']}")
+    return "，".join(str(part) for part in parts if part) or "无"
+
+def compact_weather(weather: Dict[str, Any]) -> str:
+    """温度、天气状况、湿度、风力，如“33℃，晴，湿度55%，风力2级”"""
+    weather = weather or {}
+    parts = []
+    if weather.get("温度(℃)") not in (None, ""):
+        parts.append(f"{weather['温度(℃)']}℃")
+    if weather.get("天气状况"):
+        parts.append(str(weather["天气状况"]))
+    if weather.get("湿度(%)") not in (None, ""):
+        parts.append(f"湿度{weather['湿度(%)']}%")
+    if weather.get("风力") not in (None, ""):
+        parts.append(f"风力{weather['风力']}级")
+    return "，".join(parts) or "无"
+
+def compact_day(date: str, summary) -> str:
+    """一天一行：忙碌总时长、最长连续忙碌、首末忙碌时间、休息次数、步数、是否深夜工作
+
+    summary 也可以是当天的 (开始, 结束) 忙碌时段列表，先汇总再输出
+    """
+    if isinstance(summary, (list, tuple)):
+        summary = summarize_day(date, summary)
+    summary = summary or {}
+    parts = [
+        date,
+        f"忙碌{summary.get('total_busy_minutes') or 0}分钟",
+        f"最长连续{summary.get('longest_busy_minutes') or 0}分钟",
+    ]
+    first, last = _time_of(summary.get("first_busy_at")), _time_of(summary.get("last_busy_at"))
+    if first or last:
+        parts.append(f"{first}-{last}")
+    parts.append(f"休息{summary.get('break_count') or 0}次")
+    if summary.get("steps"):
+        parts.append(f"步数{summary['steps']}")
+    if summary.get("late_night"):
+        parts.append("深夜")
+    return " ".join(parts)
+
+def compact_work_status(work_status: Dict[str, Any], steps: Dict[str, Any] = None, today: str = None) -> List[str]:
+    """按日期升序每天一行；今天的步数记录在汇总中没有步数时补上"""
+    lines = []
+    for date, summary in sorted((work_status or {}).items()):
+        if isinstance(summary, (list, tuple)):
+            summary = summarize_day(date, summary)
+        if date == today and not summary.get("steps") and (steps or {}).get("steps"):
+            summary = {**summary, "steps": steps["steps"]}
+        lines.append(compact_day(date, summary))
+    return lines
+
+def build_context(
+        employee_data: Dict[str, Any],
+        current_time: str,
+        budget: int = None,
+        overhead: int = 0) -> Dict[str, str]:
+    """direct 模式提示所需的紧凑上下文；overhead 为提示模板本身的 token 数
+
+    超出 budget 时从最早的日期开始删减工作汇总，至少保留最近一天
+    """
+    lines = compact_work_status(employee_data.get("work_status"), employee_data.get("steps"), current_time[:10])
+    context = {
+        "current_time": current_time,
+        "profile": compact_profile(employee_data.get("employee_info")),
+        "weather": compact_weather(employee_data.get("weather")),
+    }
+    fixed = overhead + sum(count_tokens(value) for value in context.values())
+    line_tokens = [count_tokens(line) + 1 for line in lines]
+    dropped = 0
+    while budget and len(lines) - dropped > 1 and fixed + sum(line_tokens[dropped:]) > budget:
+        dropped += 1
+    if dropped:
+        logger.info(f"提示超出 {budget} token 预算，删减最早 {dropped} 天的工作汇总")
+    context["work_status"] = "\n".join(f"    {line}" for line in lines[dropped:]) or "    无"
+    return context
@@ -0,0 +1,74 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import tiktoken
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import get_buffer_string
+from core import config
+
+logger = logging.getLogger(__name__)
+
+_CJK = re.compile(r"[　-〿一-鿿＀-￯]")
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：中文字符及全角标点约1个token，其余字符约4个一个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    # 编码表首次使用时需要下载，离线环境加载失败时退回粗略估计
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"加载 tiktoken 编码 {name} 失败，token 数改用估算: {e}")
+        return None
+
+def count_tokens(text: str, encoding: str = None) -> int:
+    """用 tiktoken 计算文本的 token 数（编码由 LLM_TOKEN_ENCODING 指定）"""
+    if not text:
+        return 0
+    enc = _encoding(encoding or config.LLM_TOKEN_ENCODING)
+    if enc is None:
+        return estimate_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+class UsageRecorder(BaseCallbackHandler):
+    """累计模型调用次数与 token 用量：优先使用接口返回的用量，没有时按提示和输出文本计算"""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._counted_prompts: Dict[Any, int] = {}
+
+    def on_llm_start(self, serialized, prompts: List[str], *, run_id=None, **kwargs) -> None:
+        self._counted_prompts[run_id] = sum(count_tokens(prompt) for prompt in prompts)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id=None, **kwargs) -> None:
+        self._counted_prompts[run_id] = sum(count_tokens(get_buffer_string(batch)) for batch in messages)
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs) -> None:
+        self.calls += 1
+        counted_prompt = self._counted_prompts.pop(run_id, 0)
+        prompt_tokens = completion_tokens = 0
+        reported = False
+        texts = []
+        for generations in response.generations:
+            for generation in generations:
+                texts.append(generation.text)
+                message = getattr(generation, "message", None)
+                if message is not None and getattr(message, "usage_metadata", None):
+                    reported = True
+                    prompt_tokens += message.usage_metadata.get("input_tokens", 0)
+                    completion_tokens += message.usage_metadata.get("output_tokens", 0)
+        if not reported:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = token_usage.get("prompt_tokens") or counted_prompt
+            completion_tokens = token_usage.get("completion_tokens") or sum(count_tokens(text) for text in texts)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
@@ -0,0 +1,97 @@
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+import pymysql.cursors
+from core import config
+
+logger = logging.getLogger(__name__)
+
+# 子表 -> (归档表, 需要复制的业务列)
+ARCHIVE_TABLES: Dict[str, Tuple[str, List[str]]] = {
+    "online_time_periods": ("online_time_periods_archive", ["start_datetime", "end_datetime", "created_at"]),
+    "attendance_data": ("attendance_data_archive", ["userCheckTime", "checkType", "created_at"]),
+    "health_message": ("health_message_archive", ["date_time", "msg", "created_at"]),
+}
+
+def retention_policies() -> Dict[str, int]:
+    """各子表保留天数（按父记录 online_status.date 计算）"""
+    return {
+        "online_time_periods": config.RETENTION_PERIODS_DAYS,
+        "attendance_data": config.RETENTION_ATTENDANCE_DAYS,
+        "health_message": config.RETENTION_HEALTH_MESSAGE_DAYS,
+    }
+
+def cutoff_date(days: int, today: date = None) -> str:
+    """早于该日期的记录超出保留期"""
+    return ((today or date.today()) - timedelta(days=days)).strftime("%Y-%m-%d")
+
+def archive_chunk(conn, table: str, cutoff: str, chunk_size: int) -> int:
+    """把一批超出保留期的子表记录移入归档表，单独一个短事务，返回移动的行数"""
+    archive_table, columns = ARCHIVE_TABLES[table]
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        conn.begin()
+        cursor.execute(
+            f"""
+            SELECT c.id FROM {table} c
+            JOIN online_status s ON s.id = c.task_id
+            WHERE s.date < %s
+            LIMIT %s
+            """,
+            (cutoff, chunk_size)
+        )
+        ids = [row['id'] for row in cursor.fetchall()]
+        if not ids:
+            conn.commit()
+            return 0
+
+        placeholders = ", ".join(["%s"] * len(ids))
+        # 归档表主键沿用原id，中断后重跑时已归档的行被忽略
+        cursor.execute(
+            f"""
+            INSERT IGNORE INTO {archive_table} (id, task_id, userid, date, {', '.join(columns)})
+            SELECT c.id, c.task_id, s.userid, s.date, {', '.join('c.' + column for column in columns)}
+            FROM {table} c JOIN online_status s ON s.id = c.task_id
+            WHERE c.id IN ({placeholders})
+            """,
+            ids
+        )
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+        conn.commit()
+        return len(ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def prune_parents_chunk(conn, cutoff: str, chunk_size: int) -> int:
+    """把一批早于cutoff且已没有子记录的 online_status（含当天步数）移入 online_status_archive，返回移动的行数"""
+    not_exists = " AND ".join(
+        f"NOT EXISTS (SELECT 1 FROM {table} c WHERE c.task_id = s.id)" for table in ARCHIVE_TABLES
+    )
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        conn.begin()
+        cursor.execute(
+            f"SELECT s.id FROM online_status s WHERE s.date < %s AND {not_exists} LIMIT %s",
+            (cutoff, chunk_size)
+        )
+        ids = [row['id'] for row in cursor.fetchall()]
+        if ids:
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"""
+                INSERT IGNORE INTO online_status_archive (id, userid, date, steps)
+                SELECT id, userid, date, steps FROM online_status WHERE id IN ({placeholders})
+                """,
+                ids
+            )
+            cursor.execute(f"DELETE FROM online_status WHERE id IN ({placeholders})", ids)
+        conn.commit()
+        return len(ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
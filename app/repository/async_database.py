@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from repository import database
+from core import config
+
+logger = logging.getLogger(__name__)
+
+class LatencyStats:
+    """线程安全的耗时统计（次数、平均、最大，单位毫秒）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+                "max_ms": round(self.max * 1000, 2),
+            }
+
+class AsyncDatabase:
+    """异步数据库门面：同步pymysql操作在独立的有界线程池中执行，不阻塞事件循环
+
+    借出连接前先在事件循环侧等待连接名额，工作线程不会阻塞在连接池上，
+    持有连接的工作单元总能拿到线程执行查询、提交和归还
+    """
+
+    def __init__(self, max_workers: int = config.DB_EXECUTOR_WORKERS, max_connections: int = None):
+        self.max_workers = max_workers
+        self.max_connections = max_connections
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 连接名额：事件循环侧的信号量，按事件循环创建
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop = None
+        self._inflight = 0
+        self._errors = 0
+        self._errors_lock = threading.Lock()
+        # 排队等待工作线程、等待连接池分配连接、执行SQL三段耗时
+        self.executor_wait = LatencyStats()
+        self.pool_wait = LatencyStats()
+        self.query = LatencyStats()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(max(self.max_connections or config.DB_POOL_MAX_CONNECTIONS, 1))
+            self._slots_loop = loop
+        return self._slots
+
+    async def _acquire_slot(self) -> asyncio.Semaphore:
+        """等待连接名额，超过 DB_POOL_TIMEOUT 秒报错；返回的信号量由调用方在连接归还后 release"""
+        slots = self._get_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=config.DB_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            with database.pool_stats._lock:
+                database.pool_stats.timeouts += 1
+            raise Exception(
+                f"获取数据库连接超时（{config.DB_POOL_TIMEOUT}s），当前借出: {database.held_connections()}"
+            )
+        return slots
+
+    async def run(self, func: Callable[..., Any], *args, conn=None, **kwargs) -> Any:
+        """在数据库线程池中执行 func(conn, *args, **kwargs)
+
+        未传入conn时从连接池获取，执行完毕后归还；传入conn时由调用方负责关闭
+        """
+        # 在事件循环侧记录调用位置，线程池中的调用栈看不到真正的调用方
+        site = database.caller_site() if conn is None else None
+        submitted = time.perf_counter()
+        slots = await self._acquire_slot() if conn is None else None
+        queued = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            self.executor_wait.record(started - queued)
+            own_conn = conn is None
+            db_conn = database.get_db_connection(site) if own_conn else conn
+            acquired = time.perf_counter()
+            # 连接等待包括事件循环侧等待名额的时间
+            self.pool_wait.record(queued - submitted + acquired - started)
+            try:
+                return func(db_conn, *args, **kwargs)
+            except Exception:
+                with self._errors_lock:
+                    self._errors += 1
+                raise
+            finally:
+                self.query.record(time.perf_counter() - acquired)
+                if own_conn:
+                    db_conn.close()
+
+        self._inflight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(call)
+        except BaseException:
+            self._inflight -= 1
+            if slots is not None:
+                slots.release()
+            raise
+        if slots is not None:
+            # 调用方被取消时线程中的操作仍会执行完，名额在连接真正归还后才释放
+            future.add_done_callback(lambda _: self._release_slot(loop, slots))
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self._inflight -= 1
+
+    @staticmethod
+    def _release_slot(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore):
+        try:
+            loop.call_soon_threadsafe(slots.release)
+        except RuntimeError:
+            # 事件循环已关闭，名额随之作废
+            pass
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[Any]:
+        """工作单元：作用域内的多次 run(..., conn=conn) 共用一个连接
+
+        正常退出提交未提交的事务、异常时回滚，始终归还连接。
+        连接不能被并发使用，作用域内的操作需顺序 await；不要在作用域内等待外部接口或LLM，避免长时间占用连接
+        """
+        site = database.caller_site()
+        loop = asyncio.get_running_loop()
+        slots = await self._acquire_slot()
+        try:
+            conn = await loop.run_in_executor(self._get_executor(), database.get_db_connection, site)
+        except BaseException:
+            slots.release()
+            raise
+        try:
+            yield conn
+            await self.run(lambda c: c.commit(), conn=conn)
+        except BaseException:
+            try:
+                await self.run(lambda c: c.rollback(), conn=conn)
+            except Exception as e:
+                logger.warning(f"工作单元回滚失败: {e}")
+            raise
+        finally:
+            try:
+                await loop.run_in_executor(self._get_executor(), conn.close)
+            finally:
+                slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        database.check_leaks()
+        with self._errors_lock:
+            errors = self._errors
+        return {
+            "pool": database.pool_stats.snapshot(),
+            "max_workers": self.max_workers,
+            "inflight": self._inflight,
+            "errors": errors,
+            "executor_wait": self.executor_wait.snapshot(),
+            "pool_wait": self.pool_wait.snapshot(),
+            "query": self.query.snapshot(),
+        }
+
+    def shutdown(self):
+        """关闭数据库线程池，等待已提交的操作完成"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logger.info("数据库线程池已关闭")
+
+async_db = AsyncDatabase()
@@ -0,0 +1,30 @@
+"""一次性整理 online_time_periods 中的历史重复/重叠时间段
+
+    cd app && python -m repository.compact_periods [--batch-size 500]
+
+按 online_status 主键分批处理，每批一个事务，可随时中断后重新执行。
+"""
+import argparse
+import logging
+import sys
+from repository.online_status import compact_time_periods
+
+def main(argv=None) -> int:
+    from repository import database
+
+    parser = argparse.ArgumentParser(prog="python -m repository.compact_periods")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的 online_status 记录数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    conn = database.get_db_connection()
+    try:
+        totals = compact_time_periods(conn, batch_size=args.batch_size)
+        print(f"compacted {totals['batches']} batches: inserted {totals['inserted']}, deleted {totals['deleted']}")
+        return 0
+    finally:
+        conn.close()
+        database.close_db()
+
+if __name__ == "__main__":
+    sys.exit(main())
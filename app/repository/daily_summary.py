@@ -0,0 +1,144 @@
+"""每日工作模式汇总表 daily_work_summary
+
+时间段、考勤、步数写入后在同一事务内增量刷新对应 (userid, date) 的汇总行；
+历史数据用命令行回填：
+    cd app && python -m repository.daily_summary [--batch-size 500]
+"""
+import argparse
+import logging
+import sys
+from typing import Any, Dict, Iterable, List
+import pymysql.cursors
+from core import config
+from utils.work_pattern import summarize_day
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = (
+    "total_busy_minutes", "longest_busy_minutes", "first_busy_at", "last_busy_at",
+    "late_night", "break_count", "steps"
+)
+
+def _date_key(date) -> str:
+    return date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+
+def refresh_daily_summaries(cursor, task_ids: Iterable[int]) -> int:
+    """按 online_status 主键重新计算并写入汇总行，需在写入时间段/考勤/步数的同一事务内调用
+
+    返回写入的汇总行数
+    """
+    task_ids = sorted(set(task_ids))
+    if not task_ids:
+        return 0
+    placeholders = ", ".join(["%s"] * len(task_ids))
+
+    cursor.execute(f"SELECT id, userid, date, steps FROM online_status WHERE id IN ({placeholders})", task_ids)
+    parents = {row['id']: row for row in cursor.fetchall()}
+    cursor.execute(
+        f"SELECT task_id, start_datetime, end_datetime FROM online_time_periods WHERE task_id IN ({placeholders})",
+        task_ids
+    )
+    periods: Dict[int, List[tuple]] = {}
+    for row in cursor.fetchall():
+        periods.setdefault(row['task_id'], []).append((row['start_datetime'], row['end_datetime']))
+
+    rows = []
+    for task_id, parent in parents.items():
+        summary = summarize_day(
+            _date_key(parent['date']),
+            periods.get(task_id, []),
+            steps=parent['steps'],
+            break_minutes=config.WORK_BREAK_MINUTES,
+            late_night_hour=config.LATE_NIGHT_HOUR
+        )
+        rows.append((parent['userid'], summary['date'], *[summary[column] for column in SUMMARY_COLUMNS]))
+    if not rows:
+        return 0
+
+    updates = ", ".join(f"{column} = VALUES({column})" for column in SUMMARY_COLUMNS)
+    cursor.executemany(
+        f"""
+        INSERT INTO daily_work_summary (userid, date, {', '.join(SUMMARY_COLUMNS)})
+        VALUES (%s, %s, {', '.join(['%s'] * len(SUMMARY_COLUMNS))})
+        ON DUPLICATE KEY UPDATE {updates}
+        """,
+        rows
+    )
+    return len(rows)
+
+def select_daily_summaries(
+        cursor,
+        userids: Iterable[str],
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """一次查询多个用户日期范围内的汇总行，按用户、日期分组"""
+    userids = sorted(set(userids))
+    if not userids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(userids))
+    cursor.execute(
+        f"""
+        SELECT userid, date, {', '.join(SUMMARY_COLUMNS)} FROM daily_work_summary
+        WHERE userid IN ({placeholders}) AND date BETWEEN %s AND %s
+        ORDER BY userid, date
+        """,
+        [*userids, start_date, end_date]
+    )
+    grouped: Dict[str, Dict[str, Dict[str, Any]]] = {userid: {} for userid in userids}
+    for row in cursor.fetchall():
+        date = _date_key(row['date'])
+        grouped.setdefault(row['userid'], {})[date] = {
+            "total_busy_minutes": row['total_busy_minutes'],
+            "longest_busy_minutes": row['longest_busy_minutes'],
+            "first_busy_at": row['first_busy_at'].strftime("%H:%M") if row['first_busy_at'] else None,
+            "last_busy_at": row['last_busy_at'].strftime("%H:%M") if row['last_busy_at'] else None,
+            "late_night": bool(row['late_night']),
+            "break_count": row['break_count'],
+            "steps": row['steps'],
+        }
+    return grouped
+
+def backfill_daily_summaries(conn, batch_size: int = 500) -> int:
+    """按 online_status 主键分批回填历史汇总，每批一个事务"""
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    last_id = 0
+    total = 0
+    try:
+        while True:
+            cursor.execute(
+                "SELECT id FROM online_status WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            task_ids = [row['id'] for row in cursor.fetchall()]
+            if not task_ids:
+                break
+            conn.begin()
+            try:
+                total += refresh_daily_summaries(cursor, task_ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            last_id = task_ids[-1]
+            logger.info(f"回填每日汇总至 online_status id {last_id}，累计 {total} 行")
+    finally:
+        cursor.close()
+    return total
+
+def main(argv=None) -> int:
+    from repository import database
+
+    parser = argparse.ArgumentParser(prog="python -m repository.daily_summary")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的 online_status 记录数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    with database.connection() as conn:
+        total = backfill_daily_summaries(conn, batch_size=args.batch_size)
+    print(f"backfilled {total} daily summaries")
+    database.close_db()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
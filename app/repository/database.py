@@ -1,7 +1,16 @@
+import asyncio
+import concurrent.futures
+import contextlib
 import pymysql
 import logging
+import os
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from dbutils.pooled_db import PooledDB
-from typing import Generator
+from typing import Any, Dict, Generator, List
 from core import config
 
 logger = logging.getLogger(__name__)
@@ -17,51 +26,239 @@ db_config = {
 }
 
 connection_pool = None
+_init_lock = threading.Lock()
+# 限制同时借出的连接数，获取连接超过 DB_POOL_TIMEOUT 秒直接报错，避免任务占满连接池后接口永久阻塞
+_checkout_slots = None
+
+class PoolStats:
+    """连接池借出/等待/泄漏统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.leaks = 0
+        self.long_holds = 0
+        # id(连接包装) -> (获取位置, 获取时间, 线程名)
+        self.checked_out: Dict[int, tuple] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checked_out": len(self.checked_out),
+                "idle": len(getattr(connection_pool, "_idle_cache", []) or []),
+                "max_connections": config.DB_POOL_MAX_CONNECTIONS,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "wait_avg_ms": round(self.wait_total / self.waits * 1000, 2) if self.waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 2),
+                "timeouts": self.timeouts,
+                "leaks": self.leaks,
+                "long_holds": self.long_holds,
+            }
+
+pool_stats = PoolStats()
+
+# 数据库封装自身及标准库中事件循环、线程池、上下文管理器的模块：按文件/包目录的完整路径比较
+_INTERNAL_FILES = frozenset(os.path.abspath(path) for path in (
+    __file__, os.path.join(os.path.dirname(__file__), "async_database.py"), contextlib.__file__, threading.__file__
+))
+_INTERNAL_DIRS = tuple(os.path.dirname(os.path.abspath(module.__file__)) + os.sep for module in (asyncio, concurrent.futures))
+# 文件名 -> 是否属于内部模块（co_filename 数量有限，判断结果缓存后每帧只需一次字典查找）
+_internal_by_filename: Dict[str, bool] = {}
+
+def _is_internal(filename: str) -> bool:
+    internal = _internal_by_filename.get(filename)
+    if internal is None:
+        path = os.path.abspath(filename)
+        internal = path in _INTERNAL_FILES or path.startswith(_INTERNAL_DIRS)
+        _internal_by_filename[filename] = internal
+    return internal
+
+def caller_site() -> str:
+    """调用栈中第一个不属于数据库封装的位置，用于定位未归还的连接
+
+    在事件循环上按帧向外查找，只读取文件名和行号，不构建完整调用栈
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if not _is_internal(code.co_filename):
+            return f"{code.co_filename}:{frame.f_lineno} in {code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+def _release(token: int, held: float, site: str, leaked: bool = False):
+    with pool_stats._lock:
+        pool_stats.checked_out.pop(token, None)
+        if leaked:
+            pool_stats.leaks += 1
+        elif held > config.DB_LEAK_WARN_SECONDS:
+            pool_stats.long_holds += 1
+    if _checkout_slots is not None:
+        try:
+            _checkout_slots.release()
+        except ValueError:
+            # 连接池重建前借出的连接，名额已随旧连接池作废
+            pass
+    if not leaked and held > config.DB_LEAK_WARN_SECONDS:
+        logger.warning(f"数据库连接持有 {held:.1f}s 才归还，获取位置: {site}")
+
+def _finalize_leak(raw_conn, token: int, site: str, acquired_at: float):
+    """连接包装被回收时仍未close：记录泄漏位置，并把连接归还连接池"""
+    held = time.monotonic() - acquired_at
+    logger.error(f"数据库连接未归还（持有 {held:.1f}s），获取位置: {site}")
+    try:
+        raw_conn.close()
+    except Exception as e:
+        logger.debug(f"归还泄漏连接时出错: {e}")
+    _release(token, held, site, leaked=True)
+
+class TrackedConnection:
+    """连接池连接的包装：记录获取位置与持有时长，close 时归还连接和借出名额"""
+
+    def __init__(self, raw_conn, site: str):
+        self._conn = raw_conn
+        self.site = site
+        self.acquired_at = time.monotonic()
+        self._token = id(self)
+        self._finalizer = weakref.finalize(self, _finalize_leak, raw_conn, self._token, site, self.acquired_at)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def close(self):
+        if not self._finalizer.alive:
+            return
+        self._finalizer.detach()
+        try:
+            self._conn.close()
+        finally:
+            _release(self._token, time.monotonic() - self.acquired_at, self.site)
 
 def init_db():
     """
     初始化数据库连接池
     """
-    global connection_pool
+    global connection_pool, _checkout_slots
     if connection_pool is not None:
         return
-    if connection_pool is None:
+    with _init_lock:
+        if connection_pool is not None:
+            return
         connection_pool = PooledDB(
             creator=pymysql,
-            maxconnections=5,
-            mincached=2,
-            maxcached=5,
+            maxconnections=config.DB_POOL_MAX_CONNECTIONS,
+            mincached=config.DB_POOL_MIN_CACHED,
+            maxcached=config.DB_POOL_MAX_CACHED,
             blocking=True,
             **db_config
         )
-    logger.info("数据库连接池初始化成功")
+        _checkout_slots = threading.BoundedSemaphore(config.DB_POOL_MAX_CONNECTIONS)
+    logger.info(f"数据库连接池初始化成功（最大连接数 {config.DB_POOL_MAX_CONNECTIONS}）")
+
+def get_db_connection(site: str = None) -> TrackedConnection:
+    """从连接池借出连接，调用方必须 close；优先使用 connection() / unit_of_work()
 
-def get_db_connection():
+    site 为获取位置，在线程池中借出时由调用方在事件循环侧记录
+    """
     if connection_pool is None:
         init_db()
-    return connection_pool.connection()
+    site = site or caller_site()
+    started = time.monotonic()
+    if not _checkout_slots.acquire(blocking=False):
+        # 连接已全部借出，等待归还
+        acquired = _checkout_slots.acquire(timeout=config.DB_POOL_TIMEOUT)
+        waited = time.monotonic() - started
+        with pool_stats._lock:
+            pool_stats.waits += 1
+            pool_stats.wait_total += waited
+            pool_stats.wait_max = max(pool_stats.wait_max, waited)
+            if not acquired:
+                pool_stats.timeouts += 1
+        if not acquired:
+            raise Exception(
+                f"获取数据库连接超时（{config.DB_POOL_TIMEOUT}s），当前借出: {held_connections()}"
+            )
+    try:
+        raw_conn = connection_pool.connection()
+    except Exception:
+        _checkout_slots.release()
+        raise
+    conn = TrackedConnection(raw_conn, site)
+    with pool_stats._lock:
+        pool_stats.acquired += 1
+        pool_stats.checked_out[conn._token] = (site, conn.acquired_at, threading.current_thread().name)
+    return conn
 
-def get_db() -> Generator:
-    """
-    获取数据库连接上下文管理器
-    """
+@contextmanager
+def connection() -> Generator:
+    """借出一个连接，退出时归还"""
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def unit_of_work() -> Generator:
+    """工作单元：作用域内多次操作共用一个连接，正常退出提交未提交的事务、异常时回滚，始终归还连接"""
     conn = get_db_connection()
     try:
         yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
+def get_db() -> Generator:
+    """
+    获取数据库连接上下文管理器
+    """
+    with connection() as conn:
+        yield conn
+
+def held_connections(min_seconds: float = 0) -> List[Dict[str, Any]]:
+    """当前借出的连接（获取位置、线程、已持有时长），按持有时长降序"""
+    now = time.monotonic()
+    with pool_stats._lock:
+        items = list(pool_stats.checked_out.values())
+    held = [
+        {"site": site, "thread": thread, "held_s": round(now - acquired_at, 1)}
+        for site, acquired_at, thread in items
+        if now - acquired_at >= min_seconds
+    ]
+    return sorted(held, key=lambda item: item["held_s"], reverse=True)
+
+def check_leaks() -> List[Dict[str, Any]]:
+    """记录持有超过 DB_LEAK_WARN_SECONDS 仍未归还的连接"""
+    suspects = held_connections(config.DB_LEAK_WARN_SECONDS)
+    for item in suspects:
+        logger.warning(f"数据库连接已持有 {item['held_s']}s 未归还，获取位置: {item['site']}（线程 {item['thread']}）")
+    return suspects
+
 def close_db():
     """
     关闭数据库连接池
     """
-    global connection_pool
+    global connection_pool, _checkout_slots
     if connection_pool:
         # DBUtils PooledDB 通常会自动管理连接关闭
         # 但我们可以手动关闭所有连接
         try:
+            check_leaks()
             connection_pool.close()
             connection_pool = None
+            _checkout_slots = None
             logger.info("数据库连接池已关闭")
         except Exception as e:
             logger.debug(f"关闭数据库连接池时出错: {e}")
@@ -0,0 +1,134 @@
+import logging
+import time
+from typing import Callable, Dict, Iterable, Optional
+import pymysql.cursors
+from repository.async_database import async_db
+from core import config
+
+logger = logging.getLogger(__name__)
+
+def _select_mapping(cursor, column: str, values: Iterable[str]) -> Dict[str, str]:
+    """按 userid 或 unionid 批量查询映射，返回 {userid: unionid}"""
+    values = sorted(set(values))
+    if not values:
+        return {}
+    placeholders = ", ".join(["%s"] * len(values))
+    cursor.execute(f"SELECT userid, unionid FROM employees WHERE {column} IN ({placeholders})", values)
+    return {row['userid']: row['unionid'] for row in cursor.fetchall() if row['unionid']}
+
+def select_all_mappings(conn) -> Dict[str, str]:
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("SELECT userid, unionid FROM employees")
+        return {row['userid']: row['unionid'] for row in cursor.fetchall() if row['unionid']}
+    finally:
+        cursor.close()
+
+def select_mappings(conn, userids: Iterable[str] = (), unionids: Iterable[str] = ()) -> Dict[str, str]:
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        mapping = _select_mapping(cursor, "userid", userids)
+        mapping.update(_select_mapping(cursor, "unionid", unionids))
+        return mapping
+    finally:
+        cursor.close()
+
+class IdentityMap:
+    """employees 表 userid <-> unionid 的内存双向映射
+
+    启动时整表加载，查询走内存；内存未命中时回查数据库（一次查询补齐整批）并缓存，
+    数据库中也没有的 id 在 miss_ttl 秒内不再回查。UserService 写入员工信息后同步更新。
+    映射只在事件循环线程中修改。
+    """
+
+    def __init__(self, miss_ttl: float = config.IDENTITY_MISS_TTL, clock: Callable[[], float] = time.monotonic):
+        self._unionid_by_userid: Dict[str, str] = {}
+        self._userid_by_unionid: Dict[str, str] = {}
+        # 查无此人的 id -> 过期时间，按查询列分开记录
+        self._missing: Dict[str, Dict[str, float]] = {"userids": {}, "unionids": {}}
+        self.miss_ttl = miss_ttl
+        self.clock = clock
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self, conn=None):
+        """从数据库整表加载映射"""
+        mapping = await async_db.run(select_all_mappings, conn=conn)
+        self._unionid_by_userid = dict(mapping)
+        self._userid_by_unionid = {unionid: userid for userid, unionid in mapping.items()}
+        self._missing = {"userids": {}, "unionids": {}}
+        self.loaded = True
+        logger.info(f"加载员工ID映射 {len(mapping)} 条")
+
+    def put(self, userid: str, unionid: Optional[str]):
+        """写入/更新一条映射，旧的反向映射一并移除"""
+        if not userid or not unionid:
+            return
+        old_unionid = self._unionid_by_userid.get(userid)
+        if old_unionid and old_unionid != unionid:
+            self._userid_by_unionid.pop(old_unionid, None)
+        old_userid = self._userid_by_unionid.get(unionid)
+        if old_userid and old_userid != userid:
+            self._unionid_by_userid.pop(old_userid, None)
+        self._unionid_by_userid[userid] = unionid
+        self._userid_by_unionid[unionid] = userid
+        self._missing["userids"].pop(userid, None)
+        self._missing["unionids"].pop(unionid, None)
+
+    def get_unionid(self, userid: str) -> Optional[str]:
+        """仅查内存"""
+        return self._unionid_by_userid.get(userid)
+
+    def get_userid(self, unionid: str) -> Optional[str]:
+        """仅查内存"""
+        return self._userid_by_unionid.get(unionid)
+
+    async def resolve_unionids(self, userids: Iterable[str], conn=None) -> Dict[str, str]:
+        """批量解析 userid -> unionid，未找到的不出现在结果中"""
+        return await self._resolve(list(userids), "userids", conn)
+
+    async def resolve_userids(self, unionids: Iterable[str], conn=None) -> Dict[str, str]:
+        """批量解析 unionid -> userid，未找到的不出现在结果中"""
+        return await self._resolve(list(unionids), "unionids", conn)
+
+    async def find_unionid(self, userid: str, conn=None) -> Optional[str]:
+        return (await self.resolve_unionids([userid], conn=conn)).get(userid)
+
+    async def find_userid(self, unionid: str, conn=None) -> Optional[str]:
+        return (await self.resolve_userids([unionid], conn=conn)).get(unionid)
+
+    def _index(self, column: str) -> Dict[str, str]:
+        return self._unionid_by_userid if column == "userids" else self._userid_by_unionid
+
+    async def _resolve(self, keys, column: str, conn) -> Dict[str, str]:
+        index = self._index(column)
+        known_missing = self._missing[column]
+        now = self.clock()
+        result = {}
+        missing = []
+        for key in keys:
+            value = index.get(key)
+            if value is not None:
+                result[key] = value
+            elif known_missing.get(key, 0) <= now:
+                missing.append(key)
+        self.hits += len(result)
+        if missing:
+            self.misses += len(missing)
+            # 其他进程新增的员工：整批回查一次数据库并缓存
+            for userid, unionid in (await async_db.run(select_mappings, conn=conn, **{column: missing})).items():
+                self.put(userid, unionid)
+            index = self._index(column)
+            for key in missing:
+                value = index.get(key)
+                if value is not None:
+                    result[key] = value
+                elif self.miss_ttl > 0:
+                    known_missing[key] = now + self.miss_ttl
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._unionid_by_userid), "hits": self.hits, "misses": self.misses}
+
+identity_map = IdentityMap()
@@ -0,0 +1,382 @@
+"""数据库版本化迁移
+
+启动时（DB_AUTO_MIGRATE=true）或命令行执行：
+    cd app && python -m repository.migrations upgrade   # 应用未执行的迁移
+    cd app && python -m repository.migrations status    # 查看当前版本
+    cd app && python -m repository.migrations check     # EXPLAIN 热点查询，出现全表扫描时返回非0
+
+MySQL 的 DDL 会隐式提交，无法整体回滚，因此每一步都写成可重复执行的形式
+（IF NOT EXISTS / 先查 information_schema），中途失败后重新执行即可。
+"""
+import logging
+import sys
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+import pymysql.cursors
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK = "health_guardian_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 60
+
+Step = Union[str, Callable[[Any], None]]
+
+def _table_indexes(cursor, table: str) -> Dict[str, Tuple[Tuple[str, ...], bool]]:
+    """表上已有的索引：{索引名: (按顺序的列, 是否唯一)}"""
+    cursor.execute(
+        """
+        SELECT index_name AS index_name, column_name AS column_name, non_unique AS non_unique
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY index_name, seq_in_index
+        """,
+        (table,)
+    )
+    indexes: Dict[str, Tuple[Tuple[str, ...], bool]] = {}
+    for row in cursor.fetchall():
+        columns, _ = indexes.get(row['index_name'], ((), True))
+        indexes[row['index_name']] = (columns + (row['column_name'].lower(),), not row['non_unique'])
+    return indexes
+
+def add_index(table: str, index: str, columns: Sequence[str], unique: bool = False) -> Step:
+    """索引不存在时才创建（MySQL 不支持 ADD INDEX IF NOT EXISTS）
+
+    已有同名索引，或已有相同列序的索引（要求唯一时该索引也须唯一，如旧建表脚本中的 unique_user_date）时跳过
+    """
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    wanted = tuple(column.lower() for column in columns)
+
+    def step(cursor):
+        indexes = _table_indexes(cursor, table)
+        if index in indexes:
+            return
+        for name, (existing, existing_unique) in indexes.items():
+            if existing == wanted and (existing_unique or not unique):
+                logger.info(f"{table} 已有相同列的索引 {name}，跳过创建 {index}")
+                return
+        cursor.execute(f"ALTER TABLE {table} ADD {kind} {index} ({', '.join(columns)})")
+        logger.info(f"创建索引 {table}.{index}")
+    return step
+
+def _repoint_duplicate_online_status(cursor):
+    """旧库中 (userid, date) 可能有重复的 online_status，子表改指向最小id后删除多余记录"""
+    cursor.execute(
+        """
+        SELECT s.id AS dup_id, k.keep_id
+        FROM online_status s
+        JOIN (SELECT userid, date, MIN(id) AS keep_id
+              FROM online_status GROUP BY userid, date HAVING COUNT(*) > 1) k
+          ON s.userid = k.userid AND s.date = k.date
+        WHERE s.id <> k.keep_id
+        """
+    )
+    # 先取到内存再改写，避免在同一语句中读写 online_status（MySQL error 1093）
+    duplicates = [(row['keep_id'], row['dup_id']) for row in cursor.fetchall()]
+    if not duplicates:
+        return
+    for child in ("online_time_periods", "health_message", "attendance_data"):
+        cursor.executemany(f"UPDATE {child} SET task_id = %s WHERE task_id = %s", duplicates)
+    cursor.executemany("DELETE FROM online_status WHERE id = %s", [dup_id for _, dup_id in duplicates])
+    logger.info(f"合并重复的 online_status 记录 {len(duplicates)} 条")
+
+def _delete_duplicate_periods(cursor):
+    """同一父记录下完全相同的时间段只保留一条"""
+    cursor.execute(
+        """
+        DELETE p1 FROM online_time_periods p1
+        JOIN online_time_periods p2
+          ON p1.task_id = p2.task_id
+         AND p1.start_datetime <=> p2.start_datetime
+         AND p1.end_datetime <=> p2.end_datetime
+         AND p1.id > p2.id
+        """
+    )
+
+# (版本号, 描述, 步骤)；已发布的迁移不要修改，新变更追加新版本
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            userid VARCHAR(50) PRIMARY KEY,
+            name VARCHAR(50) NOT NULL,
+            title VARCHAR(50),
+            hobby VARCHAR(100),
+            age INT,
+            unionid VARCHAR(100) NOT NULL DEFAULT ''
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS online_status (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            userid VARCHAR(255) NOT NULL,
+            date DATE NOT NULL,
+            steps INT DEFAULT 0,
+            CONSTRAINT fk_online_status_userid FOREIGN KEY (userid)
+                REFERENCES employees (userid) ON DELETE CASCADE
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS online_time_periods (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            task_id INT NOT NULL,
+            start_datetime DATETIME,
+            end_datetime DATETIME,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES online_status (id) ON DELETE CASCADE
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS health_message (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            task_id INT NOT NULL,
+            date_time DATETIME,
+            msg TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES online_status (id) ON DELETE CASCADE
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS attendance_data (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            task_id INT NOT NULL,
+            userCheckTime VARCHAR(255) NOT NULL,
+            checkType VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES online_status (id) ON DELETE CASCADE
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+    ]),
+    (2, "hot query indexes", [
+        # 批量 upsert 依赖 (userid, date) 唯一键，先合并旧数据中的重复记录
+        _repoint_duplicate_online_status,
+        add_index("online_status", "uk_online_status_user_date", ["userid", "date"], unique=True),
+        # 同一时间段重复写入由唯一约束拦截；前缀 task_id 同时覆盖按 task_id ORDER BY start_datetime
+        _delete_duplicate_periods,
+        add_index("online_time_periods", "uk_periods_task_start_end",
+                  ["task_id", "start_datetime", "end_datetime"], unique=True),
+        add_index("employees", "idx_employees_unionid", ["unionid"]),
+        add_index("attendance_data", "idx_attendance_task_time", ["task_id", "userCheckTime"]),
+        add_index("health_message", "idx_health_message_task_time", ["task_id", "date_time"]),
+    ]),
+    (3, "daily work summary rollup", [
+        """
+        CREATE TABLE IF NOT EXISTS daily_work_summary (
+            userid VARCHAR(255) NOT NULL,
+            date DATE NOT NULL,
+            total_busy_minutes INT NOT NULL DEFAULT 0,
+            longest_busy_minutes INT NOT NULL DEFAULT 0,
+            first_busy_at DATETIME NULL,
+            last_busy_at DATETIME NULL,
+            late_night TINYINT(1) NOT NULL DEFAULT 0,
+            break_count INT NOT NULL DEFAULT 0,
+            steps INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (userid, date)
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+    ]),
+    (4, "history archive tables", [
+        # 归档任务按日期筛选过期的父记录
+        add_index("online_status", "idx_online_status_date", ["date"]),
+        # 父记录清理前先归档，保留每天的步数
+        """
+        CREATE TABLE IF NOT EXISTS online_status_archive (
+            id INT PRIMARY KEY,
+            userid VARCHAR(255) NOT NULL,
+            date DATE NOT NULL,
+            steps INT DEFAULT 0,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_online_status_archive_user_date (userid, date)
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+        # 归档表冗余 userid/date，父记录清理后仍可按用户、日期查询；id 沿用原表主键，重复归档时忽略
+        """
+        CREATE TABLE IF NOT EXISTS online_time_periods_archive (
+            id INT PRIMARY KEY,
+            task_id INT NOT NULL,
+            userid VARCHAR(255) NOT NULL,
+            date DATE NOT NULL,
+            start_datetime DATETIME,
+            end_datetime DATETIME,
+            created_at TIMESTAMP NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_periods_archive_user_date (userid, date)
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS attendance_data_archive (
+            id INT PRIMARY KEY,
+            task_id INT NOT NULL,
+            userid VARCHAR(255) NOT NULL,
+            date DATE NOT NULL,
+            userCheckTime VARCHAR(255) NOT NULL,
+            checkType VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_attendance_archive_user_date (userid, date)
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS health_message_archive (
+            id INT PRIMARY KEY,
+            task_id INT NOT NULL,
+            userid VARCHAR(255) NOT NULL,
+            date DATE NOT NULL,
+            date_time DATETIME,
+            msg TEXT,
+            created_at TIMESTAMP NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_health_message_archive_user_date (userid, date)
+        ) DEFAULT CHARSET = utf8mb4
+        """,
+    ]),
+]
+
+# 热点查询：(名称, SQL, 示例参数)，check 时逐条 EXPLAIN
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("online_status by user/date",
+     "SELECT id FROM online_status WHERE userid = %s AND date = %s",
+     ("manager4585", "2025-01-01")),
+    ("periods by task",
+     "SELECT start_datetime, end_datetime FROM online_time_periods WHERE task_id = %s ORDER BY start_datetime",
+     (1,)),
+    ("employee by unionid",
+     "SELECT userid FROM employees WHERE unionid = %s",
+     ("unionid",)),
+    ("attendance by task",
+     "SELECT userCheckTime, checkType FROM attendance_data WHERE task_id = %s",
+     (1,)),
+    ("health message by task",
+     "SELECT msg, date_time FROM health_message WHERE task_id = %s",
+     (1,)),
+    ("periods by users/date range",
+     "SELECT s.userid, s.date, p.start_datetime, p.end_datetime FROM online_status s "
+     "LEFT JOIN online_time_periods p ON p.task_id = s.id "
+     "WHERE s.userid IN (%s, %s) AND s.date BETWEEN %s AND %s ORDER BY s.userid, s.date, p.start_datetime",
+     ("manager4585", "unionid", "2025-01-01", "2025-01-07")),
+    ("daily summaries by users/date range",
+     "SELECT * FROM daily_work_summary WHERE userid IN (%s, %s) AND date BETWEEN %s AND %s",
+     ("manager4585", "unionid", "2025-01-01", "2025-01-07")),
+]
+
+# EXPLAIN type 为 ALL（全表扫描）或 index（全索引扫描）视为未命中索引
+FULL_SCAN_TYPES = {"ALL", "index"}
+
+def _ensure_version_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) DEFAULT CHARSET = utf8mb4
+        """
+    )
+
+def _applied_versions(cursor) -> set:
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+def current_version(conn) -> int:
+    """当前已应用的最高版本号，未迁移过时为0"""
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        _ensure_version_table(cursor)
+        return max(_applied_versions(cursor), default=0)
+    finally:
+        cursor.close()
+
+def apply_migrations(conn, migrations=None) -> List[int]:
+    """按版本顺序应用未执行的迁移，返回本次应用的版本号
+
+    通过 GET_LOCK 串行化，多个 worker 同时启动时只有一个执行迁移
+    """
+    migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m[0])
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    applied = []
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if not cursor.fetchone()['locked']:
+            raise Exception(f"获取迁移锁超时: {MIGRATION_LOCK}")
+        try:
+            _ensure_version_table(cursor)
+            done = _applied_versions(cursor)
+            for version, name, steps in migrations:
+                if version in done:
+                    continue
+                logger.info(f"应用数据库迁移 {version}: {name}")
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                conn.commit()
+                applied.append(version)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if applied:
+        logger.info(f"数据库迁移完成，本次应用版本: {applied}")
+    else:
+        logger.info("数据库结构已是最新")
+    return applied
+
+def explain_hot_queries(conn, queries=None) -> List[Dict[str, Any]]:
+    """EXPLAIN 热点查询，返回出现全表扫描的查询及其执行计划"""
+    queries = queries if queries is not None else HOT_QUERIES
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    problems = []
+    try:
+        for name, sql, params in queries:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            for row in cursor.fetchall():
+                if row.get('type') in FULL_SCAN_TYPES:
+                    problems.append({"query": name, "table": row.get('table'), "type": row.get('type')})
+    finally:
+        cursor.close()
+    return problems
+
+def check_query_plans(conn, queries=None):
+    """热点查询出现全表扫描时抛出异常"""
+    problems = explain_hot_queries(conn, queries)
+    if problems:
+        details = "; ".join(f"{p['query']} -> {p['table']} ({p['type']})" for p in problems)
+        raise Exception(f"热点查询未命中索引: {details}")
+    logger.info(f"{len(queries if queries is not None else HOT_QUERIES)} 条热点查询均命中索引")
+
+def main(argv=None) -> int:
+    from repository import database
+
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "upgrade"
+    if command not in ("upgrade", "status", "check"):
+        print("usage: python -m repository.migrations [upgrade|status|check]")
+        return 2
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    conn = database.get_db_connection()
+    try:
+        if command == "upgrade":
+            apply_migrations(conn)
+        elif command == "status":
+            latest = max(m[0] for m in MIGRATIONS)
+            print(f"current version: {current_version(conn)}, latest: {latest}")
+        else:
+            try:
+                check_query_plans(conn)
+            except Exception as e:
+                print(str(e))
+                return 1
+        return 0
+    finally:
+        conn.close()
+        database.close_db()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import logging
+import pymysql.cursors
+from typing import Dict, Iterable, List, Tuple
+from utils.merge_periods import merge_periods
+
+logger = logging.getLogger(__name__)
+
+def _date_key(date) -> str:
+    # pymysql 返回 datetime.date，统一成 YYYY-MM-DD 字符串
+    return date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+
+def ensure_online_status_ids(
+        cursor,
+        keys: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], int]:
+    """批量获取 (userid, date) 对应的 online_status 主键，不存在的父记录一并创建
+
+    依赖 online_status 上的 (userid, date) 唯一键：缺失的父记录用一条多行
+    INSERT ... ON DUPLICATE KEY UPDATE 创建，并发写入同一天时不会产生重复记录；
+    随后一条查询取回全部主键。需在调用方的事务内执行。
+    """
+    # 排序后写入，多个写入方同时加锁时顺序一致，避免死锁
+    keys = sorted({(userid, _date_key(date)) for userid, date in keys})
+    if not keys:
+        return {}
+
+    placeholders = ", ".join(["(%s, %s)"] * len(keys))
+    params: List[str] = [value for key in keys for value in key]
+
+    cursor.execute(
+        f"INSERT INTO online_status (userid, date) VALUES {placeholders} "
+        f"ON DUPLICATE KEY UPDATE id = id",
+        params
+    )
+    cursor.execute(
+        f"SELECT id, userid, date FROM online_status WHERE (userid, date) IN ({placeholders})",
+        params
+    )
+    return {(row['userid'], _date_key(row['date'])): row['id'] for row in cursor.fetchall()}
+
+def select_time_periods_in_range(
+        cursor,
+        userids: Iterable[str],
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, Dict[str, List[tuple]]]:
+    """一条 JOIN 查询取出多个用户在 [start_date, end_date] 内的全部时间段，按用户、日期分组
+
+    有 online_status 记录但没有时间段的日期返回空列表
+    """
+    userids = sorted(set(userids))
+    if not userids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(userids))
+    cursor.execute(
+        f"""
+        SELECT s.userid, s.date, p.start_datetime, p.end_datetime
+        FROM online_status s
+        LEFT JOIN online_time_periods p ON p.task_id = s.id
+        WHERE s.userid IN ({placeholders}) AND s.date BETWEEN %s AND %s
+        ORDER BY s.userid, s.date, p.start_datetime
+        """,
+        [*userids, start_date, end_date]
+    )
+    grouped: Dict[str, Dict[str, List[tuple]]] = {userid: {} for userid in userids}
+    for row in cursor.fetchall():
+        periods = grouped.setdefault(row['userid'], {}).setdefault(_date_key(row['date']), [])
+        if row['start_datetime'] is not None or row['end_datetime'] is not None:
+            periods.append((row['start_datetime'], row['end_datetime']))
+    return grouped
+
+def merge_task_periods(cursor, new_periods: Dict[int, List[tuple]]) -> Tuple[int, int]:
+    """将新时间段与各父记录已有的时间段合并（去重、合并重叠/相邻区间），只写入差异
+
+    已有时间段用 FOR UPDATE 锁定，并发写入同一用户同一天时串行执行。需在调用方的事务内执行。
+    返回 (插入条数, 删除条数)
+    """
+    task_ids = sorted(new_periods)
+    if not task_ids:
+        return 0, 0
+
+    placeholders = ", ".join(["%s"] * len(task_ids))
+    cursor.execute(
+        f"""
+        SELECT id, task_id, start_datetime, end_datetime FROM online_time_periods
+        WHERE task_id IN ({placeholders})
+        ORDER BY task_id, start_datetime
+        FOR UPDATE
+        """,
+        task_ids
+    )
+    existing: Dict[int, List[dict]] = {task_id: [] for task_id in task_ids}
+    for row in cursor.fetchall():
+        existing[row['task_id']].append(row)
+
+    to_delete = []
+    to_insert = []
+    for task_id in task_ids:
+        rows = existing[task_id]
+        merged = merge_periods(
+            [(row['start_datetime'], row['end_datetime']) for row in rows] + list(new_periods[task_id])
+        )
+        wanted = set(merged)
+        kept = set()
+        for row in rows:
+            period = (row['start_datetime'], row['end_datetime'])
+            # 已被合并的区间和重复行删除，每个保留区间只留一行
+            if period in wanted and period not in kept:
+                kept.add(period)
+            else:
+                to_delete.append(row['id'])
+        to_insert.extend((task_id, start, end) for start, end in merged if (start, end) not in kept)
+
+    if to_delete:
+        cursor.executemany("DELETE FROM online_time_periods WHERE id = %s", to_delete)
+    if to_insert:
+        cursor.executemany(
+            "INSERT INTO online_time_periods (task_id, start_datetime, end_datetime) VALUES (%s, %s, %s)",
+            to_insert
+        )
+    return len(to_insert), len(to_delete)
+
+def compact_time_periods(conn, batch_size: int = 500) -> Dict[str, int]:
+    """分批整理历史时间段：按 online_status 主键分页，每批一个事务，合并重复/重叠区间"""
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    totals = {"batches": 0, "inserted": 0, "deleted": 0}
+    last_id = 0
+    try:
+        while True:
+            conn.begin()
+            cursor.execute(
+                "SELECT id FROM online_status WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            task_ids = [row['id'] for row in cursor.fetchall()]
+            if not task_ids:
+                conn.commit()
+                break
+            try:
+                inserted, deleted = merge_task_periods(cursor, {task_id: [] for task_id in task_ids})
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            last_id = task_ids[-1]
+            totals["batches"] += 1
+            totals["inserted"] += inserted
+            totals["deleted"] += deleted
+            logger.info(f"整理时间段批次 {totals['batches']}（online_status id <= {last_id}）：插入 {inserted}，删除 {deleted}")
+    finally:
+        cursor.close()
+    return totals
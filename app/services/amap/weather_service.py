@@ -1,23 +1,76 @@
 #coding=utf-8
-import requests
-from typing import Dict, Any, Optional
+import asyncio
+import time
+import httpx
+from typing import Dict, Any, Optional, Tuple
 from fastapi import HTTPException
 import logging
 from core import config
+from core.http_client import HttpClients, get_default_http_clients
 
 AMAP_API_KEY =config.AMAP_API_KEY
 
 logger = logging.getLogger(__name__)
 
 class WeatherService:
-    def __init__(self):
+    def __init__(
+            self,
+            http_clients: HttpClients = None,
+            cache_ttl: int = config.WEATHER_CACHE_TTL,
+            stale_ttl: int = config.WEATHER_STALE_TTL):
         self.amap_api_key = AMAP_API_KEY
         self.base_url = "https://restapi.amap.com/v3/weather/weatherInfo"
+        self.client = (http_clients or get_default_http_clients()).amap
+        # 缓存在cache_ttl内直接返回；过期后stale_ttl内先返回旧数据并在后台刷新
+        self.cache_ttl = cache_ttl
+        self.stale_ttl = stale_ttl
+        self._cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
 
     async def get_weather_data(self, city: str, extensions: str = "base") -> Dict[str, Any]:
-        
-        #获取高德地图天气数据
-        
+
+        #获取高德地图天气数据（按城市adcode和extensions缓存）
+        key = (city, extensions)
+        cached = self._cache.get(key)
+        if cached:
+            fetched_at, weather_data = cached
+            age = time.monotonic() - fetched_at
+            if age < self.cache_ttl:
+                return weather_data
+            if age < self.cache_ttl + self.stale_ttl:
+                self._revalidate(key)
+                return weather_data
+
+        return await self._load(key)
+
+    async def _load(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        """同一城市同时未命中时只发起一次请求"""
+        return await asyncio.shield(self._start_fetch(key))
+
+    def _revalidate(self, key: Tuple[str, str]):
+        """后台刷新过期缓存，刷新失败时继续使用旧数据"""
+        self._start_fetch(key)
+
+    def _start_fetch(self, key: Tuple[str, str]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._fetch_done(key, t))
+        return task
+
+    def _fetch_done(self, key: Tuple[str, str], task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # 取出异常，避免后台刷新失败时出现未处理异常警告（错误已在请求处记录）
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_and_store(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        weather_data = await self._fetch_weather_data(*key)
+        self._cache[key] = (time.monotonic(), weather_data)
+        return weather_data
+
+    async def _fetch_weather_data(self, city: str, extensions: str) -> Dict[str, Any]:
         params = {
             "key": self.amap_api_key,
             "city": city,
@@ -26,7 +79,7 @@ class WeatherService:
         }
 
         try:
-            response = requests.get(self.base_url, params=params, timeout=10)
+            response = await self.client.get(self.base_url, params=params, timeout=10)
             response.raise_for_status()
 
             weather_data = response.json()
@@ -39,7 +92,9 @@ class WeatherService:
             # 格式化返回数据
             return self._format_weather_data(weather_data)
 
-        except requests.exceptions.RequestException as e:
+        except HTTPException:
+            raise
+        except httpx.HTTPError as e:
             logger.error(f"Internet quary fail:{str(e)}")
             raise HTTPException(status_code=503)
         except Exception as e:
@@ -49,10 +104,10 @@ class WeatherService:
     def _format_weather_data(self, weather_data: Dict[str, Any]) -> Dict[str, Any]:
             #格式化天气数据
             live_data = weather_data["lives"][0]
-            
+
             return {
                  "温度(℃)": live_data["temperature"],      # 温度(℃)
                 "天气状况": live_data["weather"],              # 天气状况
                 "湿度(%)": live_data["humidity"],            # 湿度(%)
                 "风力": live_data["windpower"],          # 风力
-            }
\ No newline at end of file
+            }
@@ -1,18 +1,33 @@
+import asyncio
 import httpx
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from api.dependencies.dingtalk_token import get_dingtalk_access_token
 from api.models.FreeBusy import FreeBusyRequest, FreeBusyResponse
-from utils.find_userId_by_unionid import find_unionid_by_userId,find_userid_by_unionid
+from utils.find_userId_by_unionid import find_unionid_by_userId
 from repository import database
+from repository.async_database import async_db
+from repository.online_status import ensure_online_status_ids, merge_task_periods, select_time_periods_in_range
+from repository.identity_map import identity_map
+from repository.daily_summary import refresh_daily_summaries, select_daily_summaries
+from core.http_client import HttpClients, get_default_http_clients
+from core import config
 import pymysql.cursors
 
 logger = logging.getLogger(__name__)
 
+def format_datetime(dt_str):
+    # 处理datetime格式（移除时区信息）
+    if dt_str and 'T' in dt_str:
+        if '+' in dt_str:
+            dt_str = dt_str.split('+')[0]
+        return dt_str.replace('T', ' ')
+    return dt_str
+
 class FreeBusyService:
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, http_clients: HttpClients = None):
+        self.client = (http_clients or get_default_http_clients()).dingtalk_api
 
     def reschedule_data(self,data:dict):
         flat_data_list = []
@@ -65,23 +80,22 @@ class FreeBusyService:
             }
             try:
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        url, headers=headers,json=data)
+                response = await self.client.post(
+                    url, headers=headers,json=data)
 
-                    if response.status_code == 200:
-            
-                        result = response.json()
-
-                        if len(result["scheduleInformation"])!=0:
-                            result = self.reschedule_data(result)
-                            return result
-                        else: 
-                            return []
-                        
-                    else:
-                        error_msg = f"status quary fail: {response.status_code}, {response.text}"
-                        raise Exception(error_msg)
+                if response.status_code == 200:
+        
+                    result = response.json()
+
+                    if len(result["scheduleInformation"])!=0:
+                        result = self.reschedule_data(result)
+                        return result
+                    else: 
+                        return []
+                    
+                else:
+                    error_msg = f"status quary fail: {response.status_code}, {response.text}"
+                    raise Exception(error_msg)
 
             except httpx.RequestError as e:
                 logger.error(f"internet quary fail: {str(e)}")
@@ -106,7 +120,7 @@ class FreeBusyService:
             startTime = time_min.strftime("%Y-%m-%dT%H:%M:%S") + "+08:00"
             endTime = time_max.strftime("%Y-%m-%dT%H:%M:%S") + "+08:00"
 
-            unionid = await find_unionid_by_userId(userId,conn=database.get_db_connection())
+            unionid = await find_unionid_by_userId(userId)
             request = FreeBusyRequest(
                 userIds=[unionid],
                 startTime=startTime,
@@ -119,65 +133,125 @@ class FreeBusyService:
                logger.error(f"quary process fail: {str(e)}")
                raise Exception(f"quary process fail: {str(e)}") from e
         
+    async def get_users_free_busy_status(
+            self,
+            unionids: List[str],
+            startTime: str,
+            endTime: str
+        ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        #批量查询多个用户忙闲状态，每次querySchedule最多FREEBUSY_BATCH_SIZE人；返回(日程列表, 查询失败的unionid)，全部批次失败时抛出异常
+        batch_size = config.FREEBUSY_BATCH_SIZE
+        batch_requests = [
+            FreeBusyRequest(
+                userIds=unionids[i:i + batch_size],
+                startTime=startTime,
+                endTime=endTime
+            )
+            for i in range(0, len(unionids), batch_size)
+        ]
+        semaphore = asyncio.Semaphore(max(config.FREEBUSY_CONCURRENCY, 1))
+
+        failed: List[str] = []
+        errors: List[str] = []
+
+        async def fetch_batch(request: FreeBusyRequest) -> List[Dict[str, Any]]:
+            # 单批失败（如被限流）只影响该批用户，其余批次的结果照常返回，失败的用户单独报告
+            async with semaphore:
+                try:
+                    return await self.get_user_free_busy_status(request)
+                except Exception as e:
+                    logger.error(f"批量查询忙闲状态失败，用户：{request.userIds}，错误：{e}")
+                    failed.extend(request.userIds)
+                    errors.append(str(e))
+                    return []
+
+        results = await asyncio.gather(*[fetch_batch(request) for request in batch_requests])
+        logger.info(f"批量查询 {len(unionids)} 名用户忙闲状态，共调用 {len(batch_requests)} 次，失败 {len(errors)} 次")
+        if batch_requests and len(errors) == len(batch_requests):
+            raise Exception(f"free busy batches all failed: {errors[0]}")
+        return [item for result in results for item in result], failed
+
+    async def get_users_free_busy_now_status(
+            self,
+            userIds: List[str]
+        ) -> Dict[str, List[Dict[str, Any]]]:
+        #批量获取多个用户最近3小时的忙闲状态，结果按userid分组；查询失败的用户不在结果中（与空闲区分），全部失败时抛出异常
+        try:
+            time_max = datetime.now()
+            time_min = time_max - timedelta(hours=3)
+            startTime = time_min.strftime("%Y-%m-%dT%H:%M:%S") + "+08:00"
+            endTime = time_max.strftime("%Y-%m-%dT%H:%M:%S") + "+08:00"
+
+            unionid_by_userid = await identity_map.resolve_unionids(userIds)
+            userid_by_unionid = {unionid: userId for userId, unionid in unionid_by_userid.items()}
+            for userId in userIds:
+                if userId not in unionid_by_userid:
+                    logger.error(f"user {userId} unionid not found")
+
+            grouped: Dict[str, List[Dict[str, Any]]] = {userId: [] for userId in userIds}
+            if not userid_by_unionid:
+                return grouped
+            items, failed = await self.get_users_free_busy_status(list(userid_by_unionid), startTime, endTime)
+            for unionid in failed:
+                grouped.pop(userid_by_unionid[unionid], None)
+            for item in items:
+                userId = userid_by_unionid.get(item['userId'])
+                if userId is not None:
+                    grouped[userId].append(item)
+            return grouped
+
+        except Exception as e:
+               logger.error(f"quary process fail: {str(e)}")
+               raise Exception(f"quary process fail: {str(e)}") from e
+
     async def insert_freebusy_record(
         self,
         data_list: List[dict],
-        conn 
+        conn=None
+    ):
+        if not data_list:
+            return
+        # 与写入共用调用方的连接，缓存未命中时不再另借连接
+        userid_by_unionid = await identity_map.resolve_userids((data['userId'] for data in data_list), conn=conn)
+        await async_db.run(self._insert_freebusy_record, data_list, userid_by_unionid, conn=conn)
+
+    def _insert_freebusy_record(
+        self,
+        conn,
+        data_list: List[dict],
+        userid_by_unionid: Dict[str, str]
     ):
+        """批量写入忙碌时间段：一次补齐父记录，与已有时间段合并后只写入差异，同一事务提交"""
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         try:
+            conn.begin()
+
+            rows = []
             for data in data_list:
-                userId = await find_userid_by_unionid(data['userId'],conn)
+                userId = userid_by_unionid.get(data['userId'])
                 if not userId:
                     logger.error(f"user {data['userId']} not found")
                     continue
-                date = data['date']
-                start_datetime = data['start_datetime']
-                end_datetime = data['end_datetime']
-            
-                select_query = """  
-                SELECT id FROM online_status WHERE userid = %s AND date = %s
-                """
-                cursor.execute(select_query, (userId, date))
-                existing_record = cursor.fetchone()
-
-                if existing_record:
-                    task_id = existing_record['id']
-                    logger.info(f"record exist,id: {task_id}")
-                else:
-                # 第一步：插入主表 online_status，获取attendance_id
-                    insert_main_query = f"""
-                    INSERT INTO online_status (userid, date) 
-                    VALUES (%s, %s)
-                    """
-                    cursor.execute(insert_main_query, (userId, date))
-                    
-                    # 获取刚插入的主键ID
-                    task_id = cursor.lastrowid
-                    
-                # 第二步：插入子表 online_time_periods
-                insert_period_query = f"""
-                INSERT INTO online_time_periods (task_id, start_datetime, end_datetime) 
-                VALUES (%s, %s, %s)
-                """
-                
-                # 处理datetime格式（移除时区信息）
-                def format_datetime(dt_str):
-                    if dt_str and 'T' in dt_str:
-                        if '+' in dt_str:
-                            dt_str = dt_str.split('+')[0]
-                        return dt_str.replace('T', ' ')
-                    return dt_str
-                
-                # 插入时间段数据
-                cursor.execute(insert_period_query, (
-                    task_id,
-                    format_datetime(start_datetime),
-                    format_datetime(end_datetime)
-                ))
-            
-                # 提交事务
+                rows.append((userId, data['date'], data['start_datetime'], data['end_datetime']))
+            if not rows:
+                conn.rollback()
+                return
+
+            # 第一步：一次性获取/创建主表 online_status 记录
+            task_ids = ensure_online_status_ids(cursor, ((userId, date) for userId, date, _, _ in rows))
+
+            # 第二步：与已有时间段合并（去重、合并重叠/相邻区间）后写入子表 online_time_periods
+            new_periods: Dict[int, List[tuple]] = {}
+            for userId, date, start_datetime, end_datetime in rows:
+                new_periods.setdefault(task_ids[(userId, date)], []).append(
+                    (format_datetime(start_datetime), format_datetime(end_datetime)))
+            inserted, deleted = merge_task_periods(cursor, new_periods)
+            # 第三步：刷新对应用户当天的工作模式汇总
+            refresh_daily_summaries(cursor, new_periods.keys())
+
+            # 提交事务
             conn.commit()
+            logger.info(f"merged {len(rows)} busy periods for {len(task_ids)} user-days: inserted {inserted}, deleted {deleted}")
         except Exception as e:
         # 发生错误时回滚
             conn.rollback()
@@ -189,35 +263,63 @@ class FreeBusyService:
             self,
         userid:str, 
         target_times: List[str],
-        conn )-> List[Dict[str, Any]]:
-        all_periods = {}
+        conn=None )-> Dict[str, List[tuple]]:
+        """按日期列表获取用户时间段，内部用一次范围查询完成"""
+        if not target_times:
+            return {}
+        periods_by_date = await self.get_online_time_periods_range(
+            userid, min(target_times), max(target_times), conn=conn)
+        wanted = set(target_times)
+        return {date: periods for date, periods in periods_by_date.items() if date in wanted}
+
+    async def get_online_time_periods_range(
+            self,
+        userid: str,
+        start_date: str,
+        end_date: str,
+        conn=None) -> Dict[str, List[tuple]]:
+        """获取单个用户在日期范围内的时间段，按日期分组"""
+        grouped = await self.get_users_online_time_periods([userid], start_date, end_date, conn=conn)
+        return grouped.get(userid, {})
+
+    async def get_users_online_time_periods(
+            self,
+        userids: List[str],
+        start_date: str,
+        end_date: str,
+        conn=None) -> Dict[str, Dict[str, List[tuple]]]:
+        """一次查询获取多个用户在日期范围内的时间段，按用户、日期分组"""
+        return await async_db.run(self._get_users_online_time_periods, userids, start_date, end_date, conn=conn)
+
+    def _get_users_online_time_periods(
+            self,
+        conn,
+        userids: List[str],
+        start_date: str,
+        end_date: str) -> Dict[str, Dict[str, List[tuple]]]:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        for target_time in target_times:
-        # 查询主表获取attendance_id
-            query_main = f"""
-            SELECT id FROM online_status
-            WHERE userid = %s AND date = %s
-            """
-            cursor.execute(query_main, (userid, target_time))
-            main_record = cursor.fetchone()
-            
-            if not main_record:
-                print(f"未找到员工 {userid} 在 {target_time} 的记录")
-                continue
-            
-            task_id = main_record['id']
-            
-            # 查询时间段子表
-            query_periods = f"""
-            SELECT start_datetime, end_datetime 
-            FROM online_time_periods 
-            WHERE task_id = %s 
-            ORDER BY start_datetime
-            """
-            cursor.execute(query_periods, (task_id,))
-            periods = []
-            for period in cursor.fetchall():
-                periods.append((period['start_datetime'], period['end_datetime']))
-            all_periods[target_time] = periods
-        
-        return all_periods
+        try:
+            return select_time_periods_in_range(cursor, userids, start_date, end_date)
+        finally:
+            cursor.close()
+
+    async def get_users_daily_summaries(
+            self,
+        userids: List[str],
+        start_date: str,
+        end_date: str,
+        conn=None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """一次查询获取多个用户在日期范围内的每日工作模式汇总，按用户、日期分组"""
+        return await async_db.run(self._get_users_daily_summaries, userids, start_date, end_date, conn=conn)
+
+    def _get_users_daily_summaries(
+            self,
+        conn,
+        userids: List[str],
+        start_date: str,
+        end_date: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            return select_daily_summaries(cursor, userids, start_date, end_date)
+        finally:
+            cursor.close()
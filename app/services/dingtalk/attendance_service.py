@@ -9,9 +9,18 @@ import pymysql.cursors
 
 from api.dependencies.dingtalk_token import get_dingtalk_access_token
 from api.models.attendance import AttendanceResponse, AttendanceRecord,AttendanceRequest
+from core.http_client import HttpClients, get_default_http_clients
+from repository.async_database import async_db
+from repository.online_status import ensure_online_status_ids
+from repository.daily_summary import refresh_daily_summaries
 
 logger = logging.getLogger(__name__)
 
+ATTENDANCE_LIST_URL = "https://oapi.dingtalk.com/attendance/list"
+# 钉钉 /attendance/list 单次最多50个用户，每页最多50条
+ATTENDANCE_LIST_MAX_USERS = 50
+ATTENDANCE_LIST_PAGE_SIZE = 50
+
 def datetime_to_timestamp(dt: datetime) -> int:
     return int(dt.timestamp() * 1000)
 
@@ -20,7 +29,7 @@ def timestamp_to_datetime(timestamp: int) -> datetime:
 
 def reschedule_data(data: dict) -> List[AttendanceRecord]:
     flat_data_list = []
-    for item in data['recordresult']:
+    for item in data.get('recordresult') or []:
         userCheckTime = timestamp_to_datetime(item['userCheckTime'])
         flat_data = AttendanceRecord(
             userid=item["userId"],
@@ -94,8 +103,9 @@ class AttendanceManager:
                 del self.daily_status[key]
 
 class AttendanceService:
-    def __init__(self, attendance_manager: AttendanceManager):
+    def __init__(self, attendance_manager: AttendanceManager, http_clients: HttpClients = None):
         self.attendance_manager = attendance_manager
+        self.client = (http_clients or get_default_http_clients()).dingtalk_oapi
     
     async def process_attendance_for_user(self, request: AttendanceRequest) -> AttendanceResponse:
         #服务层：处理考勤逻辑
@@ -110,25 +120,24 @@ class AttendanceService:
             params = {"access_token": access_token}
             headers = {"Content-Type": "application/json"}
             data = request.dict()
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, params=params, headers=headers, json=data)
-                response.raise_for_status()
-                response_data = response.json()
-                
-                if "recordresult" in response_data:
-                    records = reschedule_data(response_data)
-                    return AttendanceResponse(
-                        action_taken=True,
-                        checked=True,
-                        recordresult=records
-                    )
-                else:
-                    return AttendanceResponse(
-                        action_taken=True,
-                        checked=False,
-                        errormsg=response_data.get("errmsg"),
-                        errorcode=response_data.get("errcode", 0)
-                    )
+            response = await self.client.post(url, params=params, headers=headers, json=data)
+            response.raise_for_status()
+            response_data = response.json()
+            
+            if "recordresult" in response_data:
+                records = reschedule_data(response_data)
+                return AttendanceResponse(
+                    action_taken=True,
+                    checked=True,
+                    recordresult=records
+                )
+            else:
+                return AttendanceResponse(
+                    action_taken=True,
+                    checked=False,
+                    errormsg=response_data.get("errmsg"),
+                    errorcode=response_data.get("errcode", 0)
+                )
                     
         except Exception as e:
             logger.error(f"error: {str(e)}")
@@ -161,25 +170,24 @@ class AttendanceService:
             params = {"access_token": access_token}
             headers = {"Content-Type": "application/json"}
             data = request.dict()
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, params=params, headers=headers, json=data)
-                response.raise_for_status()
-                response_data = response.json()
-
-                if response_data.get("recordresult") != []:
-                    records = reschedule_data(response_data)
-                    return AttendanceResponse(
-                        action_taken=True,
-                        checked=True,
-                        recordresult=records
-                    )
-                else:
-                    return AttendanceResponse(
-                        action_taken=True,
-                        checked=False,
-                        errormsg=response_data.get("errmsg"),
-                        errorcode=response_data.get("errcode", 0)
-                    )
+            response = await self.client.post(url, params=params, headers=headers, json=data)
+            response.raise_for_status()
+            response_data = response.json()
+
+            if response_data.get("recordresult") != []:
+                records = reschedule_data(response_data)
+                return AttendanceResponse(
+                    action_taken=True,
+                    checked=True,
+                    recordresult=records
+                )
+            else:
+                return AttendanceResponse(
+                    action_taken=True,
+                    checked=False,
+                    errormsg=response_data.get("errmsg"),
+                    errorcode=response_data.get("errcode", 0)
+                )
                     
         except Exception as e:
             logger.error(f"error: {str(e)}")
@@ -189,47 +197,95 @@ class AttendanceService:
             )
     
 
+    async def check_attendance_for_users(self, userids: List[str]) -> Dict[str, List[AttendanceRecord]]:
+        #批量查询用户本小时内的考勤记录，结果按用户分组
+        now = datetime.now()
+        hour_start = now.replace(minute=0, second=0, microsecond=0)
+        return await self.fetch_attendance_records(
+            userids,
+            hour_start.strftime("%Y-%m-%d %H:%M:%S"),
+            now.strftime("%Y-%m-%d %H:%M:%S")
+        )
+
+    async def fetch_attendance_records(
+            self,
+            userids: List[str],
+            start_time: str,
+            end_time: str) -> Dict[str, List[AttendanceRecord]]:
+        #按每50人一组调用 /attendance/list，并按hasMore翻页取完所有记录
+        grouped: Dict[str, List[AttendanceRecord]] = {userid: [] for userid in userids}
+        for i in range(0, len(userids), ATTENDANCE_LIST_MAX_USERS):
+            chunk = userids[i:i + ATTENDANCE_LIST_MAX_USERS]
+            for record in await self._fetch_attendance_pages(chunk, start_time, end_time):
+                grouped.setdefault(record.userid, []).append(record)
+        return grouped
+
+    async def _fetch_attendance_pages(
+            self,
+            userids: List[str],
+            start_time: str,
+            end_time: str) -> List[AttendanceRecord]:
+        records: List[AttendanceRecord] = []
+        offset = 0
+        while True:
+            access_token = await get_dingtalk_access_token()
+            request = AttendanceRequest(
+                userIdList=userids,
+                workDateFrom=start_time,
+                workDateTo=end_time,
+                offset=offset,
+                limit=ATTENDANCE_LIST_PAGE_SIZE
+            )
+            params = {"access_token": access_token}
+            headers = {"Content-Type": "application/json"}
+            response = await self.client.post(ATTENDANCE_LIST_URL, params=params, headers=headers, json=request.dict())
+            response.raise_for_status()
+            response_data = response.json()
+
+            if response_data.get("errcode", 0) != 0:
+                raise Exception(f"attendance list fail: {response_data.get('errcode')}, {response_data.get('errmsg')}")
+
+            records.extend(reschedule_data(response_data))
+            if not response_data.get("hasMore"):
+                break
+            offset += ATTENDANCE_LIST_PAGE_SIZE
+        logger.debug(f"批量获取 {len(userids)} 名用户考勤记录 {len(records)} 条")
+        return records
+
     async def add_attendance_info(
         self,
         all_data:List[AttendanceRecord],
-        conn
+        conn=None
         ):
+        await async_db.run(self._add_attendance_info, all_data, conn=conn)
+
+    def _add_attendance_info(
+        self,
+        conn,
+        all_data:List[AttendanceRecord]
+        ):
+        """批量写入考勤记录：一次补齐父记录，子表executemany，同一事务提交"""
+        if not all_data:
+            return
         cursor = None
         try:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
-            for data in all_data:
-                user_id = data.userid
-                date = data.date
-                select_query = """
-                SELECT id FROM online_status WHERE userid = %s AND date = %s
-                """
-                cursor.execute(select_query, (user_id, date))
-                existing_record = cursor.fetchone()
-
-                if existing_record:
-                    # 记录已存在，使用现有ID
-                    main_id = existing_record['id']
-                else:   
-                    # 第一步：插入主表 online_status，获取attendance_id
-                    insert_main_query = f"""
-                    INSERT INTO online_status (userid, date) 
-                    VALUES (%s, %s)
-                    """
-                    cursor.execute(insert_main_query, (user_id, date))
-                    
-                    # 获取刚插入的主键ID
-                    main_id = cursor.lastrowid
-
-                time = data.datetime
-                checkType = data.checkType
-                # 第二步：插入子表 online_time_periods
-                insert_period_query = f"""
-                INSERT INTO attendance_data (task_id,userCheckTime,checkType) 
-                VALUES (%s, %s, %s)
-                """
-                cursor.execute(insert_period_query, (main_id, time, checkType))
-                
-            logger.info(f"添加考勤信息: {all_data}")
+            conn.begin()
+            # 第一步：一次性获取/创建主表 online_status 记录
+            main_ids = ensure_online_status_ids(cursor, ((data.userid, data.date) for data in all_data))
+
+            # 第二步：批量插入子表 attendance_data
+            insert_period_query = """
+            INSERT INTO attendance_data (task_id,userCheckTime,checkType) 
+            VALUES (%s, %s, %s)
+            """
+            cursor.executemany(insert_period_query, [
+                (main_ids[(data.userid, data.date)], data.datetime, data.checkType)
+                for data in all_data
+            ])
+            refresh_daily_summaries(cursor, main_ids.values())
+
+            logger.info(f"添加考勤信息: {len(all_data)} 条")
                 # 提交事务
             conn.commit()
         except Exception as e:
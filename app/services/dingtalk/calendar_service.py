@@ -4,12 +4,13 @@ import logging
 from datetime import datetime,timedelta
 from api.dependencies.dingtalk_token import get_dingtalk_access_token
 from api.models.Calendar import CalendarRequest,CalendarEventsResponse
+from core.http_client import HttpClients, get_default_http_clients
 
 logger = logging.getLogger(__name__)
 
 class CalendarService:
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, http_clients: HttpClients = None):
+        self.client = (http_clients or get_default_http_clients()).dingtalk_api
     
     async def get_calendar_events(self, request: CalendarRequest) -> CalendarEventsResponse:
         #ȡ¼ - 㷽
@@ -32,21 +33,19 @@ class CalendarService:
             if request.maxResults:
                 params["maxResults"] = request.maxResults
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    api_url,
-                    params=params,
-                    headers=headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                response_data = response.json()
-                logger.debug(f"API response: {response_data}")
-                
-                # תΪӦģ
-                return CalendarEventsResponse(**response_data)
-                
+            response = await self.client.get(
+                api_url,
+                params=params,
+                headers=headers
+            )
+            response.raise_for_status()
+            
+            response_data = response.json()
+            logger.debug(f"API response: {response_data}")
+            
+            # תΪӦģ
+            return CalendarEventsResponse(**response_data)
+            
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP request failed: {e}")
             raise Exception(f"Calendar API query failed: {e}")
@@ -3,13 +3,17 @@ import logging
 from typing import Dict, Any
 from api.dependencies.dingtalk_token import get_dingtalk_access_token
 from api.models.message import AsyncSendRequest
+from core.http_client import HttpClients, get_default_http_clients
+from repository.async_database import async_db
+from repository.online_status import ensure_online_status_ids
 from datetime import datetime
 import pymysql.cursors
 
 logger = logging.getLogger(__name__)
 
 class SendMessageService:
-    def __init__(self):
+    def __init__(self, http_clients: HttpClients = None):
+        self.client = (http_clients or get_default_http_clients()).dingtalk_oapi
         self.async_send_url = "https://oapi.dingtalk.com/topapi/message/corpconversation/asyncsend_v2"
     
     async def async_send_message(self, request: AsyncSendRequest) -> Dict[str, Any]:
@@ -33,22 +37,20 @@ class SendMessageService:
             }
             
             # 4. 发送异步消息请求
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.async_send_url,
-                    params=params,
-                    headers=headers,
-                    json=data,
-                    timeout=30.0
-                )
-                
-                response_data = response.json()
-                
-                if response.status_code != 200:
-                    error_msg = response_data.get("message", "send message failed")
-                    raise Exception(f"API error: {error_msg}")
-                
-                return response_data
+            response = await self.client.post(
+                self.async_send_url,
+                params=params,
+                headers=headers,
+                json=data
+            )
+            
+            response_data = response.json()
+            
+            if response.status_code != 200:
+                error_msg = response_data.get("message", "send message failed")
+                raise Exception(f"API error: {error_msg}")
+            
+            return response_data
                 
         except httpx.RequestError as e:
             raise Exception(f"internet request error: {str(e)}")
@@ -60,37 +62,23 @@ class SendMessageService:
             userId: str, 
             health_msg: str, 
             time: datetime,
-            conn):
+            conn=None):
+        await async_db.run(self._insert_health_message, userId, health_msg, time, conn=conn)
+
+    def _insert_health_message(
+            self, 
+            conn,
+            userId: str, 
+            health_msg: str, 
+            time: datetime):
         # 插入健康消息到数据库
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         try:
+            conn.begin()
             date= time.strftime("%Y-%m-%d")
-            select_query = """  
-            SELECT id FROM online_status WHERE userid = %s AND date = %s
-            """
-            cursor.execute(select_query, (userId, date))
-            existing_record = cursor.fetchone()
-
-            if existing_record:
-                task_id = existing_record['id']
-                logger.info(f"record exist,id: {task_id}")
-            else:
-            # 第一步：插入主表 online_status，获取attendance_id
-                insert_main_query = f"""
-                INSERT INTO online_status (userid, date) 
-                VALUES (%s, %s)
-                """
-                cursor.execute(insert_main_query, (userId, date))
+            # 第一步：获取/创建主表 online_status 记录
+            task_id = ensure_online_status_ids(cursor, [(userId, date)])[(userId, date)]
 
-            if task_id is None:
-                # 如果lastrowid返回None，重新查询
-                cursor.execute(select_query, (userId, date))
-                existing_record = cursor.fetchone()
-                if existing_record:
-                    task_id = existing_record['id']
-                else:
-                    raise Exception("无法获取或创建online_status记录")
-                
             # 第二步：插入子表 online_time_periods
             insert_period_query = f"""
             INSERT INTO health_message (task_id, msg, date_time) 
@@ -5,12 +5,16 @@ from datetime import datetime, timedelta
 import pymysql.cursors
 from api.dependencies.dingtalk_token import get_dingtalk_access_token
 from api.models.steps import UserStepResponse, UserStepRequest, StepInfo
+from core.http_client import HttpClients, get_default_http_clients
+from repository.async_database import async_db
+from repository.online_status import ensure_online_status_ids
+from repository.daily_summary import refresh_daily_summaries
 
 logger = logging.getLogger(__name__)
 
 class SportService:
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, http_clients: HttpClients = None):
+        self.client = (http_clients or get_default_http_clients()).dingtalk_oapi
     
     async def get_user_steps(self, request: UserStepRequest) -> UserStepResponse:
         #获取用户步数信息 - 服务层方法
@@ -21,21 +25,19 @@ class SportService:
             params = {"access_token": access_token}
             headers = {"Content-Type": "application/json"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    api_url, 
-                    params=params, 
-                    headers=headers, 
-                    json=request.dict(),
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                response_data = response.json()
-                logger.debug(f"得到API响应: {response_data}")
-                
-                # 转换为Pydantic模型
-                return  response_data 
+            response = await self.client.post(
+                api_url, 
+                params=params, 
+                headers=headers, 
+                json=request.dict()
+            )
+            response.raise_for_status()
+            
+            response_data = response.json()
+            logger.debug(f"得到API响应: {response_data}")
+            
+            # 转换为Pydantic模型
+            return  response_data 
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"API查询失败: {e}")
@@ -48,7 +50,15 @@ class SportService:
         self,
         userid:str,
         date:str,
-        conn 
+        conn=None
+    )->int:
+        return await async_db.run(self._get_steps_record, userid, date, conn=conn)
+
+    def _get_steps_record(
+        self,
+        conn,
+        userid:str,
+        date:str
     )->int:
         # 插入用户步数信息
         try:
@@ -71,5 +81,44 @@ class SportService:
         finally:
             if cursor:
                 cursor.close()
-        
-        
\ No newline at end of file
+
+    async def insert_steps_record(
+        self,
+        userid: str,
+        steps: UserStepResponse,
+        conn=None
+    ):
+        await async_db.run(self._insert_steps_record, userid, steps, conn=conn)
+
+    def _insert_steps_record(
+        self,
+        conn,
+        userid: str,
+        steps: UserStepResponse
+    ):
+        # 写入用户每日步数，并刷新当天的工作模式汇总
+        records = [
+            (datetime.strptime(str(info.stat_date), "%Y%m%d").strftime("%Y-%m-%d"), info.step_count)
+            for info in steps.stepinfo_list or []
+        ]
+        if not records:
+            return
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            conn.begin()
+            task_ids = ensure_online_status_ids(cursor, ((userid, date) for date, _ in records))
+            cursor.executemany(
+                "UPDATE online_status SET steps = %s WHERE id = %s",
+                [(step_count, task_ids[(userid, date)]) for date, step_count in records]
+            )
+            refresh_daily_summaries(cursor, task_ids.values())
+            conn.commit()
+            logger.info(f"写入用户 {userid} 步数 {len(records)} 条")
+        except Exception as e:
+        # 发生错误时回滚
+            conn.rollback()
+            logger.error(f"写入用户步数失败: {e}")
+            raise e
+        finally:
+            cursor.close()
+
@@ -6,12 +6,15 @@ import pymysql.cursors
 
 from api.dependencies.dingtalk_token import get_dingtalk_access_token
 from api.models.user import UserDetailResponse
+from core.http_client import HttpClients, get_default_http_clients
+from repository.async_database import async_db
+from repository.identity_map import identity_map
 
 logger = logging.getLogger(__name__) 
 
 class UserService:
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, http_clients: HttpClients = None):
+        self.client = (http_clients or get_default_http_clients()).dingtalk_oapi
     
     async def get_user_details(self, userid: str) -> UserDetailResponse:
         #获取用户详情 - 服务层方法
@@ -29,23 +32,22 @@ class UserService:
             params = {"access_token": access_token}
             headers = {"Content-Type": "application/json"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, params=params, headers=headers, json=data)
-                response.raise_for_status()
-                
-                response_data = response.json()
-                logger.debug(f"API response: {json.dumps(response_data, ensure_ascii=False, indent=2)}")
-                
-                # 验证响应
-                if response_data.get('errcode') != 0:
-                    error_msg = response_data.get('errmsg', 'Unknown error')
-                    logger.error(f"调用用户信息API时错误: {error_msg}")
-                    raise Exception(f"API fail: {error_msg}")
-                
-                # 转换数据格式
-                user_info = self._transform_user_data(response_data)
-                logger.info(f"获取到用户详情: {user_info}")
-                return user_info
+            response = await self.client.post(url, params=params, headers=headers, json=data)
+            response.raise_for_status()
+            
+            response_data = response.json()
+            logger.debug(f"API response: {json.dumps(response_data, ensure_ascii=False, indent=2)}")
+            
+            # 验证响应
+            if response_data.get('errcode') != 0:
+                error_msg = response_data.get('errmsg', 'Unknown error')
+                logger.error(f"调用用户信息API时错误: {error_msg}")
+                raise Exception(f"API fail: {error_msg}")
+            
+            # 转换数据格式
+            user_info = self._transform_user_data(response_data)
+            logger.info(f"获取到用户详情: {user_info}")
+            return user_info
                 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
@@ -79,10 +81,20 @@ class UserService:
         
         return user_info
     
-    def add_employee_info(
+    async def add_employee_info(
         self,
         item: dict,
-        conn
+        conn=None
+    ):
+        inserted = await async_db.run(self._add_employee_info, item, conn=conn)
+        if inserted:
+            # 同步更新内存中的 userid <-> unionid 映射
+            identity_map.put(item['userid'], item.get('unionid'))
+
+    def _add_employee_info(
+        self,
+        conn,
+        item: dict
     ):
         cursor = None
         try:
@@ -105,6 +117,7 @@ class UserService:
                 logger.info(f"用户 {item['userid']}信息添加成功")
 
             conn.commit()
+            return not existing
             
         except Exception as e:
         # 发生错误时回滚
@@ -114,10 +127,17 @@ class UserService:
         finally:
             if cursor:
                 cursor.close()
-    def get_userinfo_from_database(
+    async def get_userinfo_from_database(
             self,
         userid:str, 
-        conn 
+        conn=None
+        ) -> List[Dict[str, Any]]:
+        return await async_db.run(self._get_userinfo_from_database, userid, conn=conn)
+
+    def _get_userinfo_from_database(
+            self,
+        conn,
+        userid:str
         ) -> List[Dict[str, Any]]:
         cursor = None
         try:
@@ -1,78 +1,92 @@
-import asyncio
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 import logging
-from datetime import timedelta
 from jobs.attendance_job import AttendanceJob
 from jobs.status_job import StatusJob
+from jobs.archive_job import ArchiveJob
+from services.scheduler.status_queue import StatusCheckQueue
 from core import config
+from core.event_bus import ATTENDANCE_PROCESSED, EventBus
 
 logger = logging.getLogger(__name__)
 
 class SchedulerService:
     def __init__(self, 
                  attendance_job: AttendanceJob,
-                 status_job: StatusJob):
-        self.attendance_scheduler = AsyncIOScheduler()
-        self.status_scheduler = AsyncIOScheduler()
+                 status_job: StatusJob,
+                 archive_job: ArchiveJob = None,
+                 event_bus: EventBus = None):
+        # 所有定时任务共用一个调度器
+        self.scheduler = AsyncIOScheduler()
         self.attendance_job = attendance_job
         self.status_job = status_job
+        self.archive_job = archive_job
         self.last_attendance_time = None
-        self.status_waiting = False
+        # 考勤处理完成后发布事件，状态检查队列订阅后立即为这些用户排队检查
+        self.event_bus = event_bus or EventBus()
+        self.status_queue = StatusCheckQueue(status_job)
+        self.event_bus.subscribe(ATTENDANCE_PROCESSED, self.status_queue.enqueue)
     
     async def start_schedulers(self):
         """启动所有调度任务"""
         try:
-            # 考勤检查任务 - 每一小时
-            self.attendance_scheduler.add_job(
-                self._run_attendance_and_trigger_status,
+            # 考勤检查任务 - 每一小时，完成后为已签到未签退的用户排队状态检查
+            self.scheduler.add_job(
+                self._run_attendance_and_publish,
                 trigger=IntervalTrigger(hours=1),
                 args=[config.USER_IDS],
                 id="attendance_check",
                 next_run_time=datetime.now()
             )
             
-            # 状态检查任务 - 每两小时，但只在考勤后执行
-            self.status_scheduler.add_job(
-                self._run_status_if_ready,
-                trigger=IntervalTrigger(hours=2),
-                args=[config.USER_IDS],
-                id="status_check",
-                next_run_time=datetime.now() + timedelta(seconds=5)
-            )
-            
-            self.attendance_scheduler.start()
-            self.status_scheduler.start()
+            # 历史数据归档任务 - 每天低峰时段
+            if self.archive_job is not None:
+                self.scheduler.add_job(
+                    self._run_archive,
+                    trigger=CronTrigger(hour=config.ARCHIVE_HOUR),
+                    id="history_archive",
+                    max_instances=1,
+                    coalesce=True
+                )
+
+            self.status_queue.start()
+            self.scheduler.start()
             logger.info("调度器启动成功")
             
         except Exception as e:
             logger.error(f"调度器启动失败: {e}")
             raise
     
-    async def _run_attendance_and_trigger_status(self, user_ids):
-        """执行考勤任务并标记状态检查就绪"""
+    async def _run_attendance_and_publish(self, user_ids):
+        """执行考勤任务，完成后发布考勤处理完成事件（载荷为已签到未签退的用户）"""
         try:
             logger.info("开始执行考勤检查任务...")
-            await self.attendance_job.job_process_attendance_for_users(user_ids)
+            summary = await self.attendance_job.job_process_attendance_for_users(user_ids)
             self.last_attendance_time = datetime.now()
-            self.status_waiting = True
-            logger.info("考勤检查任务完成，状态检查就绪")
-            
         except Exception as e:
             logger.error(f"考勤任务执行失败: {e}")
-    
-    async def _run_status_if_ready(self, user_ids):
-        """只在考勤任务完成后执行状态检查"""
-        if not self.status_waiting:
-            logger.info("状态检查：等待考勤任务完成...")
             return
-            
+
+        on_duty = [
+            userid for userid, result in summary["results"].items()
+            if result["status"] == "ok" and result.get("checked_in") and not result.get("checked_out")
+        ]
+        logger.info(f"考勤检查任务完成，{len(on_duty)} 名在岗用户排队状态检查")
+        self.event_bus.publish(ATTENDANCE_PROCESSED, on_duty)
+
+    async def _run_archive(self):
+        """归档超出保留期的历史记录"""
         try:
-            logger.info("开始执行状态检查任务...")
-            await self.status_job.check_user_status_and_send_alerts(user_ids)
-            logger.info("状态检查任务完成")
-            self.status_waiting = False
-            
+            logger.info("开始执行历史数据归档任务...")
+            await self.archive_job.run()
         except Exception as e:
-            logger.error(f"状态检查任务执行失败: {e}")
\ No newline at end of file
+            logger.error(f"历史数据归档任务执行失败: {e}")
+
+    async def shutdown_schedulers(self):
+        """关闭调度器和状态检查队列"""
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        await self.status_queue.stop()
+        logger.info("调度器已关闭")
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from jobs.status_job import StatusJob
+from core import config
+
+logger = logging.getLogger(__name__)
+
+class StatusCheckQueue:
+    """考勤处理完成后排队的状态检查：后台任务把已到期的用户合并成一次状态检查
+
+    用户已在队列中时不重复排队；距上次检查不足 min_interval 秒的用户推迟到间隔满后检查
+    """
+
+    def __init__(
+            self,
+            status_job: StatusJob,
+            min_interval: float = config.STATUS_RECHECK_MIN_INTERVAL,
+            clock: Callable[[], float] = time.monotonic):
+        self.status_job = status_job
+        self.min_interval = min_interval
+        self.clock = clock
+        # 用户 -> 可以检查的时间；用户 -> 上次开始检查的时间
+        self._due: Dict[str, float] = {}
+        self._last_checked: Dict[str, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"queued": 0, "deduplicated": 0, "deferred": 0, "runs": 0, "checked": 0}
+
+    def enqueue(self, userids: Iterable[str]):
+        """排队检查这些用户（事件总线的订阅者，只登记不执行）"""
+        now = self.clock()
+        for userid in userids:
+            if userid in self._due:
+                self._stats["deduplicated"] += 1
+                continue
+            last = self._last_checked.get(userid)
+            due = now if last is None else max(now, last + self.min_interval)
+            if due > now:
+                self._stats["deferred"] += 1
+            self._due[userid] = due
+            self._stats["queued"] += 1
+        self._wakeup.set()
+
+    def _take_due(self) -> List[str]:
+        now = self.clock()
+        ready = [userid for userid, due in self._due.items() if due <= now]
+        for userid in ready:
+            del self._due[userid]
+        return ready
+
+    async def run_due(self) -> List[str]:
+        """对当前已到期的用户执行一次状态检查，返回检查的用户"""
+        userids = self._take_due()
+        if not userids:
+            return []
+        now = self.clock()
+        for userid in userids:
+            self._last_checked[userid] = now
+        self._stats["runs"] += 1
+        self._stats["checked"] += len(userids)
+        try:
+            logger.info(f"开始执行状态检查任务，用户：{userids}")
+            await self.status_job.check_user_status_and_send_alerts(userids)
+            logger.info("状态检查任务完成")
+        except Exception as e:
+            logger.error(f"状态检查任务执行失败: {e}")
+        return userids
+
+    async def _run(self):
+        while True:
+            if await self.run_due():
+                continue
+            # 没有到期用户时等待新的排队，或等到最早的推迟用户到期
+            self._wakeup.clear()
+            timeout = max(min(self._due.values()) - self.clock(), 0) if self._due else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "pending": len(self._due)}
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+from datetime import date
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from repository import archiver
+from repository.archiver import archive_chunk, cutoff_date, prune_parents_chunk
+from jobs import archive_job as archive_job_module
+from jobs.archive_job import ArchiveJob
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((" ".join(query.split()), params))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursor_obj = FakeCursor(rows)
+        self.events = []
+
+    def cursor(self, *args):
+        return self.cursor_obj
+
+    def begin(self):
+        self.events.append("begin")
+
+    def commit(self):
+        self.events.append("commit")
+
+    def rollback(self):
+        self.events.append("rollback")
+
+def test_cutoff_date():
+    assert cutoff_date(90, today=date(2025, 9, 30)) == "2025-07-02"
+
+def test_archive_chunk_copies_then_deletes_in_one_transaction():
+    conn = FakeConnection([{"id": 7}, {"id": 9}])
+
+    moved = archive_chunk(conn, "online_time_periods", "2025-07-01", 2)
+
+    assert moved == 2
+    assert conn.events == ["begin", "commit"]
+    select, copy, delete = conn.cursor_obj.executed
+    assert select[1] == ("2025-07-01", 2)
+    assert copy[0].startswith("INSERT IGNORE INTO online_time_periods_archive")
+    assert copy[1] == [7, 9]
+    assert delete[0] == "DELETE FROM online_time_periods WHERE id IN (%s, %s)"
+
+def test_archive_chunk_without_expired_rows():
+    conn = FakeConnection([])
+    assert archive_chunk(conn, "health_message", "2025-07-01", 100) == 0
+    assert len(conn.cursor_obj.executed) == 1
+    assert conn.events == ["begin", "commit"]
+
+def test_prune_parents_only_removes_rows_without_children():
+    conn = FakeConnection([{"id": 3}])
+
+    assert prune_parents_chunk(conn, "2025-04-01", 100) == 1
+    select, copy, delete = conn.cursor_obj.executed
+    for table in archiver.ARCHIVE_TABLES:
+        assert f"NOT EXISTS (SELECT 1 FROM {table} c" in select[0]
+    # 步数随父记录一起归档后才删除
+    assert copy[0].startswith("INSERT IGNORE INTO online_status_archive (id, userid, date, steps)")
+    assert copy[1] == [3]
+    assert delete[0] == "DELETE FROM online_status WHERE id IN (%s)"
+    assert delete[1] == [3]
+
+def test_job_stops_at_short_chunk_and_max_chunks(monkeypatch):
+    calls = []
+
+    class FakeAsyncDb:
+        async def run(self, func, *args):
+            calls.append((func.__name__, args))
+            # online_time_periods 第一批满，其余不足一批
+            if func is archive_chunk and args[0] == "online_time_periods" and len(calls) == 1:
+                return 2
+            return 0
+
+    monkeypatch.setattr(archive_job_module, "async_db", FakeAsyncDb())
+
+    summary = asyncio.run(ArchiveJob(chunk_size=2, chunk_pause=0, max_chunks=10).run())
+    assert summary["archived"] == {"online_time_periods": 2, "attendance_data": 0, "health_message": 0}
+    assert summary["chunks"] == 5
+    assert summary["finished"] is True
+
+    calls.clear()
+    summary = asyncio.run(ArchiveJob(chunk_size=2, chunk_pause=0, max_chunks=1).run())
+    assert summary["chunks"] == 1
+    assert summary["finished"] is False
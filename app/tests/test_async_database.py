@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from repository import database
+from repository.async_database import AsyncDatabase
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_run_uses_pool_connection_off_loop(monkeypatch):
+    opened = []
+
+    def get_db_connection(site=None):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(database, "get_db_connection", get_db_connection)
+    db = AsyncDatabase(max_workers=2)
+
+    def query(conn, value):
+        return conn, value, threading.current_thread().name
+
+    async def run():
+        return await asyncio.gather(*[db.run(query, i) for i in range(4)])
+
+    results = asyncio.run(run())
+    db.shutdown()
+    assert [value for _, value, _ in results] == [0, 1, 2, 3]
+    assert all(name.startswith("db") for _, _, name in results)
+    assert len(opened) == 4 and all(conn.closed for conn in opened)
+    assert db.stats()["query"]["count"] == 4
+
+def test_run_keeps_caller_connection_open():
+    db = AsyncDatabase(max_workers=1)
+    conn = FakeConnection()
+    result = asyncio.run(db.run(lambda c: c, conn=conn))
+    db.shutdown()
+    assert result is conn
+    assert not conn.closed
+
+def test_units_of_work_beyond_pool_size_wait_on_loop_not_in_threads(monkeypatch):
+    # 连接数多于工作线程：超出连接数的工作单元若在线程中阻塞等待，持有连接的工作单元将拿不到线程
+    checkout = threading.BoundedSemaphore(2)
+
+    class SlotConnection(FakeConnection):
+        def commit(self):
+            pass
+
+        def close(self):
+            if not self.closed:
+                self.closed = True
+                checkout.release()
+
+    def get_db_connection(site=None):
+        if not checkout.acquire(timeout=1):
+            raise Exception("获取数据库连接超时")
+        return SlotConnection()
+
+    monkeypatch.setattr(database, "get_db_connection", get_db_connection)
+    db = AsyncDatabase(max_workers=2, max_connections=2)
+
+    async def unit(i):
+        async with db.unit_of_work() as conn:
+            await db.run(lambda c: c, conn=conn)
+            await asyncio.sleep(0.01)
+            await db.run(lambda c: c, conn=conn)
+        return i
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(*[unit(i) for i in range(6)], db.run(lambda c: "query"))
+        return results, loop.time() - started
+
+    results, elapsed = asyncio.run(run())
+    db.shutdown()
+    assert results == [0, 1, 2, 3, 4, 5, "query"]
+    assert elapsed < 0.5
+    assert db.stats()["errors"] == 0
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from datetime import datetime
+from services.dingtalk import attendance_service as attendance_module
+from services.dingtalk.attendance_service import AttendanceService, datetime_to_timestamp
+
+CHECK_TIME = datetime_to_timestamp(datetime(2025, 9, 22, 8, 55))
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+class FakeClient:
+    """/attendance/list 替身：每个用户 records_per_user 条记录，按 offset/limit 分页返回"""
+
+    def __init__(self, records_per_user=1, errcode=0):
+        self.records_per_user = records_per_user
+        self.errcode = errcode
+        self.requests = []
+
+    async def post(self, url, params=None, headers=None, json=None):
+        self.requests.append(json)
+        if self.errcode:
+            return FakeResponse({"errcode": self.errcode, "errmsg": "invalid userid"})
+        records = [
+            {"userId": userid, "userCheckTime": CHECK_TIME + index * 60000, "checkType": "OnDuty" if index % 2 == 0 else "OffDuty"}
+            for userid in json["userIdList"] for index in range(self.records_per_user)
+        ]
+        page = records[json["offset"]:json["offset"] + json["limit"]]
+        return FakeResponse({"errcode": 0, "recordresult": page, "hasMore": json["offset"] + json["limit"] < len(records)})
+
+@pytest.fixture
+def service(monkeypatch):
+    async def token():
+        return "token"
+
+    monkeypatch.setattr(attendance_module, "get_dingtalk_access_token", token)
+
+    def make(client):
+        service = AttendanceService.__new__(AttendanceService)
+        service.client = client
+        return service
+    return make
+
+def test_more_than_50_users_are_split_across_requests(service):
+    client = FakeClient()
+    userids = [f"u{i}" for i in range(120)]
+
+    grouped = asyncio.run(service(client).fetch_attendance_records(userids, "2025-09-22 08:00:00", "2025-09-22 09:00:00"))
+
+    assert [len(request["userIdList"]) for request in client.requests] == [50, 50, 20]
+    assert all(len(grouped[userid]) == 1 for userid in userids)
+
+def test_pages_are_accumulated_until_has_more_is_false(service):
+    client = FakeClient(records_per_user=30)
+
+    grouped = asyncio.run(service(client).fetch_attendance_records(["u1", "u2", "u3"], "2025-09-22 08:00:00", "2025-09-22 09:00:00"))
+
+    assert [request["offset"] for request in client.requests] == [0, 50]
+    assert {userid: len(records) for userid, records in grouped.items()} == {"u1": 30, "u2": 30, "u3": 30}
+
+def test_records_are_grouped_by_userid(service):
+    grouped = asyncio.run(service(FakeClient(records_per_user=2)).fetch_attendance_records(
+        ["u1", "u2"], "2025-09-22 08:00:00", "2025-09-22 09:00:00"))
+
+    assert [record.userid for record in grouped["u1"]] == ["u1", "u1"]
+    assert [record.checkType for record in grouped["u2"]] == ["OnDuty", "OffDuty"]
+    assert grouped["u1"][0].datetime == "2025-09-22 08:55:00"
+
+def test_error_code_raises(service):
+    with pytest.raises(Exception, match="attendance list fail: 40003"):
+        asyncio.run(service(FakeClient(errcode=40003)).fetch_attendance_records(
+            ["u1"], "2025-09-22 08:00:00", "2025-09-22 09:00:00"))
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import re
+import json
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from models.deepseek_model_server import HealthMessageGenerator, BATCH_PROMPT_TEMPLATE
+from models.tokens import count_tokens
+from jobs.status_job import StatusJob
+from utils.stage_timer import StageTimer
+
+RULES = [{"rule": "hydration", "title": "喝水提醒", "facts": {"temperature": 33.0}, "advice": "多喝水"}]
+NAMES = {"u1": "小赵", "u2": "小王", "u3": "小李"}
+
+def item(userid):
+    return userid, {"employee_info": {"name": NAMES[userid], "title": "工程师"}}, RULES
+
+class FakeLLM:
+    """批量请求按 override 返回，单人请求返回固定文案"""
+
+    def __init__(self, override=None, single_delay=None):
+        self.prompts = []
+        self.override = override
+        # 单人请求的延迟（秒），按姓名返回
+        self.single_delay = single_delay or (lambda name: 0)
+        self.active = 0
+        self.peak = 0
+
+    def runnable(self):
+        async def ainvoke(prompt):
+            text = prompt.to_string()
+            self.prompts.append(text)
+            if "员工列表" in text:
+                userids = re.findall(r'"userid": "(\w+)"', text)
+                outputs = {userid: f"{NAMES[userid]}，记得喝水" for userid in userids}
+                return AIMessage(content=self.override(outputs) if self.override else json.dumps(outputs, ensure_ascii=False))
+            name = next(name for name in NAMES.values() if name in text)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                await asyncio.sleep(self.single_delay(name))
+            finally:
+                self.active -= 1
+            return AIMessage(content=f"{name}，单独生成")
+        return RunnableLambda(lambda prompt: None, afunc=ainvoke)
+
+def make_generator(llm, **kwargs):
+    kwargs.setdefault("retries", 0)
+    return HealthMessageGenerator(llm=llm.runnable(), mode="direct", **kwargs)
+
+def test_batch_packing_follows_token_budget_and_user_cap():
+    generator = make_generator(FakeLLM(), batch_output_tokens=100, batch_token_budget=10000, batch_max_users=2)
+    pending = [(*item(userid), None) for userid in ("u1", "u2", "u3")]
+    assert [len(batch) for batch in generator._pack_batches(pending, "2025-09-22 15:10")] == [2, 1]
+
+    # 预算只够提示本身加一人时，每人单独一批
+    cost = count_tokens(generator._batch_entry(*item("u1"))) + generator.batch_output_tokens
+    generator.batch_max_users = 10
+    generator.batch_token_budget = count_tokens(BATCH_PROMPT_TEMPLATE) + count_tokens("2025-09-22 15:10") + cost + 1
+    assert [len(batch) for batch in generator._pack_batches(pending, "2025-09-22 15:10")] == [1, 1, 1]
+
+def test_one_request_for_several_users():
+    llm = FakeLLM()
+    generator = make_generator(llm)
+
+    results = asyncio.run(generator.agenerate_batch([item("u1"), item("u2"), item("u3")], current_time="2025-09-22 15:10"))
+
+    assert len(llm.prompts) == 1
+    assert results == {"u1": "小赵，记得喝水", "u2": "小王，记得喝水", "u3": "小李，记得喝水"}
+
+def test_missing_or_mixed_up_outputs_fall_back_to_single_calls():
+    def broken(outputs):
+        outputs.pop("u2")
+        outputs["u3"] = "小赵和小李，记得喝水"
+        outputs["unknown"] = "多余的内容"
+        return "```json\n" + json.dumps(outputs, ensure_ascii=False) + "\n```"
+
+    llm = FakeLLM(override=broken)
+    generator = make_generator(llm)
+
+    results = asyncio.run(generator.agenerate_batch([item("u1"), item("u2"), item("u3")], current_time="2025-09-22 15:10"))
+
+    assert results == {"u1": "小赵，记得喝水", "u2": "小王，单独生成", "u3": "小李，单独生成"}
+    assert len(llm.prompts) == 3
+    assert generator.stats()["batch_fallbacks"] == 2
+
+def test_invalid_json_falls_back_for_every_user():
+    generator = make_generator(FakeLLM(override=lambda outputs: "抱歉，我无法完成"))
+
+    results = asyncio.run(generator.agenerate_batch([item("u1"), item("u2")], current_time="2025-09-22 15:10"))
+
+    assert results == {"u1": "小赵，单独生成", "u2": "小王，单独生成"}
+
+def test_single_call_fallbacks_run_concurrently():
+    llm = FakeLLM(override=lambda outputs: "抱歉，我无法完成", single_delay=lambda name: 0.05)
+    generator = make_generator(llm)
+
+    results = asyncio.run(generator.agenerate_batch([item("u1"), item("u2"), item("u3")], current_time="2025-09-22 15:10"))
+
+    assert len(results) == 3
+    assert llm.peak == 3
+
+def test_deadline_keeps_finished_batches():
+    # u1、u2 一批正常返回；u3 单独一批，请求一直不返回
+    llm = FakeLLM(single_delay=lambda name: 10 if name == "小李" else 0)
+    generator = make_generator(llm, batch_max_users=2)
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        results = await generator.agenerate_batch(
+            [item("u1"), item("u2"), item("u3")], current_time="2025-09-22 15:10", deadline=0.2)
+        return results, asyncio.get_running_loop().time() - started
+
+    results, elapsed = asyncio.run(run())
+
+    assert results == {"u1": "小赵，记得喝水", "u2": "小王，记得喝水"}
+    assert elapsed < 1
+
+def test_status_job_batched_flow_sends_template_for_users_without_output():
+    job = StatusJob.__new__(StatusJob)
+    sent = {}
+
+    class StubGenerator:
+        mode = "direct"
+
+        async def agenerate_batch(self, items, deadline=None):
+            return {"u1": "小赵，记得喝水"}
+
+    async def prepare(userid, timer, fetch_semaphore, work_status=None, busy_periods=None):
+        if userid == "u3":
+            return None
+        return {"employee_info": {"name": NAMES[userid]}}, RULES
+
+    async def deliver(userid, health_msg, timer, send_semaphore):
+        sent[userid] = health_msg
+
+    job.message_generator = StubGenerator()
+    job._prepare_alert = prepare
+    job._deliver_alert = deliver
+
+    outcomes = asyncio.run(job._send_health_alerts_batched(
+        ["u1", "u2", "u3"], StageTimer(), asyncio.Semaphore(2), asyncio.Semaphore(2), {}, {}))
+
+    assert outcomes == {"u1": "alerted", "u2": "alerted", "u3": "no_rule"}
+    assert sent["u1"] == "小赵，记得喝水"
+    assert sent["u2"] == "小王，你好！多喝水"
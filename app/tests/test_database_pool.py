@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import gc
+import threading
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from core import config
+from repository import database
+
+class FakeRawConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.calls = []
+
+    def commit(self):
+        self.calls.append("commit")
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def close(self):
+        self.calls.append("close")
+        self.pool.returned += 1
+
+class FakePool:
+    def __init__(self):
+        self.returned = 0
+        self._idle_cache = []
+
+    def connection(self):
+        return FakeRawConnection(self)
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(config, "DB_POOL_MAX_CONNECTIONS", 1)
+    monkeypatch.setattr(config, "DB_POOL_TIMEOUT", 0.05)
+    monkeypatch.setattr(database, "connection_pool", fake)
+    monkeypatch.setattr(database, "_checkout_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(database, "pool_stats", database.PoolStats())
+    return fake
+
+def test_checkout_is_tracked_with_acquire_site(pool):
+    conn = database.get_db_connection()
+
+    held = database.held_connections()
+    assert len(held) == 1 and "test_database_pool.py" in held[0]["site"]
+    assert database.pool_stats.snapshot()["checked_out"] == 1
+
+    conn.close()
+    assert database.pool_stats.snapshot()["checked_out"] == 0
+    assert pool.returned == 1
+
+def test_exhausted_pool_times_out_instead_of_blocking(pool):
+    conn = database.get_db_connection()
+    with pytest.raises(Exception, match="获取数据库连接超时"):
+        database.get_db_connection()
+    stats = database.pool_stats.snapshot()
+    assert stats["waits"] == 1 and stats["timeouts"] == 1
+    conn.close()
+
+def test_unreturned_connection_is_reported_and_reclaimed(pool):
+    database.get_db_connection()
+    gc.collect()
+
+    assert database.pool_stats.snapshot()["leaks"] == 1
+    assert pool.returned == 1
+    # 名额已归还，可以再次借出
+    database.get_db_connection().close()
+
+def test_unit_of_work_commits_or_rolls_back(pool):
+    with database.unit_of_work() as conn:
+        raw = conn._conn
+    assert raw.calls == ["commit", "close"]
+
+    with pytest.raises(ValueError):
+        with database.unit_of_work() as conn:
+            raw = conn._conn
+            raise ValueError("boom")
+    assert raw.calls == ["rollback", "close"]
+
+def test_caller_site_skips_only_exact_internal_modules():
+    # 路径中含 asyncio/concurrent 字样的业务代码不应被当作内部模块跳过
+    namespace = {"database": database}
+    code = compile("def handler():\n    return database.caller_site()\n", "/srv/my_asyncio_concurrent_app/handler.py", "exec")
+    exec(code, namespace)
+
+    assert namespace["handler"]() == "/srv/my_asyncio_concurrent_app/handler.py:2 in handler"
+    assert "test_database_pool.py" in database.caller_site()
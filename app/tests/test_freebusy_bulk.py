@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.endpoints import FreeBusy
+from core import config
+from services.dingtalk import FreeBusy_service as freebusy_module
+from services.dingtalk.FreeBusy_service import FreeBusyService
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = str(payload)
+
+    def json(self):
+        return self._payload
+
+class FakeClient:
+    """querySchedule 替身：每个 unionid 返回一段日程，批次中含 failing 里的 unionid 时返回 429"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+
+    async def post(self, url, headers=None, json=None):
+        self.batches.append(list(json["userIds"]))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if self.failing & set(json["userIds"]):
+            return FakeResponse(429, {"code": "Throttling"})
+        return FakeResponse(200, {"scheduleInformation": [{
+            "userId": unionid,
+            "scheduleItems": [{
+                "start": {"dateTime": "2025-09-22T09:00:00+08:00"},
+                "end": {"dateTime": "2025-09-22T11:00:00+08:00"},
+            }],
+        } for unionid in json["userIds"]]})
+
+class FakeIdentityMap:
+    def __init__(self, unionid_by_userid):
+        self.unionid_by_userid = unionid_by_userid
+
+    async def resolve_unionids(self, userids):
+        return {userid: self.unionid_by_userid[userid] for userid in userids if userid in self.unionid_by_userid}
+
+def make_service(monkeypatch, client, users=45, without_unionid=()):
+    async def token():
+        return "token"
+
+    monkeypatch.setattr(freebusy_module, "get_dingtalk_access_token", token)
+    monkeypatch.setattr(freebusy_module, "identity_map", FakeIdentityMap(
+        {f"u{i}": f"n{i}" for i in range(users) if f"u{i}" not in without_unionid}))
+    service = FreeBusyService.__new__(FreeBusyService)
+    service.client = client
+    return service
+
+def test_bulk_lookup_splits_into_batches_and_maps_back_to_userids(monkeypatch):
+    monkeypatch.setattr(config, "FREEBUSY_BATCH_SIZE", 20)
+    monkeypatch.setattr(config, "FREEBUSY_CONCURRENCY", 2)
+    client = FakeClient()
+    service = make_service(monkeypatch, client, without_unionid={"u44"})
+    userids = [f"u{i}" for i in range(45)]
+
+    grouped = asyncio.run(service.get_users_free_busy_now_status(userids))
+
+    assert [len(batch) for batch in client.batches] == [20, 20, 4]
+    assert client.peak <= 2
+    assert set(grouped) == set(userids)
+    assert grouped["u0"][0]["userId"] == "n0" and grouped["u0"][0]["date"] == "2025-09-22"
+    # 没有 unionid 的用户不参与查询，结果为空
+    assert grouped["u44"] == []
+    assert "n44" not in [unionid for batch in client.batches for unionid in batch]
+
+def test_failed_batch_only_affects_its_own_users(monkeypatch):
+    monkeypatch.setattr(config, "FREEBUSY_BATCH_SIZE", 20)
+    client = FakeClient(failing={"n25"})
+    service = make_service(monkeypatch, client)
+
+    grouped = asyncio.run(service.get_users_free_busy_now_status([f"u{i}" for i in range(45)]))
+
+    assert all(grouped[f"u{i}"] for i in range(20))
+    # 失败批次的用户不在结果中，不会被当作空闲
+    assert not any(f"u{i}" in grouped for i in range(20, 40))
+    assert all(grouped[f"u{i}"] for i in range(40, 45))
+
+def test_every_batch_failing_raises(monkeypatch):
+    monkeypatch.setattr(config, "FREEBUSY_BATCH_SIZE", 20)
+    service = make_service(monkeypatch, FakeClient(failing={"n0", "n25"}), users=30)
+
+    with pytest.raises(Exception, match="all failed"):
+        asyncio.run(service.get_users_free_busy_now_status([f"u{i}" for i in range(30)]))
+
+def test_bulk_endpoint_returns_grouped_results(monkeypatch):
+    monkeypatch.setattr(config, "FREEBUSY_BATCH_SIZE", 20)
+    monkeypatch.setattr(config, "FREEBUSY_BATCH_SIZE", 1)
+    service = make_service(monkeypatch, FakeClient(failing={"n1"}), users=3, without_unionid={"u2"})
+    app = FastAPI()
+    app.include_router(FreeBusy.router)
+    app.dependency_overrides[FreeBusy.get_schedule_service] = lambda: service
+
+    response = TestClient(app).post("/schedule/now/free_busy/bulk", json={"userIds": ["u0", "u1", "u2"]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["userId"] for item in body["results"]["u0"]] == ["n0"]
+    assert body["results"]["u2"] == []
+    assert "u1" not in body["results"]
+    assert body["failed"] == ["u1"]
+
+def test_insert_resolves_userids_on_the_callers_connection(monkeypatch):
+    from repository import identity_map as identity_map_module
+    from repository.identity_map import IdentityMap
+
+    class RecordingDatabase:
+        def __init__(self):
+            self.conns = []
+
+        async def run(self, func, *args, conn=None, **kwargs):
+            self.conns.append((func.__name__, conn))
+            return {"user1": "union1"} if func is identity_map_module.select_mappings else None
+
+    db = RecordingDatabase()
+    monkeypatch.setattr(identity_map_module, "async_db", db)
+    monkeypatch.setattr(freebusy_module, "async_db", db)
+    monkeypatch.setattr(freebusy_module, "identity_map", IdentityMap())
+    service = FreeBusyService.__new__(FreeBusyService)
+    conn = object()
+
+    asyncio.run(service.insert_freebusy_record(
+        [{"userId": "union1", "date": "2025-09-22", "start_datetime": "2025-09-22 09:00:00", "end_datetime": "2025-09-22 10:00:00"}],
+        conn=conn))
+
+    assert db.conns == [("select_mappings", conn), ("_insert_freebusy_record", conn)]
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from utils.health_rules import evaluate_rules
+from utils.work_pattern import current_streak_minutes
+
+# 2025-09-22 为周一
+def at(hour, minute=0, day=22):
+    return datetime(2025, 9, day, hour, minute)
+
+def day(total=300, longest=60, first="09:00", last="18:00", late_night=False, breaks=3, steps=9000):
+    return {
+        "total_busy_minutes": total, "longest_busy_minutes": longest, "first_busy_at": first,
+        "last_busy_at": last, "late_night": late_night, "break_count": breaks, "steps": steps,
+    }
+
+def fired(employee_data, now):
+    return [rule["rule"] for rule in evaluate_rules(employee_data, now)]
+
+def busy(start, end):
+    return {"start_datetime": f"2025-09-22T{start}:00+08:00", "end_datetime": f"2025-09-22T{end}:00+08:00"}
+
+def test_quiet_morning_fires_nothing():
+    data = {"weather": {"温度(℃)": "24", "湿度(%)": "50"}, "work_status": {"2025-09-21": day()}, "busy_periods": [busy("09:30", "10:10")]}
+    assert fired(data, at(10, 10)) == []
+
+def test_current_streak_joins_short_gaps():
+    periods = [("2025-09-22 08:00:00", "2025-09-22 09:00:00"), ("2025-09-22 09:05:00", "2025-09-22 10:30:00")]
+    assert current_streak_minutes(periods, at(10, 30)) == 150
+    assert current_streak_minutes(periods, at(10, 45)) == 0
+
+def test_sedentary():
+    data = {"busy_periods": [busy("08:00", "09:00"), busy("09:05", "10:30")]}
+    assert fired(data, at(10, 30)) == ["sedentary"]
+    assert fired({"busy_periods": [busy("09:00", "10:30")]}, at(10, 30)) == []
+
+def test_hydration():
+    assert fired({"weather": {"温度(℃)": "29"}}, at(15)) == ["hydration"]
+    assert fired({"weather": {"温度(℃)": "29"}}, at(10)) == []
+    assert fired({"weather": {"温度(℃)": "28"}}, at(15)) == []
+
+def test_lunch_nap():
+    assert fired({"busy_periods": [busy("11:00", "12:00")]}, at(12)) == ["lunch_nap"]
+    # 午休时段已不在忙碌
+    assert fired({"busy_periods": [busy("10:00", "11:00")]}, at(12)) == []
+    assert fired({"busy_periods": [busy("14:00", "15:00")]}, at(15)) == []
+
+def test_humidity():
+    assert fired({"weather": {"湿度(%)": "85"}}, at(10)) == ["humidity"]
+    assert fired({"weather": {"湿度(%)": "60"}}, at(10)) == []
+
+def test_steps_low_and_high():
+    low = {"work_status": {"2025-09-19": day(steps=5000), "2025-09-20": day(steps=7000), "2025-09-21": day(steps=9000)}}
+    assert fired(low, at(10)) == ["steps_low"]
+    high = {"work_status": {"2025-09-19": day(steps=9000), "2025-09-20": day(steps=12000), "2025-09-21": day(steps=9000)}}
+    assert fired(high, at(10)) == ["steps_high"]
+    # 只看今天之前最近三天，今天的步数不参与判断
+    old = {"work_status": {"2025-09-16": day(steps=1000), "2025-09-17": day(steps=1000),
+                           "2025-09-19": day(steps=9000), "2025-09-20": day(steps=9000), "2025-09-21": day(steps=9000),
+                           "2025-09-22": day(steps=0)}}
+    assert fired(old, at(10)) == []
+
+def test_long_streaks():
+    data = {"work_status": {"2025-09-18": day(longest=200), "2025-09-19": day(longest=190), "2025-09-20": day(longest=60)}}
+    assert fired(data, at(10)) == ["long_streaks"]
+    # 工作时段外不提醒
+    assert fired(data, at(20)) == []
+    balanced = {"work_status": {"2025-09-18": day(longest=200), "2025-09-19": day(longest=60)}}
+    assert fired(balanced, at(10)) == []
+
+def test_late_nights():
+    data = {"work_status": {f"2025-09-{d}": day(late_night=True, last="23:00") for d in (17, 18, 19)}}
+    assert fired(data, at(20)) == ["late_nights"]
+    assert fired(data, at(16)) == []
+
+def test_late_then_early():
+    data = {"work_status": {"2025-09-21": day(late_night=True, last="23:30"), "2025-09-22": day(first="06:50", last="07:30")}}
+    assert fired(data, at(7, 30)) == ["late_then_early"]
+    rested = {"work_status": {"2025-09-21": day(late_night=False, last="18:00"), "2025-09-22": day(first="06:50")}}
+    assert fired(rested, at(7, 30)) == []
+
+def test_no_breaks():
+    # 周四、周五没有休息，周六不计入工作日
+    data = {"work_status": {"2025-09-18": day(breaks=0), "2025-09-19": day(breaks=0), "2025-09-20": day(breaks=5)}}
+    assert fired(data, at(10)) == ["no_breaks"]
+    some_breaks = {"work_status": {"2025-09-18": day(breaks=0), "2025-09-19": day(breaks=2)}}
+    assert fired(some_breaks, at(10)) == []
+    # 今天尚未结束，不计入
+    only_today = {"work_status": {"2025-09-19": day(breaks=0), "2025-09-22": day(total=80, breaks=0)}}
+    assert fired(only_today, at(10)) == []
+
+def test_fired_rule_carries_facts_and_advice():
+    rule = evaluate_rules({"weather": {"温度(℃)": "33"}}, at(15))[0]
+    assert rule["title"] == "喝水提醒"
+    assert rule["facts"] == {"temperature": 33.0}
+    assert rule["advice"]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from repository import identity_map as identity_map_module
+from repository.identity_map import IdentityMap
+
+class FakeAsyncDatabase:
+    def __init__(self, employees):
+        self.employees = employees
+        self.calls = []
+
+    async def run(self, func, *args, conn=None, **kwargs):
+        self.calls.append((func.__name__, kwargs))
+        if func is identity_map_module.select_all_mappings:
+            return dict(self.employees)
+        userids = set(kwargs.get("userids", ()))
+        unionids = set(kwargs.get("unionids", ()))
+        return {u: n for u, n in self.employees.items() if u in userids or n in unionids}
+
+def test_lookups_are_served_from_memory_after_load(monkeypatch):
+    db = FakeAsyncDatabase({"u1": "n1", "u2": "n2"})
+    monkeypatch.setattr(identity_map_module, "async_db", db)
+    identity_map = IdentityMap()
+
+    async def scenario():
+        await identity_map.load()
+        return (
+            await identity_map.resolve_unionids(["u1", "u2"]),
+            await identity_map.find_userid("n2"),
+        )
+
+    unionids, userid = asyncio.run(scenario())
+
+    assert unionids == {"u1": "n1", "u2": "n2"}
+    assert userid == "u2"
+    assert [name for name, _ in db.calls] == ["select_all_mappings"]
+
+def test_bulk_miss_is_fetched_once_and_cached(monkeypatch):
+    db = FakeAsyncDatabase({"u1": "n1", "u2": "n2", "u3": "n3"})
+    monkeypatch.setattr(identity_map_module, "async_db", db)
+    identity_map = IdentityMap()
+    identity_map.put("u1", "n1")
+
+    async def scenario():
+        first = await identity_map.resolve_userids(["n1", "n2", "n3", "missing"])
+        second = await identity_map.resolve_userids(["n2", "n3"])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == {"n1": "u1", "n2": "u2", "n3": "u3"}
+    assert second == {"n2": "u2", "n3": "u3"}
+    assert db.calls == [("select_mappings", {"unionids": ["n2", "n3", "missing"]})]
+
+def test_put_replaces_stale_reverse_mapping():
+    identity_map = IdentityMap()
+    identity_map.put("u1", "old")
+    identity_map.put("u1", "new")
+
+    assert identity_map.get_unionid("u1") == "new"
+    assert identity_map.get_userid("new") == "u1"
+    assert identity_map.get_userid("old") is None
+
+def test_unknown_ids_are_not_requeried_until_miss_ttl_expires(monkeypatch):
+    db = FakeAsyncDatabase({"u1": "n1"})
+    monkeypatch.setattr(identity_map_module, "async_db", db)
+    now = [0.0]
+    identity_map = IdentityMap(miss_ttl=60, clock=lambda: now[0])
+
+    async def lookup():
+        return await identity_map.resolve_unionids(["u1", "ghost"])
+
+    assert asyncio.run(lookup()) == {"u1": "n1"}
+    now[0] = 30
+    assert asyncio.run(lookup()) == {"u1": "n1"}
+    assert len(db.calls) == 1
+
+    # 过期后重新回查；期间写入的映射立即生效
+    now[0] = 61
+    asyncio.run(lookup())
+    identity_map.put("ghost", "n9")
+    assert asyncio.run(lookup()) == {"u1": "n1", "ghost": "n9"}
+    assert db.calls == [("select_mappings", {"userids": ["u1", "ghost"]}), ("select_mappings", {"userids": ["ghost"]})]
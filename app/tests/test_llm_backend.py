@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import asyncio
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from langchain_core.messages import HumanMessage
+from jobs.status_benchmark import run_status_benchmark
+from models.deepseek_model_server import HealthMessageGenerator
+from models.llm_backend import ReplayChatModel, create_llm, load_responses
+from models.benchmark import BENCHMARK_CASES
+from models.tokens import UsageRecorder
+
+RULES = [{"rule": "hydration", "title": "喝水提醒", "facts": {"temperature": 33.0}, "advice": "多喝水"}]
+
+def test_replay_model_cycles_recorded_responses_with_usage():
+    llm = ReplayChatModel(responses=["提醒A", "提醒B"])
+
+    messages = [llm.invoke([HumanMessage(content="你好")]) for _ in range(3)]
+
+    assert [message.content for message in messages] == ["提醒A", "提醒B", "提醒A"]
+    assert messages[0].usage_metadata["input_tokens"] > 0
+    assert messages[0].usage_metadata["output_tokens"] > 0
+
+def test_replay_model_simulates_errors_and_latency():
+    with pytest.raises(Exception):
+        ReplayChatModel(error_rate=1.0).invoke("你好")
+
+    assert asyncio.run(_timed(ReplayChatModel(latency=0.05, jitter=0.01, seed=1))) >= 0.04
+
+async def _timed(llm):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await llm.ainvoke("你好")
+    return loop.time() - started
+
+def test_replay_model_answers_batch_prompts_per_userid():
+    generator = HealthMessageGenerator(llm=ReplayChatModel(responses=["记得喝水"]), mode="direct", retries=0)
+    items = [(userid, {"employee_info": {"name": name}}, RULES) for userid, name in (("u1", "小赵"), ("u2", "小王"))]
+
+    results = asyncio.run(generator.agenerate_batch(items, current_time="2025-09-22 15:10"))
+
+    assert results == {"u1": "记得喝水", "u2": "记得喝水"}
+    assert generator.stats()["calls"] == 1
+
+def test_replay_model_calls_each_agent_tool_before_answering():
+    generator = HealthMessageGenerator(llm=ReplayChatModel(responses=["多喝水"]), mode="agent")
+    recorder = UsageRecorder()
+    _, current_time, employee_data = BENCHMARK_CASES[0]
+
+    content = generator.generate(employee_data, current_time=current_time, callbacks=[recorder])
+
+    assert content == "多喝水"
+    # 四个工具各一轮，再加最终回复一轮
+    assert recorder.calls == 5
+    direct = UsageRecorder()
+    generator.generate(employee_data, mode="direct", current_time=current_time, callbacks=[direct])
+    assert direct.calls == 1
+    assert recorder.prompt_tokens > direct.prompt_tokens
+
+def test_create_llm_selects_backend(tmp_path, monkeypatch):
+    path = tmp_path / "responses.json"
+    path.write_text(json.dumps(["录制的提醒"], ensure_ascii=False), encoding="utf-8")
+    assert load_responses(str(path)) == ["录制的提醒"]
+
+    from core import config
+    monkeypatch.setattr(config, "LLM_FAKE_RESPONSES_FILE", str(path))
+    monkeypatch.setattr(config, "LLM_FAKE_LATENCY", 0.0)
+    llm = create_llm("fake")
+    assert isinstance(llm, ReplayChatModel)
+    assert llm.invoke("你好").content == "录制的提醒"
+
+    with pytest.raises(Exception):
+        create_llm("unknown")
+
+def test_status_benchmark_runs_offline(monkeypatch):
+    from core import config
+    # 其他测试可能先加载了配置，发送消息需要 AGENT_ID
+    monkeypatch.setattr(config, "AGENT_ID", "0")
+    single = asyncio.run(run_status_benchmark(8, llm=ReplayChatModel(), batch=False, retries=0))
+    batched = asyncio.run(run_status_benchmark(8, llm=ReplayChatModel(), batch=True, retries=0))
+
+    assert single["alerted"] == batched["alerted"] == 8
+    assert single["llm_calls"] == 8
+    assert batched["llm_calls"] < single["llm_calls"]
+    assert batched["prompt_tokens"] > 0 and batched["gen_p95_ms"] >= batched["gen_p50_ms"]
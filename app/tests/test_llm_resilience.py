@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from core import config
+from models.deepseek_model_server import HealthMessageGenerator, retry_budget
+from models.fallback_message import DEFAULT_ADVICE, fallback_message
+from jobs.status_job import StatusJob
+
+EMPLOYEE = {
+    "employee_info": {"name": "小赵"},
+    "weather": {"温度(℃)": "33", "湿度(%)": "40"},
+    "work_status": {"2025-09-22": {"longest_busy_minutes": 150}},
+}
+
+def fake_llm(handler):
+    async def ainvoke(prompt):
+        return AIMessage(content=await handler())
+    return RunnableLambda(lambda prompt: None, afunc=ainvoke)
+
+def make_generator(handler, **kwargs):
+    kwargs.setdefault("retry_backoff", 0)
+    return HealthMessageGenerator(llm=fake_llm(handler), mode="direct", **kwargs)
+
+def test_retries_failed_call_then_succeeds():
+    attempts = []
+
+    async def handler():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("503")
+        return "记得喝水"
+
+    generator = make_generator(handler, retries=2)
+    assert asyncio.run(generator.agenerate(EMPLOYEE)) == "记得喝水"
+    assert generator.stats()["retries"] == 1
+    assert generator.stats()["succeeded"] == 1
+
+def test_slow_call_times_out_and_gives_up_after_retries():
+    async def handler():
+        await asyncio.sleep(1)
+        return "太慢了"
+
+    generator = make_generator(handler, call_timeout=0.01, retries=1)
+    with pytest.raises(Exception, match="已尝试2次"):
+        asyncio.run(generator.agenerate(EMPLOYEE))
+    assert generator.stats()["timeouts"] == 2
+    assert generator.stats()["failed"] == 1
+
+def test_concurrency_is_limited_across_calls():
+    running = []
+    peak = []
+
+    async def handler():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return "提醒"
+
+    generator = make_generator(handler, max_concurrency=2)
+
+    async def run_all():
+        return await asyncio.gather(*(generator.agenerate(EMPLOYEE) for _ in range(6)))
+
+    assert asyncio.run(run_all()) == ["提醒"] * 6
+    assert max(peak) == 2
+
+def test_status_job_falls_back_to_template_when_llm_unavailable():
+    async def handler():
+        raise RuntimeError("connection refused")
+
+    job = StatusJob.__new__(StatusJob)
+    job.message_generator = make_generator(handler, retries=0)
+
+    content = asyncio.run(job._generate_health_message(EMPLOYEE))
+    assert content.startswith("小赵，你好！")
+
+def test_caller_limiter_is_released_while_backing_off(monkeypatch):
+    # 第一次调用失败后退避期间，调用方的并发名额应让给其他提醒
+    limiter = asyncio.Semaphore(1)
+    free_during_backoff = []
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        free_during_backoff.append(not limiter.locked())
+        await sleep(0)
+
+    attempts = []
+
+    async def handler():
+        attempts.append(limiter.locked())
+        if len(attempts) == 1:
+            raise RuntimeError("503")
+        return "记得喝水"
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    generator = make_generator(handler, retries=1, retry_backoff=1.0)
+
+    assert asyncio.run(generator.agenerate(EMPLOYEE, limiter=limiter)) == "记得喝水"
+    assert attempts == [True, True]
+    assert free_during_backoff == [True]
+
+def test_default_alert_deadline_covers_every_retry():
+    assert config.LLM_ALERT_DEADLINE >= retry_budget(config.LLM_CALL_TIMEOUT, config.LLM_RETRIES, config.LLM_RETRY_BACKOFF)
+    assert retry_budget(20, 2, 1.0) == 63
+
+def test_fallback_message_is_deterministic():
+    first = fallback_message(EMPLOYEE, current_time="2025-09-22 15:10")
+    assert first == fallback_message(EMPLOYEE, current_time="2025-09-22 15:10")
+    assert "气温较高" in first
+    assert "午休" in fallback_message(EMPLOYEE, current_time="2025-09-22 12:00")
+    # 未命中规则时使用通用提醒
+    assert fallback_message({}, current_time="2025-09-22 10:00") == "你好！" + DEFAULT_ADVICE
+
+def test_rules_prompt_only_carries_fired_rules_and_profile():
+    prompts = []
+
+    async def ainvoke(prompt):
+        prompts.append(prompt.to_string())
+        return AIMessage(content="提醒")
+
+    generator = HealthMessageGenerator(llm=RunnableLambda(lambda prompt: None, afunc=ainvoke), mode="direct")
+    rules = [{"rule": "hydration", "title": "喝水提醒", "facts": {"temperature": 33.0}, "advice": "多喝水"}]
+    data = dict(EMPLOYEE, employee_info={"name": "小赵", "title": "算法工程师", "userid": "u1"})
+
+    asyncio.run(generator.agenerate(data, rules=rules))
+    assert "喝水提醒" in prompts[0] and '"temperature": 33.0' in prompts[0]
+    assert "算法工程师" in prompts[0]
+    assert "u1" not in prompts[0] and "longest_busy_minutes" not in prompts[0]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from utils.merge_periods import merge_periods, parse_period_time
+
+def dt(hour, minute=0):
+    return datetime(2025, 9, 1, hour, minute)
+
+def test_overlapping_and_adjacent_periods_are_merged():
+    periods = [
+        ("2025-09-01T09:00:00+08:00", "2025-09-01T10:00:00+08:00"),
+        ("2025-09-01 09:30:00", "2025-09-01 10:30:00"),
+        (dt(10, 30), dt(11)),
+        (dt(13), dt(14)),
+    ]
+    assert merge_periods(periods) == [(dt(9), dt(11)), (dt(13), dt(14))]
+
+def test_repeated_ingestion_is_idempotent():
+    once = merge_periods([(dt(9), dt(10)), (dt(13), dt(14))])
+    again = merge_periods(once + [("2025-09-01 09:00:00", "2025-09-01 10:00:00")])
+    assert again == once
+
+def test_all_day_periods_are_deduplicated_not_merged():
+    periods = [(None, "2025-09-02"), (None, "2025-09-02"), (dt(9), dt(10))]
+    assert merge_periods(periods) == [(dt(9), dt(10)), (None, datetime(2025, 9, 2))]
+
+def test_parse_period_time_accepts_api_and_db_formats():
+    assert parse_period_time("2025-09-01T09:00:00+08:00") == dt(9)
+    assert parse_period_time("2025-09-01 09:00:00") == dt(9)
+    assert parse_period_time(dt(9)) == dt(9)
+    assert parse_period_time(None) is None
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from models import message_cache
+from models.message_cache import MessageCache, fingerprint
+from models.deepseek_model_server import HealthMessageGenerator
+
+RULES = [{"rule": "hydration", "title": "喝水提醒", "facts": {"temperature": 33.2}, "advice": ""}]
+
+def employee(name, title="算法工程师", hobby="散步", age="25"):
+    return {
+        "employee_info": {"name": name, "title": title, "hobby": hobby, "age": age},
+        "weather": {"天气状况": "晴", "温度(℃)": "33"},
+    }
+
+def test_fingerprint_ignores_name_and_buckets_inputs():
+    key = fingerprint(employee("小赵"), RULES, "2025-09-22 15:10")
+    assert key == fingerprint(employee("小王", age="27"), RULES, "2025-09-22 16:40")
+    assert key != fingerprint(employee("小赵", title="HR"), RULES, "2025-09-22 15:10")
+    assert key != fingerprint(employee("小赵"), RULES, "2025-09-22 19:10")
+    hotter = [dict(RULES[0], facts={"temperature": 36})]
+    assert key != fingerprint(employee("小赵"), hotter, "2025-09-22 15:10")
+
+def test_variants_rotate_and_names_are_swapped():
+    cache = MessageCache(ttl=60, max_keys=10, variants=2)
+    assert cache.get("k", "小王") is None
+    cache.put("k", "小赵，记得喝水", "小赵")
+    assert cache.get("k", "小王") is None
+    cache.put("k", "小李，多补水", "小李")
+
+    assert [cache.get("k", "小王") for _ in range(3)] == ["小王，记得喝水", "小王，多补水", "小王，记得喝水"]
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["llm_calls_saved"] == 3
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(message_cache.time, "monotonic", lambda: now[0])
+    cache = MessageCache(ttl=60, max_keys=2, variants=1)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")  # b 最久未使用，被淘汰
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 61
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_generator_reuses_cached_text_for_same_situation():
+    calls = []
+
+    async def ainvoke(prompt):
+        calls.append(1)
+        name = "小赵" if "小赵" in prompt.to_string() else "小王"
+        return AIMessage(content=f"{name}，第{len(calls)}条")
+
+    generator = HealthMessageGenerator(
+        llm=RunnableLambda(lambda prompt: None, afunc=ainvoke), mode="direct",
+        cache=MessageCache(ttl=60, max_keys=10, variants=2))
+
+    async def run():
+        return [
+            await generator.agenerate(employee("小赵" if i % 2 == 0 else "小王"), rules=RULES, current_time="2025-09-22 15:10")
+            for i in range(6)
+        ]
+
+    texts = asyncio.run(run())
+    assert len(calls) == 2
+    assert texts[:2] == ["小赵，第1条", "小王，第2条"]
+    # 两条文案轮流使用，姓名换成当前员工
+    assert texts[2:] == ["小赵，第1条", "小王，第2条", "小赵，第1条", "小王，第2条"]
+    assert generator.stats()["cache"]["hit_rate"] == round(4 / 6, 3)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from models import deepseek_model_server
+from models.deepseek_model_server import HealthMessageGenerator
+from models.benchmark import BENCHMARK_CASES, format_report, run_benchmark
+
+CALL_TOOL = 'Action:\n```\n{"action": "GetEmployeeInfo", "action_input": ""}\n```'
+
+def final_answer(text):
+    return 'Action:\n```\n{"action": "Final Answer", "action_input": "%s"}\n```' % text
+
+def employee(name):
+    return {"employee_info": {"name": name}, "weather": {}, "work_status": {}}
+
+def test_agent_is_built_once_and_tools_read_per_call_data(monkeypatch):
+    seen = []
+    original = deepseek_model_server.get_employee_info
+    tool = next(tool for tool in deepseek_model_server.TOOLS if tool.name == "GetEmployeeInfo")
+    monkeypatch.setattr(tool, "func", lambda arg: seen.append(original(arg)) or original(arg))
+
+    llm = FakeListChatModel(responses=[CALL_TOOL, final_answer("提醒A"), CALL_TOOL, final_answer("提醒B")])
+    generator = HealthMessageGenerator(llm=llm, mode="agent")
+    agent = generator.agent
+
+    assert generator.generate(employee("小赵")) == "提醒A"
+    assert generator.generate(employee("小王")) == "提醒B"
+    assert generator.agent is agent
+    assert seen == ["小赵", "小王"]
+    # 生成结束后不保留上一位员工的数据
+    assert deepseek_model_server._employee_data.get(None) is None
+
+def test_direct_mode_makes_one_call_with_data_in_prompt():
+    llm = FakeListChatModel(responses=["  记得补水  "])
+    generator = HealthMessageGenerator(llm=llm, mode="direct")
+
+    data = employee("小赵")
+    data["weather"] = {"温度(℃)": 33}
+    prompt = generator.chain.first.invoke({
+        "current_time": "2025-09-22 15:10", "profile": "小赵", "weather": "33℃", "work_status": "无"
+    }).to_string()
+    assert "2025-09-22 15:10" in prompt and "{tools}" not in prompt
+
+    assert generator.generate(data, current_time="2025-09-22 15:10") == "记得补水"
+    # direct 模式不构建代理
+    assert generator._agent is None
+
+def test_benchmark_counts_llm_calls_per_mode():
+    cases = len(BENCHMARK_CASES)
+    responses = ["提醒"] * cases + [CALL_TOOL, final_answer("提醒")] * cases
+    generator = HealthMessageGenerator(llm=FakeListChatModel(responses=responses), mode="direct")
+
+    results = run_benchmark(generator, modes=("direct", "agent"), runs=1)
+
+    assert results["direct"]["samples"] == cases
+    assert results["direct"]["llm_calls_per_alert"] == 1
+    assert results["agent"]["llm_calls_per_alert"] == 2
+    assert "direct 相对 agent 节省" in format_report(results)
+
+def test_benchmark_rules_mode_skips_cases_without_fired_rules():
+    generator = HealthMessageGenerator(llm=FakeListChatModel(responses=["提醒"]), mode="direct")
+
+    results = run_benchmark(generator, modes=("rules",), runs=1)
+
+    assert results["rules"]["samples"] == len(BENCHMARK_CASES)
+    assert results["rules"]["skipped"] >= 1
+    assert results["rules"]["llm_calls_per_alert"] < 1
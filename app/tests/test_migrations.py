@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from repository import migrations
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, query, params=None):
+        sql = " ".join(query.split())
+        self.db.executed.append(sql)
+        if sql.startswith("SELECT GET_LOCK"):
+            self.result = [{"locked": 1}]
+        elif sql.startswith("SELECT version FROM schema_migrations"):
+            self.result = [{"version": v} for v in self.db.versions]
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            self.db.versions.append(params[0])
+            self.result = []
+        elif sql.startswith("EXPLAIN"):
+            self.result = self.db.plans.get(params, [])
+        elif "information_schema.statistics" in sql:
+            self.result = [
+                {"index_name": name, "column_name": column, "non_unique": non_unique}
+                for name, columns, non_unique in self.db.indexes.get(params[0], []) for column in columns
+            ]
+        else:
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, versions=None, plans=None, indexes=None):
+        self.versions = list(versions or [])
+        self.plans = plans or {}
+        # 表 -> [(索引名, 列, non_unique)]
+        self.indexes = indexes or {}
+        self.executed = []
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+TEST_MIGRATIONS = [
+    (1, "create", ["CREATE TABLE IF NOT EXISTS a (id INT)"]),
+    (2, "alter", ["ALTER TABLE a ADD COLUMN b INT"]),
+]
+
+def test_apply_migrations_only_runs_pending_versions():
+    conn = FakeConnection(versions=[1])
+
+    applied = migrations.apply_migrations(conn, TEST_MIGRATIONS)
+
+    assert applied == [2]
+    assert conn.versions == [1, 2]
+    assert "CREATE TABLE IF NOT EXISTS a (id INT)" not in conn.executed
+    assert "ALTER TABLE a ADD COLUMN b INT" in conn.executed
+    assert conn.executed[-1].startswith("SELECT RELEASE_LOCK")
+
+def test_apply_migrations_is_noop_when_up_to_date():
+    conn = FakeConnection(versions=[1, 2])
+    assert migrations.apply_migrations(conn, TEST_MIGRATIONS) == []
+
+def test_migration_versions_are_unique_and_increasing():
+    versions = [m[0] for m in migrations.MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+def test_add_index_skips_existing_index_on_same_columns():
+    conn = FakeConnection(indexes={"online_status": [
+        ("PRIMARY", ["id"], 0),
+        ("unique_user_date", ["userid", "date"], 0),
+        ("idx_date_user", ["date", "userid"], 1),
+    ]})
+    cursor = conn.cursor()
+
+    migrations.add_index("online_status", "uk_online_status_user_date", ["userid", "date"], unique=True)(cursor)
+    migrations.add_index("online_status", "idx_online_status_date", ["date"])(cursor)
+    # 已有的同列索引不唯一时仍需创建唯一索引
+    migrations.add_index("online_status", "uk_date_user", ["date", "userid"], unique=True)(cursor)
+
+    alters = [sql for sql in conn.executed if sql.startswith("ALTER TABLE")]
+    assert alters == [
+        "ALTER TABLE online_status ADD INDEX idx_online_status_date (date)",
+        "ALTER TABLE online_status ADD UNIQUE INDEX uk_date_user (date, userid)",
+    ]
+
+def test_check_query_plans_fails_on_full_scan():
+    queries = [
+        ("indexed", "SELECT id FROM t WHERE a = %s", ("x",)),
+        ("scan", "SELECT id FROM t WHERE b = %s", ("y",)),
+    ]
+    conn = FakeConnection(plans={
+        ("x",): [{"table": "t", "type": "ref"}],
+        ("y",): [{"table": "t", "type": "ALL"}],
+    })
+
+    with pytest.raises(Exception, match="scan -> t"):
+        migrations.check_query_plans(conn, queries)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from repository.online_status import ensure_online_status_ids, merge_task_periods, select_time_periods_in_range
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((" ".join(query.split()), params))
+
+    def executemany(self, query, params):
+        self.executed.append((" ".join(query.split()), list(params)))
+
+    def fetchall(self):
+        return self.rows
+
+def test_ensure_ids_uses_one_upsert_and_one_select():
+    cursor = FakeCursor([
+        {"id": 1, "userid": "u1", "date": datetime.date(2025, 9, 1)},
+        {"id": 2, "userid": "u2", "date": datetime.date(2025, 9, 1)},
+    ])
+    keys = [("u2", "2025-09-01"), ("u1", "2025-09-01"), ("u2", "2025-09-01")]
+
+    ids = ensure_online_status_ids(cursor, keys)
+
+    assert ids == {("u1", "2025-09-01"): 1, ("u2", "2025-09-01"): 2}
+    assert len(cursor.executed) == 2
+    upsert, select = cursor.executed
+    assert upsert[0].startswith("INSERT INTO online_status")
+    assert "ON DUPLICATE KEY UPDATE" in upsert[0]
+    # 去重并按键排序，保证并发写入时加锁顺序一致
+    assert upsert[1] == ["u1", "2025-09-01", "u2", "2025-09-01"]
+    assert select[1] == upsert[1]
+
+def test_ensure_ids_empty_batch_skips_queries():
+    cursor = FakeCursor([])
+    assert ensure_online_status_ids(cursor, []) == {}
+    assert cursor.executed == []
+
+def test_range_query_groups_periods_by_user_and_date():
+    start = datetime.datetime(2025, 9, 1, 9, 0)
+    end = datetime.datetime(2025, 9, 1, 10, 0)
+    cursor = FakeCursor([
+        {"userid": "u1", "date": datetime.date(2025, 9, 1), "start_datetime": start, "end_datetime": end},
+        {"userid": "u1", "date": datetime.date(2025, 9, 2), "start_datetime": None, "end_datetime": None},
+    ])
+
+    grouped = select_time_periods_in_range(cursor, ["u1", "u2"], "2025-08-27", "2025-09-02")
+
+    assert grouped == {
+        "u1": {"2025-09-01": [(start, end)], "2025-09-02": []},
+        "u2": {},
+    }
+    # 多个用户、整个日期范围只有一条查询
+    assert len(cursor.executed) == 1
+    assert cursor.executed[0][1] == ["u1", "u2", "2025-08-27", "2025-09-02"]
+
+def test_merge_task_periods_writes_only_the_difference():
+    nine, ten, eleven = (datetime.datetime(2025, 9, 1, h) for h in (9, 10, 11))
+    cursor = FakeCursor([
+        {"id": 1, "task_id": 7, "start_datetime": nine, "end_datetime": ten},
+        {"id": 2, "task_id": 7, "start_datetime": nine, "end_datetime": ten},
+    ])
+
+    inserted, deleted = merge_task_periods(cursor, {7: [("2025-09-01 10:00:00", "2025-09-01 11:00:00")]})
+
+    assert (inserted, deleted) == (1, 2)
+    select, delete, insert = cursor.executed
+    assert select[0].endswith("FOR UPDATE")
+    assert delete[1] == [1, 2]
+    assert insert[1] == [(7, nine, eleven)]
+
+def test_merge_task_periods_skips_writes_for_known_periods():
+    nine, ten = datetime.datetime(2025, 9, 1, 9), datetime.datetime(2025, 9, 1, 10)
+    cursor = FakeCursor([{"id": 1, "task_id": 7, "start_datetime": nine, "end_datetime": ten}])
+
+    assert merge_task_periods(cursor, {7: [("2025-09-01T09:00:00+08:00", "2025-09-01T10:00:00+08:00")]}) == (0, 0)
+    assert len(cursor.executed) == 1
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import get_buffer_string
+from models.benchmark import BENCHMARK_CASES, RAW_HISTORY_CASE, compare_context_tokens
+from models.deepseek_model_server import HealthMessageGenerator, PROMPT_TEMPLATE
+from models.prompt_context import build_context, compact_day
+from models.tokens import count_tokens
+
+def test_history_is_compacted_to_one_line_per_day():
+    name, current_time, employee_data = BENCHMARK_CASES[2]
+    context = build_context(employee_data, current_time)
+
+    assert context["profile"] == "小王，后端工程师，28岁，爱好篮球"
+    assert context["weather"] == "19℃，小雨，湿度70%，风力2级"
+    lines = context["work_status"].splitlines()
+    assert len(lines) == 4
+    assert lines[0].strip() == "2025-09-19 忙碌560分钟 最长连续260分钟 09:30-23:10 休息1次 步数5200 深夜"
+    assert "total_busy_minutes" not in context["work_status"]
+
+def test_raw_periods_are_summarized_and_today_steps_filled_in():
+    name, current_time, employee_data = RAW_HISTORY_CASE
+    lines = build_context(employee_data, current_time)["work_status"].splitlines()
+
+    assert len(lines) == 7
+    assert lines[1].strip().endswith("深夜")
+    assert lines[-1].strip() == "2025-09-22 忙碌260分钟 最长连续195分钟 08:30-15:05 休息1次 步数4200"
+    assert compact_day("2025-09-23", []) == "2025-09-23 忙碌0分钟 最长连续0分钟 休息0次"
+
+def test_budget_drops_oldest_days_first():
+    name, current_time, employee_data = RAW_HISTORY_CASE
+    full = build_context(employee_data, current_time)
+    full_tokens = sum(count_tokens(value) for value in full.values())
+
+    trimmed = build_context(employee_data, current_time, budget=full_tokens - 20)
+    lines = trimmed["work_status"].splitlines()
+    assert 1 <= len(lines) < 7
+    assert lines[-1].strip().startswith("2025-09-22")
+    assert sum(count_tokens(value) for value in trimmed.values()) <= full_tokens - 20
+
+    # 预算再小也保留最近一天
+    assert len(build_context(employee_data, current_time, budget=1)["work_status"].splitlines()) == 1
+
+def test_direct_prompt_uses_compact_context_and_records_token_usage():
+    llm = FakeListChatModel(responses=["记得喝水"])
+    generator = HealthMessageGenerator(llm=llm, mode="direct", retries=0)
+    name, current_time, employee_data = BENCHMARK_CASES[0]
+
+    chain, inputs = generator._direct_request(employee_data, current_time)
+    prompt_value = chain.first.invoke(inputs)
+    prompt = prompt_value.to_string()
+    assert "小赵，算法工程师" in prompt and "longest_busy_minutes" not in prompt and "manager4585" not in prompt
+
+    assert asyncio.run(generator.agenerate(employee_data, current_time=current_time)) == "记得喝水"
+    stats = generator.stats()
+    # 假模型不返回用量，按发送给模型的消息计算
+    assert stats["prompt_tokens"] == count_tokens(get_buffer_string(prompt_value.to_messages()))
+    assert stats["completion_tokens"] == count_tokens("记得喝水")
+
+def test_agent_prompt_has_no_example_payload_and_context_saves_tokens():
+    assert "manager4585" not in PROMPT_TEMPLATE and "sportsteps" not in PROMPT_TEMPLATE
+    rows = compare_context_tokens()
+    assert all(row["after"] < row["before"] for row in rows)
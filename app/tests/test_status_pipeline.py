@@ -0,0 +1,113 @@
+import os
+import sys
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from core import config
+from jobs import status_job as status_job_module
+from jobs.status_job import StatusJob
+from models.deepseek_model_server import HealthMessageGenerator
+from models.llm_backend import ReplayChatModel
+
+class FakeDatabase:
+    @asynccontextmanager
+    async def unit_of_work(self):
+        yield None
+
+class Gate:
+    """统计同时进行中的调用数；进入的调用等到同时进行数达到 target 后才一起放行，阶段并发能否占满与调度时机无关
+
+    并发上限小于 target 时等待 1 秒后放行，峰值停留在上限
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.active = 0
+        self.peak = 0
+        self._full = asyncio.Event()
+
+    @asynccontextmanager
+    async def enter(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        if self.active >= self.target:
+            self._full.set()
+        try:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+            yield
+        finally:
+            self.active -= 1
+
+class FakeStatusServices:
+    """状态检查用到的各服务：u0 未签到，u1 获取员工信息失败，u2 忙闲查询失败，其余用户已连续忙碌150分钟"""
+
+    def __init__(self):
+        self.attendance_manager = self
+        self.fetch_gate = Gate(2)
+        self.send_gate = Gate(3)
+        self.sent = {}
+        self.now = datetime.now()
+
+    async def get_attendance_status(self, userid):
+        return {"checked_in": userid != "u0", "checked_out": False}
+
+    async def get_users_free_busy_now_status(self, userids):
+        start = (self.now - timedelta(minutes=150)).strftime("%Y-%m-%d %H:%M:%S")
+        end = (self.now + timedelta(minutes=10)).strftime("%Y-%m-%d %H:%M:%S")
+        return {
+            userid: [{"userid": userid, "date": self.now.strftime("%Y-%m-%d"), "start_datetime": start, "end_datetime": end}]
+            for userid in userids if userid != "u2"
+        }
+
+    async def insert_freebusy_record(self, records, conn=None):
+        return None
+
+    async def get_users_daily_summaries(self, userids, start_date, end_date, conn=None):
+        return {userid: {} for userid in userids}
+
+    async def get_weather_data(self, city, extensions="base"):
+        return {"温度(℃)": "24", "天气状况": "晴", "湿度(%)": "40", "风力": "2"}
+
+    async def get_userinfo_from_database(self, userid):
+        async with self.fetch_gate.enter():
+            if userid == "u1":
+                raise Exception("user not found")
+            return {"userid": userid, "name": f"员工{userid}", "title": "工程师"}
+
+    async def get_steps_record(self, userid, date, conn=None):
+        return None
+
+    async def async_send_message(self, request):
+        async with self.send_gate.enter():
+            return None
+
+    async def insert_health_message(self, userid, message, sent_at):
+        self.sent[userid] = message
+
+def test_status_pipeline_bounds_each_stage_and_counts_outcomes(monkeypatch):
+    monkeypatch.setattr(status_job_module, "async_db", FakeDatabase())
+    monkeypatch.setattr(config, "AGENT_ID", "0")
+    services = FakeStatusServices()
+    generator = HealthMessageGenerator(llm=ReplayChatModel(responses=["起身活动一下吧"]), mode="direct", retries=0)
+    job = StatusJob(
+        services, services, services, services, services, services, message_generator=generator,
+        fetch_concurrency=2, llm_concurrency=2, send_concurrency=3, batch_generation=False)
+    userids = [f"u{i}" for i in range(12)]
+
+    summary = asyncio.run(job.check_user_status_and_send_alerts(userids))
+
+    assert services.fetch_gate.peak == 2
+    assert services.send_gate.peak == 3
+    assert (summary["alerted"], summary["skipped"], summary["failed"], summary["no_rule"]) == (9, 1, 2, 0)
+    assert set(services.sent) == set(userids) - {"u0", "u1", "u2"}
+    assert {"state", "record", "history", "context", "generate", "send"} <= set(summary["stages"])
+    assert summary["generation"]["calls"] == 9
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from core.event_bus import ATTENDANCE_PROCESSED, EventBus
+from services.scheduler.status_queue import StatusCheckQueue
+from services.scheduler.scheduler_service import SchedulerService
+
+class FakeStatusJob:
+    def __init__(self):
+        self.calls = []
+
+    async def check_user_status_and_send_alerts(self, userids):
+        self.calls.append(sorted(userids))
+        return {}
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_event_bus_delivers_to_all_subscribers_even_if_one_fails():
+    bus = EventBus()
+    seen = []
+
+    def broken(payload):
+        raise ValueError("boom")
+
+    bus.subscribe("topic", broken)
+    bus.subscribe("topic", seen.append)
+    bus.publish("topic", ["u1"])
+    bus.publish("other", ["u2"])
+
+    assert seen == [["u1"]]
+
+def test_queue_deduplicates_and_defers_recent_checks():
+    job, clock = FakeStatusJob(), FakeClock()
+    queue = StatusCheckQueue(job, min_interval=600, clock=clock)
+
+    async def scenario():
+        queue.enqueue(["u1", "u2"])
+        queue.enqueue(["u2", "u3"])
+        assert await queue.run_due() == ["u1", "u2", "u3"]
+
+        # 间隔不足的用户推迟，新用户立即检查
+        clock.now += 300
+        queue.enqueue(["u1", "u4"])
+        assert await queue.run_due() == ["u4"]
+        assert await queue.run_due() == []
+
+        clock.now += 300
+        assert await queue.run_due() == ["u1"]
+
+    asyncio.run(scenario())
+
+    assert job.calls == [["u1", "u2", "u3"], ["u4"], ["u1"]]
+    stats = queue.stats()
+    assert stats["deduplicated"] == 1 and stats["deferred"] == 1 and stats["pending"] == 0
+
+def test_attendance_event_queues_status_check_right_away():
+    job = FakeStatusJob()
+
+    class FakeAttendanceJob:
+        async def job_process_attendance_for_users(self, userids):
+            return {"results": {
+                "u1": {"status": "ok", "checked_in": True, "checked_out": False},
+                "u2": {"status": "ok", "checked_in": True, "checked_out": True},
+                "u3": {"status": "failed", "error": "timeout"},
+                "u4": {"status": "ok", "checked_in": False, "checked_out": False},
+            }}
+
+    async def scenario():
+        service = SchedulerService(FakeAttendanceJob(), job)
+        service.status_queue.start()
+        try:
+            await service._run_attendance_and_publish(["u1", "u2", "u3", "u4"])
+            for _ in range(20):
+                if job.calls:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await service.shutdown_schedulers()
+
+    asyncio.run(scenario())
+
+    assert job.calls == [["u1"]]
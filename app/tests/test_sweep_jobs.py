@@ -0,0 +1,114 @@
+import os
+import sys
+import asyncio
+from contextlib import asynccontextmanager
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from api.models.attendance import AttendanceRecord
+from jobs import attendance_job as attendance_job_module
+from jobs.attendance_job import AttendanceJob
+
+class FakeDatabase:
+    @asynccontextmanager
+    async def unit_of_work(self):
+        yield None
+
+class Peak:
+    """统计同时进行中的调用数"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    @asynccontextmanager
+    async def track(self, delay=0.01):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(delay)
+            yield
+        finally:
+            self.active -= 1
+
+class FakeAttendanceManager:
+    """处于签到时段、所有用户均未签到；slow 中的用户签到标记耗时 1 秒"""
+
+    def __init__(self, peak, slow=()):
+        self.peak = peak
+        self.slow = set(slow)
+        self.checked_in = set()
+
+    async def is_in_checkin_period(self):
+        return True
+
+    async def is_in_checkout_period(self):
+        return False
+
+    async def get_attendance_status(self, userid):
+        return {"checked_in": userid in self.checked_in, "checked_out": False}
+
+    async def mark_checked_in(self, userid):
+        async with self.peak.track(1.0 if userid in self.slow else 0.01):
+            self.checked_in.add(userid)
+
+class FakeAttendanceService:
+    """批量拉取考勤记录：包含 failing_user 的一组整体失败，其余用户各有一条签到记录"""
+
+    def __init__(self, manager, failing_user=None, fetch_delay=0):
+        self.attendance_manager = manager
+        self.failing_user = failing_user
+        self.fetch_delay = fetch_delay
+
+    async def check_attendance_for_users(self, userids):
+        await asyncio.sleep(self.fetch_delay)
+        if self.failing_user in userids:
+            raise Exception("attendance list fail: 40003")
+        return {
+            userid: [AttendanceRecord(userid=userid, date="2025-09-22", datetime="2025-09-22 08:55:00", checkType="OnDuty")]
+            for userid in userids
+        }
+
+    async def add_attendance_info(self, records, conn=None):
+        return None
+
+def test_attendance_sweep_bounds_concurrency_and_counts_outcomes(monkeypatch):
+    monkeypatch.setattr(attendance_job_module, "async_db", FakeDatabase())
+    peak = Peak()
+    manager = FakeAttendanceManager(peak, slow={"u7"})
+    # 第二组（u50-u59）批量拉取失败
+    service = FakeAttendanceService(manager, failing_user="u55")
+    job = AttendanceJob(service, sport_service=None, concurrency=3, user_timeout=0.2)
+    userids = [f"u{i}" for i in range(60)]
+
+    summary = asyncio.run(job.job_process_attendance_for_users(userids))
+
+    assert peak.peak == 3
+    assert summary["chunks"] == 2
+    assert (summary["total"], summary["succeeded"], summary["failed"], summary["timed_out"]) == (60, 49, 10, 1)
+    assert list(summary["results"]) == userids
+    assert summary["results"]["u7"]["status"] == "timeout"
+    assert summary["results"]["u55"]["status"] == "failed"
+    assert summary["results"]["u0"]["status"] == "ok" and summary["results"]["u0"]["checked_in"]
+    assert manager.checked_in == {f"u{i}" for i in range(50)} - {"u7"}
+
+def test_chunk_fetch_uses_its_own_timeout(monkeypatch):
+    monkeypatch.setattr(attendance_job_module, "async_db", FakeDatabase())
+    userids = [f"u{i}" for i in range(5)]
+
+    # 分页拉取一组用户比单个用户处理超时慢，但在拉取超时内
+    manager = FakeAttendanceManager(Peak())
+    job = AttendanceJob(FakeAttendanceService(manager, fetch_delay=0.3), sport_service=None,
+                        concurrency=3, user_timeout=0.2, fetch_timeout=1)
+    summary = asyncio.run(job.job_process_attendance_for_users(userids))
+    assert (summary["succeeded"], summary["timed_out"]) == (5, 0)
+
+    manager = FakeAttendanceManager(Peak())
+    job = AttendanceJob(FakeAttendanceService(manager, fetch_delay=0.3), sport_service=None,
+                        concurrency=3, user_timeout=1, fetch_timeout=0.1)
+    summary = asyncio.run(job.job_process_attendance_for_users(userids))
+    assert (summary["succeeded"], summary["timed_out"]) == (0, 5)
+    assert summary["results"]["u0"] == {"status": "timeout", "elapsed": 0.1}
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from api.dependencies.dingtalk_token import DingTalkTokenManager
+
+class FakeTokenManager(DingTalkTokenManager):
+    def __init__(self, expire_in=7200, **kwargs):
+        super().__init__("key", "secret", **kwargs)
+        self.expire_in = expire_in
+        self.calls = 0
+
+    async def _request_token(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return f"token-{self.calls}", self.expire_in
+
+def test_concurrent_callers_share_one_request():
+    async def run():
+        manager = FakeTokenManager()
+        tokens = await asyncio.gather(*[manager.get_token() for _ in range(20)])
+        await manager.aclose()
+        return manager, tokens
+
+    manager, tokens = asyncio.run(run())
+    assert manager.calls == 1
+    assert set(tokens) == {"token-1"}
+
+def test_cached_until_expiry_margin():
+    async def run():
+        manager = FakeTokenManager(expire_in=7200)
+        first = await manager.get_token()
+        second = await manager.get_token()
+        # 进入过期余量后重新获取
+        manager._expires_at = manager._expires_at - 7200 + manager.expiry_margin - 1
+        third = await manager.get_token()
+        await manager.aclose()
+        return manager, first, second, third
+
+    manager, first, second, third = asyncio.run(run())
+    assert first == second == "token-1"
+    assert third == "token-2"
+    assert manager.calls == 2
+
+def test_background_refresh_before_expiry():
+    async def run():
+        manager = FakeTokenManager(expire_in=1, expiry_margin=0, refresh_ahead=0.5)
+        await manager.get_token()
+        await asyncio.sleep(0.7)
+        await manager.aclose()
+        return manager
+
+    manager = asyncio.run(run())
+    assert manager.calls >= 2
+
+def test_short_lived_token_does_not_spin_refresh_loop():
+    async def run():
+        # expireIn 小于 refresh_ahead：每次刷新后都已进入提前刷新窗口
+        manager = FakeTokenManager(expire_in=1, expiry_margin=0, refresh_ahead=5, retry_interval=0.2)
+        await manager.get_token()
+        await asyncio.sleep(0.5)
+        await manager.aclose()
+        return manager
+
+    manager = asyncio.run(run())
+    assert 2 <= manager.calls <= 5
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import asyncio
+import httpx
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from services.amap.weather_service import WeatherService
+
+class FakeHttpClients:
+    def __init__(self, handler):
+        self.amap = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def make_service(cache_ttl=60, stale_ttl=60):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.params["city"])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={
+            "status": "1",
+            "lives": [{"temperature": str(20 + len(calls)), "weather": "晴", "humidity": "40", "windpower": "3"}]
+        })
+
+    service = WeatherService(FakeHttpClients(handler), cache_ttl=cache_ttl, stale_ttl=stale_ttl)
+    return service, calls
+
+def test_concurrent_misses_fetch_once():
+    async def run():
+        service, calls = make_service()
+        results = await asyncio.gather(*[service.get_weather_data("320500") for _ in range(10)])
+        again = await service.get_weather_data("320500")
+        return calls, results, again
+
+    calls, results, again = asyncio.run(run())
+    assert calls == ["320500"]
+    assert all(r["温度(℃)"] == "21" for r in results)
+    assert again["温度(℃)"] == "21"
+
+def test_cache_keyed_by_city():
+    async def run():
+        service, calls = make_service()
+        await service.get_weather_data("320500")
+        await service.get_weather_data("110000")
+        return calls
+
+    assert asyncio.run(run()) == ["320500", "110000"]
+
+def test_stale_while_revalidate():
+    async def run():
+        service, calls = make_service(cache_ttl=0, stale_ttl=60)
+        first = await service.get_weather_data("320500")
+        # 已过期但在stale窗口内：立即返回旧数据并后台刷新
+        stale = await service.get_weather_data("320500")
+        await asyncio.sleep(0.05)
+        return calls, first, stale
+
+    calls, first, stale = asyncio.run(run())
+    assert stale == first
+    assert len(calls) == 2
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+sys.path.insert(0, app_dir)
+os.environ.setdefault("USER_IDS", "manager4585")
+
+from utils.work_pattern import summarize_day
+
+def dt(hour, minute=0, day=1):
+    return datetime(2025, 9, day, hour, minute)
+
+def test_summary_of_busy_day():
+    periods = [
+        (dt(9), dt(11)),
+        (dt(11, 5), dt(12, 30)),   # 5分钟间隔不算休息，与上一段连续
+        (dt(14), dt(15)),
+        (dt(21), dt(22, 30)),
+    ]
+    summary = summarize_day("2025-09-01", periods, steps=4200)
+
+    assert summary["total_busy_minutes"] == 120 + 85 + 60 + 90
+    assert summary["longest_busy_minutes"] == 210
+    assert summary["first_busy_at"] == dt(9)
+    assert summary["last_busy_at"] == dt(22, 30)
+    assert summary["late_night"] is True
+    assert summary["break_count"] == 2
+    assert summary["steps"] == 4200
+
+def test_overlapping_periods_are_not_double_counted():
+    summary = summarize_day("2025-09-01", [(dt(9), dt(11)), (dt(10), dt(12))])
+    assert summary["total_busy_minutes"] == 180
+    assert summary["late_night"] is False
+    assert summary["break_count"] == 0
+
+def test_day_without_periods():
+    summary = summarize_day("2025-09-01", [], steps=None)
+    assert summary["total_busy_minutes"] == 0
+    assert summary["first_busy_at"] is None
+    assert summary["steps"] == 0
@@ -1,43 +1,14 @@
-import pymysql.cursors
+from repository.identity_map import identity_map
 
 async def find_userid_by_unionid(
         unionid: str,
-        conn
+        conn=None
         ):
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        try:
-            select_query = """
-            SELECT userid FROM employees WHERE unionid = %s
-            """
-            cursor.execute(select_query, (unionid,))
-            result= cursor.fetchone()
-            conn.commit()
-            return result['userid'] if result else None
-                # ύ
-        except Exception as e:
-        # ʱع
-            conn.rollback()
-            raise e
-        finally:
-            cursor.close()
-    
+        # Ȳڴӳ䣬δʱزݿ
+        return await identity_map.find_userid(unionid, conn=conn)
+
 async def find_unionid_by_userId(
         userId: str,
-        conn
+        conn=None
         ):
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        try:
-            select_query = """
-            SELECT unionid FROM employees WHERE userid = %s
-            """
-            cursor.execute(select_query, (userId,))
-            result= cursor.fetchone()
-            conn.commit()
-            return result['unionid'] if result else None
-                # ύ
-        except Exception as e:
-        # ʱع
-            conn.rollback()
-            raise e
-        finally:
-            cursor.close()
\ No newline at end of file
+        return await identity_map.find_unionid(userId, conn=conn)
@@ -0,0 +1,183 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from core import config
+from utils.work_pattern import current_streak_minutes
+
+# 健康提醒规则引擎：按提示词中的9条提醒规则，用已有数据逐条计算是否需要提醒
+# 每条命中的规则返回 {"rule", "title", "facts", "advice"}：facts 为判断依据，advice 为模板提醒文案
+
+# 久坐：当前连续忙碌不少于该分钟数
+SEDENTARY_MINUTES = 120
+# 喝水：气温高于该值且处于下午
+HOT_TEMPERATURE = 28
+AFTERNOON_HOURS = (12, 18)
+# 午休时段 11:30-14:00（分钟）
+LUNCH_WINDOW = (11 * 60 + 30, 14 * 60)
+# 湿度不低于该值视为较高
+HIGH_HUMIDITY = 80
+# 步数：近三天少于 LOW 的天数不少于 LOW_DAYS 天，或有一天超过 HIGH
+STEPS_LOW = 8000
+STEPS_LOW_DAYS = 2
+STEPS_HIGH = 10000
+# 工作时段（小时，左闭右开）
+WORK_HOURS = (9, 18)
+# 连续工作：多数天最长连续忙碌不少于该分钟数（接近3-4小时）
+LONG_STREAK_MINUTES = 180
+# 深夜工作：一周内不少于该天数在22点后仍忙碌，且当前为晚上
+LATE_NIGHT_DAYS = 3
+EVENING_HOUR = 19
+# 晚睡早起：前一天深夜仍在工作，当天在该时间之前就开始忙碌，且当前为清晨
+EARLY_START = "08:00"
+EARLY_MORNING_HOUR = 9
+# 缺少休息：一周内工作日中没有休息的天数占比不低于该值
+NO_BREAK_RATIO = 0.8
+# 连续工作、缺少休息按已结束的天数判断（不含今天），至少需要的天数
+MIN_HISTORY_DAYS = 2
+
+def _to_number(value) -> Optional[float]:
+    """天气接口返回的数值多为字符串（如 "25"、"≤3"），取其中的数字"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"-?\d+(\.\d+)?", str(value or ""))
+    return float(match.group()) if match else None
+
+class RuleContext:
+    """单个员工规则计算所需的数据"""
+
+    def __init__(self, employee_data: Dict[str, Any], now: datetime):
+        self.now = now
+        self.today = now.strftime("%Y-%m-%d")
+        self.weather = employee_data.get("weather") or {}
+        work_status = employee_data.get("work_status") or {}
+        # 按日期升序的 (日期, 当天汇总)，只取当前时间之前（含今天）的数据
+        self.days = sorted((date, summary) for date, summary in work_status.items() if date <= self.today)
+        busy_periods = employee_data.get("busy_periods")
+        if busy_periods is None:
+            self.streak_minutes = None
+        else:
+            self.streak_minutes = current_streak_minutes(
+                [(item["start_datetime"], item["end_datetime"]) for item in busy_periods],
+                now,
+                break_minutes=config.WORK_BREAK_MINUTES
+            )
+
+    @property
+    def minute_of_day(self) -> int:
+        return self.now.hour * 60 + self.now.minute
+
+    def in_work_hours(self) -> bool:
+        return WORK_HOURS[0] <= self.now.hour < WORK_HOURS[1]
+
+    def summary(self, date: str) -> Dict[str, Any]:
+        return dict(self.days).get(date) or {}
+
+    def past_days(self) -> List[tuple]:
+        """今天之前有忙碌记录的天"""
+        return [(date, summary) for date, summary in self.days if date < self.today and summary.get("total_busy_minutes")]
+
+    def recent_steps(self) -> Dict[str, int]:
+        """今天之前最近三天的步数（当天步数在签退时才写入，不参与判断）"""
+        past = [(date, summary.get("steps") or 0) for date, summary in self.days if date < self.today]
+        return dict(past[-3:])
+
+def sedentary(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    if ctx.streak_minutes is not None:
+        streak = ctx.streak_minutes
+    else:
+        # 没有实时忙碌时段时，今天最后一段忙碌刚结束则以当天最长连续忙碌近似
+        today = ctx.summary(ctx.today)
+        streak = 0
+        if today.get("last_busy_at"):
+            last_busy_at = datetime.strptime(f"{ctx.today} {today['last_busy_at']}", "%Y-%m-%d %H:%M")
+            if timedelta(0) <= ctx.now - last_busy_at < timedelta(minutes=config.WORK_BREAK_MINUTES):
+                streak = today.get("longest_busy_minutes") or 0
+    if streak >= SEDENTARY_MINUTES:
+        return {"current_busy_minutes": streak}
+    return None
+
+def hydration(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    temperature = _to_number(ctx.weather.get("温度(℃)"))
+    if temperature is not None and temperature > HOT_TEMPERATURE and AFTERNOON_HOURS[0] <= ctx.now.hour < AFTERNOON_HOURS[1]:
+        return {"temperature": temperature}
+    return None
+
+def lunch_nap(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    # 进入状态检查的员工已签到未签退；有实时忙碌时段时以当前仍在忙碌为准
+    online = ctx.streak_minutes is None or ctx.streak_minutes > 0
+    if online and LUNCH_WINDOW[0] <= ctx.minute_of_day < LUNCH_WINDOW[1]:
+        return {"time": ctx.now.strftime("%H:%M")}
+    return None
+
+def humidity(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    value = _to_number(ctx.weather.get("湿度(%)"))
+    if value is not None and value >= HIGH_HUMIDITY:
+        return {"humidity": value}
+    return None
+
+def steps_low(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    steps = ctx.recent_steps()
+    low_days = [date for date, count in steps.items() if count < STEPS_LOW]
+    if len(low_days) >= STEPS_LOW_DAYS:
+        return {"steps": steps, "days_below_8000": len(low_days)}
+    return None
+
+def steps_high(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    steps = ctx.recent_steps()
+    if any(count > STEPS_HIGH for count in steps.values()):
+        return {"steps": steps}
+    return None
+
+def long_streaks(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    worked = ctx.past_days()
+    long_days = [date for date, summary in worked if (summary.get("longest_busy_minutes") or 0) >= LONG_STREAK_MINUTES]
+    if len(worked) >= MIN_HISTORY_DAYS and len(long_days) * 2 > len(worked) and ctx.in_work_hours():
+        return {"long_streak_days": len(long_days), "worked_days": len(worked)}
+    return None
+
+def late_nights(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    late_days = [date for date, summary in ctx.days if summary.get("late_night")]
+    if len(late_days) >= LATE_NIGHT_DAYS and ctx.now.hour >= EVENING_HOUR:
+        return {"late_night_days": len(late_days)}
+    return None
+
+def late_then_early(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    if ctx.now.hour >= EARLY_MORNING_HOUR:
+        return None
+    yesterday = ctx.summary((ctx.now - timedelta(days=1)).strftime("%Y-%m-%d"))
+    today = ctx.summary(ctx.today)
+    first_busy_at = today.get("first_busy_at")
+    if yesterday.get("late_night") and first_busy_at and first_busy_at < EARLY_START:
+        return {"yesterday_last_busy_at": yesterday.get("last_busy_at"), "today_first_busy_at": first_busy_at}
+    return None
+
+def no_breaks(ctx: RuleContext) -> Optional[Dict[str, Any]]:
+    workdays = [(date, summary) for date, summary in ctx.past_days() if datetime.strptime(date, "%Y-%m-%d").weekday() < 5]
+    no_break_days = [date for date, summary in workdays if not summary.get("break_count")]
+    if len(workdays) >= MIN_HISTORY_DAYS and len(no_break_days) >= NO_BREAK_RATIO * len(workdays) and ctx.in_work_hours():
+        return {"no_break_days": len(no_break_days), "workdays": len(workdays)}
+    return None
+
+# (规则名, 标题, 判断函数, 模板提醒文案)，顺序与提示词中的规则一致
+RULES: List[tuple] = [
+    ("sedentary", "久坐提醒", sedentary, "已经连续忙碌很久了，起身走一走、深呼吸，眺望远处放松一下眼睛吧。"),
+    ("hydration", "喝水提醒", hydration, "今天气温较高，记得多喝水，注意防暑。"),
+    ("lunch_nap", "午休提醒", lunch_nap, "现在是午休时间，可以小憩20-30分钟，下午精力会更充沛。"),
+    ("humidity", "环境适应性提醒", humidity, "今天湿度较高，注意开窗通风，保持环境舒适。"),
+    ("steps_low", "步数不足提醒", steps_low, "最近几天步数偏少，空闲时记得多走走路。"),
+    ("steps_high", "步数较多提醒", steps_high, "最近步数较多，注意不要太过操劳，及时休息补充体力。"),
+    ("long_streaks", "连续工作时长提醒", long_streaks, "这周经常连续工作三四个小时，记得每隔一段时间停下来休息一会儿。"),
+    ("late_nights", "夜间工作提醒", late_nights, "这周有好几天工作到深夜，今晚早点休息吧。"),
+    ("late_then_early", "休息与早起提醒", late_then_early, "昨晚工作到很晚，今天又很早开始忙碌，注意补充睡眠。"),
+    ("no_breaks", "规律休息提醒", no_breaks, "这周工作中几乎没有休息间隙，忙碌之余记得安排短暂休息。"),
+]
+
+def evaluate_rules(employee_data: Dict[str, Any], now: datetime = None) -> List[Dict[str, Any]]:
+    """计算单个员工当前命中的提醒规则，未命中任何规则时返回空列表"""
+    ctx = RuleContext(employee_data, now or datetime.now())
+    fired = []
+    for name, title, check, advice in RULES:
+        facts = check(ctx)
+        if facts is not None:
+            fired.append({"rule": name, "title": title, "facts": facts, "advice": advice})
+    return fired
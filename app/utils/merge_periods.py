@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+Period = Tuple[Optional[datetime], Optional[datetime]]
+
+# 将数据库/钉钉返回的时间统一为datetime（去掉时区，仅日期的视为当天0点，与MySQL DATETIME一致）
+def parse_period_time(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    value = str(value)
+    if '+' in value:
+        value = value.split('+')[0]
+    value = value.replace('Z', '').replace('T', ' ')
+    if ' ' in value:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return datetime.strptime(value, "%Y-%m-%d")
+
+# 合并重叠或首尾相接的时间段；缺少开始或结束时间的（全天事件）只做去重
+def merge_periods(periods: Iterable[Period]) -> List[Period]:
+    bounded = []
+    unbounded = set()
+    for start, end in periods:
+        start, end = parse_period_time(start), parse_period_time(end)
+        if start is None or end is None:
+            unbounded.add((start, end))
+        else:
+            bounded.append((start, end) if start <= end else (end, start))
+
+    merged: List[Period] = []
+    for start, end in sorted(bounded):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    # 全天事件排在最后，保证结果顺序稳定
+    return merged + sorted(unbounded, key=lambda p: (p[0] or datetime.min, p[1] or datetime.min))
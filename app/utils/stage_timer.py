@@ -0,0 +1,33 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+class StageTimer:
+    """统计流水线各阶段耗时（次数、总耗时、平均、最大，单位秒）"""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name].append(time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, values in self.durations.items():
+            result[name] = {
+                "count": len(values),
+                "total": round(sum(values), 3),
+                "avg": round(sum(values) / len(values), 3),
+                "max": round(max(values), 3),
+            }
+        return result
+
+    def elapsed(self) -> float:
+        return round(time.perf_counter() - self.started, 3)
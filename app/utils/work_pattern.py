@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+from utils.merge_periods import merge_periods
+
+# 汇总单个用户一天的工作模式：总忙碌时长、最长连续忙碌、首末忙碌时间、是否22点后工作、休息次数
+# 间隔不少于 break_minutes 分钟视为一次休息，短于该值的间隔仍算连续忙碌
+def summarize_day(
+        date: str,
+        periods: Iterable[tuple],
+        steps: Optional[int] = 0,
+        break_minutes: int = 10,
+        late_night_hour: int = 22) -> Dict[str, Any]:
+    merged = [(start, end) for start, end in merge_periods(periods) if start is not None and end is not None]
+
+    summary = {
+        "date": date,
+        "total_busy_minutes": 0,
+        "longest_busy_minutes": 0,
+        "first_busy_at": None,
+        "last_busy_at": None,
+        "late_night": False,
+        "break_count": 0,
+        "steps": steps or 0,
+    }
+    if not merged:
+        return summary
+
+    min_break = timedelta(minutes=break_minutes)
+    late_night_at = datetime.strptime(date, "%Y-%m-%d") + timedelta(hours=late_night_hour)
+
+    total = timedelta()
+    longest = timedelta()
+    block_start, block_end = merged[0]
+    for start, end in merged:
+        total += end - start
+        if start - block_end >= min_break:
+            summary["break_count"] += 1
+            longest = max(longest, block_end - block_start)
+            block_start = start
+        block_end = max(block_end, end)
+    longest = max(longest, block_end - block_start)
+
+    summary.update({
+        "total_busy_minutes": int(total.total_seconds() // 60),
+        "longest_busy_minutes": int(longest.total_seconds() // 60),
+        "first_busy_at": merged[0][0],
+        "last_busy_at": max(end for _, end in merged),
+        "late_night": max(end for _, end in merged) > late_night_at,
+    })
+    return summary
+
+# 截至 now 的当前连续忙碌时长（分钟）：从最近一段忙碌往前，间隔短于 break_minutes 的视为连续
+# 最近一段忙碌在 break_minutes 分钟之前就已结束时返回0
+def current_streak_minutes(periods: Iterable[tuple], now: datetime, break_minutes: int = 10) -> int:
+    merged = [(start, min(end, now)) for start, end in merge_periods(periods)
+              if start is not None and end is not None and start <= now]
+    if not merged:
+        return 0
+    min_break = timedelta(minutes=break_minutes)
+    streak_start, streak_end = merged[-1]
+    if now - streak_end >= min_break:
+        return 0
+    for start, end in reversed(merged[:-1]):
+        if streak_start - end >= min_break:
+            break
+        streak_start = start
+    return int((streak_end - streak_start).total_seconds() // 60)
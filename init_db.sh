@@ -6,10 +6,7 @@ while ! mysqladmin ping -h"db" --silent; do
     sleep 1
 done
 
-# 执行SQL脚本创建表结构
-if mysql -h db -u ${DB_USER} -p${DB_PASS} ${DB_NAME} -e "SHOW TABLES" | grep -q . ; then
-    echo "Database already initialized, skipping initialization."
-    exit 0
-fi
+# 执行版本化迁移创建/升级表结构（已是最新版本时不做任何修改）
+(cd app && python -m repository.migrations upgrade)
 
 echo "Database initialized successfully!"
\ No newline at end of file